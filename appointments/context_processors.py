@@ -0,0 +1,16 @@
+from .notifications import get_unread_count
+
+
+def unread_notifications(request):
+    """
+    提供 unread_notification_count 給模板。以可呼叫物件傳入，
+    只有模板實際使用時才會查詢，且只查詢計數表的一列。
+    """
+    user = getattr(request, "user", None)
+
+    def count():
+        if user is None or not user.is_authenticated:
+            return 0
+        return get_unread_count(user.pk)
+
+    return {"unread_notification_count": count}
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.retention import POLICIES, apply_retention
+
+
+class Command(BaseCommand):
+    help = (
+        "將超過保留期限的資料（已讀通知、已結束預約的狀態紀錄）分批移到封存表或刪除，"
+        "每批在短交易中完成，可隨時中斷後重新執行。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--policy", action="append", dest="policies", choices=list(POLICIES),
+                            help="只執行指定的規則，可重複，預設全部")
+        parser.add_argument("--delete", action="store_true", help="直接刪除，不寫入封存表")
+        parser.add_argument("--batch-size", type=int, default=500, help="每批最多處理的資料列數")
+        parser.add_argument("--batch-seconds", type=float, default=0.5,
+                            help="每批的目標耗時（秒），超過時縮小批次")
+        parser.add_argument("--max-seconds", type=float, help="整次執行的時間上限（秒），預設不限制")
+        parser.add_argument("--sleep", type=float, default=0, help="批次之間的間隔秒數")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0 or options["batch_seconds"] <= 0:
+            raise CommandError("--batch-size 與 --batch-seconds 必須大於 0")
+
+        def progress(result):
+            self.stdout.write(f"{result.policy}: 已處理 {result.processed} 筆（{result.batches} 批）")
+
+        results = apply_retention(
+            options["policies"],
+            archive=not options["delete"],
+            max_seconds=options["max_seconds"],
+            batch_size=options["batch_size"],
+            batch_seconds=options["batch_seconds"],
+            sleep=options["sleep"],
+            progress=progress,
+        )
+        for result in results:
+            action = "封存" if result.archive else "刪除"
+            message = (
+                f"{result.policy}: {action} {result.processed} 筆，耗時 {result.elapsed:.2f} 秒，"
+                f"{result.throughput:.0f} 筆/秒"
+            )
+            if result.finished:
+                self.stdout.write(self.style.SUCCESS(message))
+            else:
+                self.stdout.write(self.style.WARNING(f"{message}，時間用盡，尚有資料未處理"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "依現有評價重建服務人員、服務與店鋪的評價統計，用於初次導入或修正偏差。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="每次寫入的統計列數")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size 必須大於 0")
+
+        rebuilt = rebuild_ratings(batch_size=options["batch_size"])
+        summary = "、".join(f"{name} {count} 筆" for name, count in rebuilt.items())
+        self.stdout.write(self.style.SUCCESS(f"完成：{summary}"))
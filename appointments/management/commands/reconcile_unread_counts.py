@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from appointments.notifications import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = "依實際的未讀通知重算每位用戶的未讀數，修正計數的偏差，可隨時重複執行。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="每個交易處理的用戶數")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size 必須大於 0")
+
+        def progress(checked, repaired):
+            self.stdout.write(f"已檢查用戶 {checked} 位，修正 {repaired} 位")
+
+        checked, repaired = reconcile_unread_counts(batch_size=options["batch_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"完成：檢查用戶 {checked} 位，修正 {repaired} 位"))
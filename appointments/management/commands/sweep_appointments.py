@@ -0,0 +1,42 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from appointments.sweeper import sweep_appointments
+
+
+class Command(BaseCommand):
+    help = (
+        "排程執行：時段已開始仍待確認的預約取消並釋放名額；啟用到店登記的店鋪，"
+        "時段已結束仍未登記到店的已確認預約標記為未出席。"
+        "依時段結束時間分段處理，每段一個交易，可重複執行。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--since", help="只處理時段結束時間不早於此日期（YYYY-MM-DD）的預約，預設從最早的待處理預約開始")
+        parser.add_argument("--window-hours", type=int, default=24, help="每個交易處理的時段結束時間範圍（小時）")
+        parser.add_argument("--grace-minutes", type=int, help="時段結束後多久才標記未出席，預設使用設定值")
+
+    def handle(self, *args, **options):
+        if options["window_hours"] <= 0:
+            raise CommandError("--window-hours 必須大於 0")
+        if options["grace_minutes"] is not None and options["grace_minutes"] < 0:
+            raise CommandError("--grace-minutes 不可小於 0")
+        since = None
+        if options["since"]:
+            try:
+                since = timezone.make_aware(datetime.combine(date.fromisoformat(options["since"]), time.min))
+            except ValueError:
+                raise CommandError("日期格式錯誤，請使用 YYYY-MM-DD")
+        grace = timedelta(minutes=options["grace_minutes"]) if options["grace_minutes"] is not None else None
+
+        def progress(result, window_end):
+            self.stdout.write(
+                f"處理至 {timezone.localtime(window_end):%Y-%m-%d %H:%M}：未出席 {result.missed} 筆，逾期取消 {result.expired} 筆")
+
+        result = sweep_appointments(
+            since=since, window=timedelta(hours=options["window_hours"]), grace=grace, progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"完成：{result.windows} 個時段範圍，未出席 {result.missed} 筆，逾期取消 {result.expired} 筆，"
+            f"耗時 {result.elapsed:.2f} 秒"))
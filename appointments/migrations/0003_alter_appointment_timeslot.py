@@ -0,0 +1,42 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_booked_count(apps, schema_editor):
+    """依既有的有效預約回填時段的已預約人數。"""
+    Appointment = apps.get_model("appointments", "Appointment")
+    TimeSlot = apps.get_model("store", "TimeSlot")
+    booked = (
+        Appointment.objects.filter(timeslot=OuterRef("pk"))
+        .filter(~Q(status="canceled"))
+        .values("timeslot")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    TimeSlot.objects.update(booked_count=Coalesce(Subquery(booked), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0002_initial"),
+        ("store", "0005_timeslot_booked_count"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="appointment",
+            name="timeslot",
+            field=models.ForeignKey(
+                help_text="關聯到具體的預約時間段",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="appointments",
+                to="store.timeslot",
+            ),
+        ),
+        migrations.RunPython(backfill_booked_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_unread_counts(apps, schema_editor):
+    """依既有的未讀通知建立計數。"""
+    Notification = apps.get_model("appointments", "Notification")
+    NotificationCounter = apps.get_model("appointments", "NotificationCounter")
+    unread = (
+        Notification.objects.filter(is_read=False)
+        .values("user_id")
+        .annotate(total=Count("id"))
+        .order_by()
+    )
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=row["user_id"], unread_count=row["total"]) for row in unread.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0004_hot_path_indexes"),
+        ("users", "0002_user_email_ci_unique"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="NotificationCounter",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        help_text="通知的接收用戶",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="notification_counter",
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "unread_count",
+                    models.PositiveIntegerField(default=0, help_text="未讀通知數"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="最後更新時間"),
+                ),
+            ],
+        ),
+        migrations.RunPython(backfill_unread_counts, migrations.RunPython.noop),
+    ]
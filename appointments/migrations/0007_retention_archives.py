@@ -0,0 +1,58 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0006_notification_inbox_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AppointmentHistoryArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        help_text="原紀錄的 id", primary_key=True, serialize=False
+                    ),
+                ),
+                ("appointment_id", models.BigIntegerField(help_text="對應的預約 id")),
+                (
+                    "status",
+                    models.CharField(help_text="預約變更後的狀態", max_length=20),
+                ),
+                (
+                    "updated_by_id",
+                    models.BigIntegerField(
+                        blank=True, help_text="進行狀態變更的用戶 id", null=True
+                    ),
+                ),
+                ("timestamp", models.DateTimeField(help_text="狀態更新時間")),
+                (
+                    "archived_at",
+                    models.DateTimeField(auto_now_add=True, help_text="封存時間"),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="NotificationArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigIntegerField(
+                        help_text="原通知的 id", primary_key=True, serialize=False
+                    ),
+                ),
+                ("user_id", models.BigIntegerField(help_text="接收通知的用戶 id")),
+                ("message", models.TextField(help_text="通知的具體內容")),
+                ("created_at", models.DateTimeField(help_text="通知創建時間")),
+                (
+                    "archived_at",
+                    models.DateTimeField(auto_now_add=True, help_text="封存時間"),
+                ),
+            ],
+        ),
+    ]
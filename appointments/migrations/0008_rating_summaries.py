@@ -0,0 +1,150 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0007_retention_archives"),
+        ("store", "0007_timeslot_end_time_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ServiceRating",
+            fields=[
+                ("count", models.PositiveIntegerField(default=0, help_text="評價筆數")),
+                ("total", models.PositiveIntegerField(default=0, help_text="評分總和")),
+                (
+                    "stars_1",
+                    models.PositiveIntegerField(default=0, help_text="1 分的筆數"),
+                ),
+                (
+                    "stars_2",
+                    models.PositiveIntegerField(default=0, help_text="2 分的筆數"),
+                ),
+                (
+                    "stars_3",
+                    models.PositiveIntegerField(default=0, help_text="3 分的筆數"),
+                ),
+                (
+                    "stars_4",
+                    models.PositiveIntegerField(default=0, help_text="4 分的筆數"),
+                ),
+                (
+                    "stars_5",
+                    models.PositiveIntegerField(default=0, help_text="5 分的筆數"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="最後更新時間"),
+                ),
+                (
+                    "service",
+                    models.OneToOneField(
+                        help_text="被評價的服務",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_summary",
+                        serialize=False,
+                        to="store.service",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="StaffRating",
+            fields=[
+                ("count", models.PositiveIntegerField(default=0, help_text="評價筆數")),
+                ("total", models.PositiveIntegerField(default=0, help_text="評分總和")),
+                (
+                    "stars_1",
+                    models.PositiveIntegerField(default=0, help_text="1 分的筆數"),
+                ),
+                (
+                    "stars_2",
+                    models.PositiveIntegerField(default=0, help_text="2 分的筆數"),
+                ),
+                (
+                    "stars_3",
+                    models.PositiveIntegerField(default=0, help_text="3 分的筆數"),
+                ),
+                (
+                    "stars_4",
+                    models.PositiveIntegerField(default=0, help_text="4 分的筆數"),
+                ),
+                (
+                    "stars_5",
+                    models.PositiveIntegerField(default=0, help_text="5 分的筆數"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="最後更新時間"),
+                ),
+                (
+                    "staff",
+                    models.OneToOneField(
+                        help_text="被評價的服務人員",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_summary",
+                        serialize=False,
+                        to="store.staff",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="StoreRating",
+            fields=[
+                ("count", models.PositiveIntegerField(default=0, help_text="評價筆數")),
+                ("total", models.PositiveIntegerField(default=0, help_text="評分總和")),
+                (
+                    "stars_1",
+                    models.PositiveIntegerField(default=0, help_text="1 分的筆數"),
+                ),
+                (
+                    "stars_2",
+                    models.PositiveIntegerField(default=0, help_text="2 分的筆數"),
+                ),
+                (
+                    "stars_3",
+                    models.PositiveIntegerField(default=0, help_text="3 分的筆數"),
+                ),
+                (
+                    "stars_4",
+                    models.PositiveIntegerField(default=0, help_text="4 分的筆數"),
+                ),
+                (
+                    "stars_5",
+                    models.PositiveIntegerField(default=0, help_text="5 分的筆數"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="最後更新時間"),
+                ),
+                (
+                    "store",
+                    models.OneToOneField(
+                        help_text="被評價的店鋪",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_summary",
+                        serialize=False,
+                        to="store.store",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0008_rating_summaries"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="appointment",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "待確認"),
+                    ("confirmed", "已確認"),
+                    ("canceled", "已取消"),
+                    ("missed", "未出席"),
+                    ("completed", "已完成"),
+                ],
+                default="pending",
+                help_text="預約狀態，例如待確認、已確認、已取消、未出席或已完成（已到店）",
+                max_length=20,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="appointmenthistory",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "待確認"),
+                    ("confirmed", "已確認"),
+                    ("canceled", "已取消"),
+                    ("missed", "未出席"),
+                    ("completed", "已完成"),
+                ],
+                help_text="預約變更後的狀態",
+                max_length=20,
+            ),
+        ),
+    ]
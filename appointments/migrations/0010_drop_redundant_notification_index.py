@@ -0,0 +1,17 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:37
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0009_appointment_completed_status"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="notification",
+            name="notification_user_read_created",
+        ),
+    ]
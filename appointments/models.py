@@ -18,8 +18,8 @@ class Appointment(models.Model):
         'store.Staff', on_delete=models.CASCADE,
         help_text="關聯到提供服務的服務人員"
     )
-    timeslot = models.OneToOneField(
-        'store.TimeSlot', on_delete=models.CASCADE, related_name="appointments",  # 更新引用
+    timeslot = models.ForeignKey(
+        'store.TimeSlot', on_delete=models.CASCADE, related_name="appointments",  # 同一時段可依容量接受多筆預約
         help_text="關聯到具體的預約時間段"
     )
     status = models.CharField(
@@ -29,9 +29,10 @@ class Appointment(models.Model):
             ('confirmed', '已確認'),
             ('canceled', '已取消'),
             ('missed', '未出席'),
+            ('completed', '已完成'),
         ],
         default='pending',
-        help_text="預約狀態，例如待確認、已確認、已取消或未出席"
+        help_text="預約狀態，例如待確認、已確認、已取消、未出席或已完成（已到店）"
     )
     note = models.TextField(
         blank=True, null=True,
@@ -54,6 +55,12 @@ class Appointment(models.Model):
         help_text="記錄最後修改此預約的用戶"
     )
 
+    class Meta:
+        indexes = [
+            # 客人依狀態查詢自己的預約
+            models.Index(fields=['customer', 'status'], name='appointment_customer_status'),
+        ]
+
     def __str__(self):
         return f"{self.customer.username} -> {self.staff.name}: {self.service.name} ({self.status})"
 
@@ -73,6 +80,7 @@ class AppointmentHistory(models.Model):
             ('confirmed', '已確認'),
             ('canceled', '已取消'),
             ('missed', '未出席'),
+            ('completed', '已完成'),
         ],
         help_text="預約變更後的狀態"
     )
@@ -117,6 +125,62 @@ class Feedback(models.Model):
         return f"{self.appointment.customer.username} - Rating: {self.rating}"
 
 
+class RatingSummary(models.Model):
+    """
+    評價統計：筆數、總分與 1-5 分的分布，顯示平均評分時以主鍵查詢取代 AVG 掃描。
+    由 appointments.ratings 隨評價的新增、修改與刪除增減，以 rebuild_ratings 指令重建。
+    """
+    count = models.PositiveIntegerField(default=0, help_text="評價筆數")
+    total = models.PositiveIntegerField(default=0, help_text="評分總和")
+    stars_1 = models.PositiveIntegerField(default=0, help_text="1 分的筆數")
+    stars_2 = models.PositiveIntegerField(default=0, help_text="2 分的筆數")
+    stars_3 = models.PositiveIntegerField(default=0, help_text="3 分的筆數")
+    stars_4 = models.PositiveIntegerField(default=0, help_text="4 分的筆數")
+    stars_5 = models.PositiveIntegerField(default=0, help_text="5 分的筆數")
+    updated_at = models.DateTimeField(auto_now=True, help_text="最後更新時間")
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average(self):
+        return round(self.total / self.count, 2) if self.count else None
+
+    @property
+    def histogram(self):
+        return [self.stars_1, self.stars_2, self.stars_3, self.stars_4, self.stars_5]
+
+
+class StaffRating(RatingSummary):
+    staff = models.OneToOneField(
+        'store.Staff', on_delete=models.CASCADE, primary_key=True, related_name='rating_summary',
+        help_text="被評價的服務人員"
+    )
+
+    def __str__(self):
+        return f"Staff {self.staff_id}: {self.average} ({self.count})"
+
+
+class ServiceRating(RatingSummary):
+    service = models.OneToOneField(
+        'store.Service', on_delete=models.CASCADE, primary_key=True, related_name='rating_summary',
+        help_text="被評價的服務"
+    )
+
+    def __str__(self):
+        return f"Service {self.service_id}: {self.average} ({self.count})"
+
+
+class StoreRating(RatingSummary):
+    store = models.OneToOneField(
+        'store.Store', on_delete=models.CASCADE, primary_key=True, related_name='rating_summary',
+        help_text="被評價的店鋪"
+    )
+
+    def __str__(self):
+        return f"Store {self.store_id}: {self.average} ({self.count})"
+
+
 class Notification(models.Model):
     """
     通知模型，記錄商家和客人的通知信息。
@@ -137,5 +201,98 @@ class Notification(models.Model):
         help_text="通知創建時間"
     )
 
+    class Meta:
+        indexes = [
+            # 收件匣以 (created_at, id) 游標分頁，索引包含 id 才能直接沿索引接續讀取
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_created'),
+            # 未讀通知只佔少數，以部分索引支援未讀列表；已讀通知佔大多數，已讀列表沿上面的索引篩選即可
+            models.Index(
+                fields=['user', '-created_at', '-id'], name='notification_user_unread',
+                condition=models.Q(is_read=False),
+            ),
+        ]
+
     def __str__(self):
         return f"To {self.user.username}: {self.message}"
+
+
+class NotificationCounter(models.Model):
+    """
+    每位用戶的未讀通知數，顯示未讀徽章時以主鍵查詢取代 COUNT(*)。
+    由 appointments.notifications 在建立、標記已讀與刪除時以原子操作維護，
+    以 reconcile_unread_counts 指令修正偏差。
+    """
+    user = models.OneToOneField(
+        'users.User', on_delete=models.CASCADE, primary_key=True, related_name='notification_counter',
+        help_text="通知的接收用戶"
+    )
+    unread_count = models.PositiveIntegerField(
+        default=0,
+        help_text="未讀通知數"
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="最後更新時間"
+    )
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count}"
+
+
+class NotificationArchive(models.Model):
+    """
+    已封存的通知，由 appointments.retention 從 Notification 移入。
+    只保留查閱紀錄需要的欄位，不建立外鍵與次要索引，主鍵沿用原通知的 id。
+    """
+    id = models.BigIntegerField(
+        primary_key=True,
+        help_text="原通知的 id"
+    )
+    user_id = models.BigIntegerField(
+        help_text="接收通知的用戶 id"
+    )
+    message = models.TextField(
+        help_text="通知的具體內容"
+    )
+    created_at = models.DateTimeField(
+        help_text="通知創建時間"
+    )
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="封存時間"
+    )
+
+    def __str__(self):
+        return f"To {self.user_id}: {self.message}"
+
+
+class AppointmentHistoryArchive(models.Model):
+    """
+    已封存的預約狀態紀錄，由 appointments.retention 從 AppointmentHistory 移入。
+    預約本身可能之後被刪除，因此只記錄 id 而不建立外鍵。
+    """
+    id = models.BigIntegerField(
+        primary_key=True,
+        help_text="原紀錄的 id"
+    )
+    appointment_id = models.BigIntegerField(
+        help_text="對應的預約 id"
+    )
+    status = models.CharField(
+        max_length=20,
+        help_text="預約變更後的狀態"
+    )
+    updated_by_id = models.BigIntegerField(
+        null=True, blank=True,
+        help_text="進行狀態變更的用戶 id"
+    )
+    timestamp = models.DateTimeField(
+        help_text="狀態更新時間"
+    )
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="封存時間"
+    )
+
+    def __str__(self):
+        return f"{self.appointment_id} - {self.status} @ {self.timestamp}"
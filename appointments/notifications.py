@@ -0,0 +1,220 @@
+import base64
+from collections import defaultdict
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+from .services import ACTIVE_STATUSES
+
+INBOX_PAGE_SIZE = 20
+
+
+def store_customers(store_id):
+    """曾在店鋪預約過的客人，用於店鋪公告。"""
+    return get_user_model().objects.filter(appointment__staff__store_id=store_id).distinct()
+
+
+def customers_affected_by_absence(staff_id, day):
+    """服務人員在指定日期仍有效的預約的客人，用於請假或臨時停診通知。"""
+    return get_user_model().objects.filter(
+        appointment__staff_id=staff_id,
+        appointment__timeslot__schedule__date=day,
+        appointment__status__in=ACTIVE_STATUSES,
+    ).distinct()
+
+
+def adjust_unread(deltas):
+    """
+    依 {用戶 id: 增減數} 調整未讀計數。以 UPDATE ... SET unread_count = unread_count + n
+    在資料庫中原子地增減，並以相同增減數分組，通常只需一次 UPDATE。
+    需在呼叫端的交易中執行，與通知的異動一起提交。
+    """
+    by_delta = defaultdict(list)
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(user_id)
+    for delta, user_ids in by_delta.items():
+        if delta > 0:
+            # 尚未有計數的用戶先建立，已存在的略過
+            NotificationCounter.objects.bulk_create(
+                [NotificationCounter(user_id=user_id) for user_id in user_ids], ignore_conflicts=True)
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(
+            unread_count=Greatest(F('unread_count') + delta, 0), updated_at=timezone.now())
+
+
+def get_unread_count(user_id):
+    count = NotificationCounter.objects.filter(user_id=user_id).values_list('unread_count', flat=True).first()
+    return count or 0
+
+
+def mark_read(user_id, *filters, **lookups):
+    """
+    將用戶符合條件的未讀通知標記為已讀並同步扣減未讀數，回傳標記的數量。
+    不指定條件時標記全部。
+    """
+    with transaction.atomic():
+        updated = Notification.objects.filter(user_id=user_id, is_read=False).filter(
+            *filters, **lookups).update(is_read=True)
+        adjust_unread({user_id: -updated})
+    return updated
+
+
+def delete_notifications(notifications):
+    """
+    刪除 notifications（通知的 QuerySet）並扣減未讀數，回傳刪除的數量。
+    先以一次彙總查詢計算每位用戶被刪除的未讀數，再整批刪除，不逐筆載入通知。
+    彙總與刪除之間被標記已讀的通知會多扣一次，由 reconcile_unread_counts 修正。
+    """
+    with transaction.atomic():
+        unread = (
+            notifications.filter(is_read=False).values('user_id').annotate(total=Count('id')).order_by()
+            .values_list('user_id', 'total')
+        )
+        deltas = {user_id: -total for user_id, total in unread}
+        deleted, _ = notifications.delete()
+        adjust_unread(deltas)
+    return deleted
+
+
+def insert_notifications(user_ids, message):
+    """在一個短交易中為一批用戶建立相同內容的通知，並增加未讀數。"""
+    with transaction.atomic():
+        Notification.objects.bulk_create(
+            [Notification(user_id=user_id, message=message) for user_id in user_ids])
+        deltas = defaultdict(int)
+        for user_id in user_ids:
+            deltas[user_id] += 1
+        adjust_unread(deltas)
+
+
+def fan_out(audience, message, batch_size=1000, progress=None):
+    """
+    對 audience（用戶的 QuerySet）中的每位用戶建立一則通知，回傳建立的通知數。
+
+    以主鍵遞增的方式分批讀取用戶 id，每批在獨立的短交易中寫入，
+    記憶體中最多只有一批 id，也不會在整個發送過程中長時間持有交易或鎖。
+    """
+    user_ids = audience.order_by('pk').values_list('pk', flat=True)
+    last_id = 0
+    total = 0
+    while True:
+        batch = list(user_ids.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        insert_notifications(batch, message)
+        total += len(batch)
+        last_id = batch[-1]
+        if progress:
+            progress(total)
+    return total
+
+
+def reconcile_unread_counts(batch_size=1000, progress=None):
+    """
+    以實際的未讀通知數修正計數，回傳 (檢查的用戶數, 修正的用戶數)。
+
+    依用戶主鍵分批處理，每批先鎖定計數再計算未讀數，
+    同時間建立或標記已讀的通知會等待鎖釋放後再增減，修正後的值不會被覆蓋成舊值。
+    """
+    users = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+    last_id = 0
+    checked = 0
+    repaired = 0
+    while True:
+        user_ids = list(users.filter(pk__gt=last_id)[:batch_size])
+        if not user_ids:
+            break
+        with transaction.atomic():
+            counters = {
+                counter.user_id: counter
+                for counter in NotificationCounter.objects.select_for_update().filter(user_id__in=user_ids)
+            }
+            actual = dict(
+                Notification.objects.filter(user_id__in=user_ids, is_read=False)
+                .values('user_id').annotate(total=Count('id')).order_by()
+                .values_list('user_id', 'total')
+            )
+            now = timezone.now()
+            drifted = []
+            missing = []
+            for user_id in user_ids:
+                count = actual.get(user_id, 0)
+                counter = counters.get(user_id)
+                if counter is None:
+                    if count:
+                        missing.append(NotificationCounter(user_id=user_id, unread_count=count))
+                elif counter.unread_count != count:
+                    counter.unread_count = count
+                    counter.updated_at = now
+                    drifted.append(counter)
+            NotificationCounter.objects.bulk_update(drifted, ['unread_count', 'updated_at'])
+            NotificationCounter.objects.bulk_create(missing, ignore_conflicts=True)
+        checked += len(user_ids)
+        repaired += len(drifted) + len(missing)
+        last_id = user_ids[-1]
+        if progress:
+            progress(checked, repaired)
+    return checked, repaired
+
+
+def encode_cursor(notification):
+    """以通知的 (created_at, id) 產生收件匣的游標。"""
+    raw = f"{notification.created_at.isoformat()}|{notification.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """解析游標為 (created_at, id)，格式錯誤時拋出 ValueError。"""
+    created_at, notification_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    created_at = datetime.fromisoformat(created_at)
+    if timezone.is_naive(created_at):
+        raise ValueError("游標缺少時區")
+    return created_at, int(notification_id)
+
+
+def _older_than(cursor):
+    """排在游標之後（較舊）的通知。"""
+    created_at, notification_id = decode_cursor(cursor)
+    return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=notification_id)
+
+
+def inbox_page(user_id, cursor=None, is_read=None, limit=INBOX_PAGE_SIZE):
+    """
+    依 (created_at, id) 由新到舊取得一頁通知，回傳 (通知, 下一頁的游標)，沒有下一頁時游標為 None。
+
+    以游標條件取代 OFFSET，每一頁都只沿著 (user, created_at, id) 索引讀取 limit + 1 列，
+    不論往後翻多少頁，查詢成本都相同。is_read 為 None 時不篩選已讀狀態。
+    """
+    notifications = Notification.objects.filter(user_id=user_id)
+    if is_read is not None:
+        notifications = notifications.filter(is_read=is_read)
+    if cursor:
+        notifications = notifications.filter(_older_than(cursor))
+    page = list(notifications.order_by('-created_at', '-id')[:limit + 1])
+    if len(page) > limit:
+        return page[:limit], encode_cursor(page[limit - 1])
+    return page, None
+
+
+def mark_range_read(user_id, after=None, until=None, newest=None):
+    """
+    將游標區間內的未讀通知標記為已讀，回傳標記的數量。
+    區間的上界為 after（不含，載入該頁時使用的游標）或 newest（包含，該頁第一則的游標），
+    下界為 until（包含，該頁最後一則的游標），皆未指定時標記全部。
+    第一頁沒有 after，需以 newest 限制上界，載入頁面後才新增的通知才不會被一併標記。
+    """
+    filters = []
+    if after:
+        filters.append(_older_than(after))
+    if newest:
+        created_at, notification_id = decode_cursor(newest)
+        filters.append(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lte=notification_id))
+    if until:
+        created_at, notification_id = decode_cursor(until)
+        filters.append(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gte=notification_id))
+    return mark_read(user_id, *filters)
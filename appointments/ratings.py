@@ -0,0 +1,142 @@
+"""
+服務人員、服務與店鋪的評價統計。
+
+評價新增、修改或刪除時，由 appointments.signals 呼叫 adjust_ratings，
+以 UPDATE ... SET count = count + n 在資料庫中原子地增減三張統計表，
+顯示平均評分與分布時只需以主鍵讀取一列。
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from store.models import Service, Staff, Store
+from .models import Appointment, Feedback, ServiceRating, StaffRating, StoreRating
+
+STARS = range(1, 6)
+
+# (統計表, 統計表的主鍵欄位, 預約上對應的欄位)
+SUMMARIES = (
+    (StaffRating, 'staff_id', 'staff_id'),
+    (ServiceRating, 'service_id', 'service_id'),
+    (StoreRating, 'store_id', 'staff__store_id'),
+)
+
+
+def adjust_ratings(appointment_id, changes):
+    """
+    依 {評分: 增減數} 調整預約對應的服務人員、服務與店鋪的統計。
+    需在呼叫端的交易中執行，與評價的異動一起提交。預約已不存在時略過，由 rebuild_ratings 修正。
+    """
+    changes = {rating: delta for rating, delta in changes.items() if delta and rating in STARS}
+    if not changes:
+        return
+    targets = Appointment.objects.filter(pk=appointment_id).values(
+        *(source for _, _, source in SUMMARIES)).first()
+    if targets is None:
+        return
+
+    count = sum(changes.values())
+    total = sum(rating * delta for rating, delta in changes.items())
+    for model, key, source in SUMMARIES:
+        if any(delta > 0 for delta in changes.values()):
+            # 尚未有統計的對象先建立，已存在的略過
+            model.objects.bulk_create([model(**{key: targets[source]})], ignore_conflicts=True)
+        values = {
+            f'stars_{rating}': Greatest(F(f'stars_{rating}') + delta, 0)
+            for rating, delta in changes.items()
+        }
+        if count:
+            values['count'] = Greatest(F('count') + count, 0)
+        if total:
+            values['total'] = Greatest(F('total') + total, 0)
+        model.objects.filter(**{key: targets[source]}).update(**values)
+
+
+FIELDS = ['count', 'total', *(f'stars_{rating}' for rating in STARS)]
+
+
+def _aggregate(source, targets):
+    """依預約上的 source 欄位分組計算 targets 實際的評價統計，返回 {對象 id: 統計}。"""
+    stars = {f'stars_{rating}': Count('id', filter=Q(rating=rating)) for rating in STARS}
+    rows = (
+        Feedback.objects.filter(**{f'appointment__{source}__in': targets})
+        .values(target=F(f'appointment__{source}'))
+        .annotate(count=Count('id'), total=Sum('rating'), **stars)
+        .order_by()
+    )
+    return {row.pop('target'): row for row in rows}
+
+
+def rebuild_ratings(batch_size=1000):
+    """
+    以實際的評價重建三張統計表，用於初次導入或修正偏差，返回 {統計表名稱: 列數}。
+
+    先為有評價但沒有統計的對象建立空的統計列，再依主鍵分批，每批在一個交易中
+    先鎖定統計列、後計算這些對象的評價並覆寫。同時新增評價的交易若已提交，
+    鎖定後的彙總會計入；若尚未提交，其增減會等待鎖釋放後再加在重建的結果上，不會遺失。
+    """
+    rebuilt = {}
+    for model, key, source in SUMMARIES:
+        targets = Feedback.objects.filter(**{f'appointment__{source}__isnull': False}).values_list(
+            f'appointment__{source}', flat=True).distinct().order_by()
+        model.objects.bulk_create(
+            [model(**{key: target}) for target in targets], batch_size=batch_size, ignore_conflicts=True)
+
+        processed = 0
+        last = None
+        while True:
+            with transaction.atomic():
+                summaries = model.objects.select_for_update().order_by(key)
+                if last is not None:
+                    summaries = summaries.filter(**{f'{key}__gt': last})
+                summaries = list(summaries[:batch_size])
+                if not summaries:
+                    break
+                ids = [getattr(summary, key) for summary in summaries]
+                actual = _aggregate(source, ids)
+                now = timezone.now()
+                for summary in summaries:
+                    row = actual.get(getattr(summary, key), {})
+                    for field in FIELDS:
+                        setattr(summary, field, row.get(field) or 0)
+                    summary.updated_at = now
+                model.objects.bulk_update(summaries, [*FIELDS, 'updated_at'])
+            processed += len(summaries)
+            last = ids[-1]
+        rebuilt[model._meta.model_name] = processed
+    return rebuilt
+
+
+def _as_dict(summary):
+    if summary is None:
+        return {"count": 0, "average": None, "histogram": [0] * len(STARS)}
+    return {"count": summary.count, "average": summary.average, "histogram": summary.histogram}
+
+
+def _summary(instance):
+    # 反向的一對一關聯不存在時會拋出 DoesNotExist
+    try:
+        return instance.rating_summary
+    except (StaffRating.DoesNotExist, ServiceRating.DoesNotExist, StoreRating.DoesNotExist):
+        return None
+
+
+def store_ratings(store_id):
+    """
+    讀取店鋪與其啟用中的服務人員、服務的評價統計，共三次查詢，不需掃描評價。
+    店鋪不存在時返回 None。
+    """
+    store = Store.objects.filter(pk=store_id, is_active=True).select_related('rating_summary').first()
+    if store is None:
+        return None
+    staff = Staff.objects.filter(store_id=store_id, is_active=True).select_related('rating_summary').order_by('id')
+    services = Service.objects.filter(
+        store_id=store_id, is_active=True).select_related('rating_summary').order_by('id')
+    return {
+        "store": _as_dict(_summary(store)),
+        "staff": [{"id": member.id, "name": member.name, **_as_dict(_summary(member))} for member in staff],
+        "services": [
+            {"id": service.id, "name": service.name, **_as_dict(_summary(service))} for service in services
+        ],
+    }
@@ -0,0 +1,146 @@
+"""
+資料保留：把超過保留期限的資料列分批移到封存表，或直接刪除。
+
+每批在獨立的短交易中完成「鎖定 → 寫入封存表 → 刪除」，鎖定時略過其他交易正在使用的列，
+並依實際耗時調整批次大小，使每批維持在 batch_seconds 左右，不會長時間持有鎖或拖慢線上請求。
+封存表以原本的 id 為主鍵並略過重複，中斷後重新執行不會重複封存。
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AppointmentHistory, AppointmentHistoryArchive, Notification, NotificationArchive
+
+MIN_BATCH_SIZE = 10
+
+
+class RetentionPolicy:
+    """
+    一種資料的保留規則。candidates(cutoff) 返回超過期限的資料列，
+    fields 為封存時複製的欄位，封存表以相同名稱的欄位儲存。
+    """
+
+    def __init__(self, name, model, archive_model, days_setting, fields, candidates):
+        self.name = name
+        self.model = model
+        self.archive_model = archive_model
+        self.days_setting = days_setting
+        self.fields = fields
+        self.candidates = candidates
+
+    @property
+    def days(self):
+        return getattr(settings, self.days_setting)
+
+    def cutoff(self, now):
+        return now - timedelta(days=self.days)
+
+
+def _read_notifications(cutoff):
+    # 只處理已讀通知，未讀數不受影響
+    return Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+
+def _closed_appointment_history(cutoff):
+    # 時段已結束超過期限的預約，其狀態不會再變更
+    return AppointmentHistory.objects.filter(appointment__timeslot__end_time__lt=cutoff)
+
+
+POLICIES = {
+    policy.name: policy
+    for policy in (
+        RetentionPolicy(
+            "notifications", Notification, NotificationArchive, "RETENTION_NOTIFICATION_DAYS",
+            ("id", "user_id", "message", "created_at"), _read_notifications,
+        ),
+        RetentionPolicy(
+            "appointment_history", AppointmentHistory, AppointmentHistoryArchive, "RETENTION_HISTORY_DAYS",
+            ("id", "appointment_id", "status", "updated_by_id", "timestamp"), _closed_appointment_history,
+        ),
+    )
+}
+
+
+class RetentionResult:
+    def __init__(self, policy, archive):
+        self.policy = policy
+        self.archive = archive
+        self.processed = 0
+        self.batches = 0
+        self.elapsed = 0.0
+        # False 表示時間用盡，仍有資料未處理
+        self.finished = False
+
+    @property
+    def throughput(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+
+def _process_batch(policy, cutoff, last_id, size, archive):
+    """在一個短交易中封存並刪除一批資料，返回處理的 id。"""
+    with transaction.atomic():
+        rows = list(
+            policy.candidates(cutoff).filter(pk__gt=last_id).order_by("pk")
+            .select_for_update(skip_locked=True, of=("self",))
+            .values(*policy.fields)[:size]
+        )
+        ids = [row["id"] for row in rows]
+        if not ids:
+            return ids
+        if archive:
+            policy.archive_model.objects.bulk_create(
+                [policy.archive_model(**row) for row in rows], ignore_conflicts=True)
+        policy.model.objects.filter(pk__in=ids).delete()
+    return ids
+
+
+def apply_policy(policy, archive=True, batch_size=500, batch_seconds=0.5, deadline=None, sleep=0,
+                 now=None, progress=None):
+    """
+    依 policy 處理超過期限的資料，返回 RetentionResult。
+
+    以主鍵遞增的方式分批處理，被其他交易鎖住而略過的列留待下次執行。
+    單批耗時超過 batch_seconds 時批次減半，明顯較快時加倍，最多為 batch_size。
+    到達 deadline（time.monotonic() 的時間）後停止，sleep 為批次之間的間隔秒數。
+    """
+    cutoff = policy.cutoff(now or timezone.now())
+    result = RetentionResult(policy.name, archive)
+    started = time.monotonic()
+    last_id = 0
+    size = batch_size
+    while deadline is None or time.monotonic() < deadline:
+        batch_started = time.monotonic()
+        ids = _process_batch(policy, cutoff, last_id, size, archive)
+        if not ids:
+            result.finished = True
+            break
+        last_id = ids[-1]
+        result.processed += len(ids)
+        result.batches += 1
+
+        took = time.monotonic() - batch_started
+        if took > batch_seconds:
+            size = max(MIN_BATCH_SIZE, size // 2)
+        elif took < batch_seconds / 2:
+            size = min(batch_size, size * 2)
+        if progress:
+            progress(result)
+        if sleep:
+            time.sleep(sleep)
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+def apply_retention(names=None, archive=True, max_seconds=None, **options):
+    """
+    依序執行指定名稱（預設全部）的保留規則，返回各規則的 RetentionResult。
+    max_seconds 為所有規則共用的時間上限，其餘參數同 apply_policy。
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+    return [
+        apply_policy(POLICIES[name], archive=archive, deadline=deadline, **options)
+        for name in (names or POLICIES)
+    ]
@@ -0,0 +1,139 @@
+import logging
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from store.models import TimeSlot
+from store.occupancy import RELEASED_STATUSES, lock_interval, mark_booked, overlaps_booking
+from .models import Appointment, AppointmentHistory
+
+logger = logging.getLogger(__name__)
+
+# 仍佔用名額的預約狀態
+ACTIVE_STATUSES = ('pending', 'confirmed')
+
+# 錯誤訊息
+SLOT_NOT_FOUND = "時段不存在"
+SLOT_EXPIRED = "時段已過期"
+SLOT_FULL = "時段已額滿"
+STAFF_CONFLICT = "服務人員在該時段已有其他預約"
+APPOINTMENT_NOT_FOUND = "預約不存在"
+APPOINTMENT_NOT_CANCELABLE = "預約無法取消"
+APPOINTMENT_NOT_COMPLETABLE = "預約無法標記為已到店"
+
+
+def _staff_conflict(occupancies, staff_id, timeslot_id, start, end):
+    """
+    以已鎖定的佔用位圖判斷服務人員是否已有其他時段的預約與區間重疊，需在交易中呼叫。
+    同一時段的其他客人共用同一位服務人員，不算衝突。位圖沒有碰到已預約的格時不必查詢預約。
+    """
+    if not any(overlaps_booking(occupancy, start, end) for occupancy in occupancies):
+        return False
+    return Appointment.objects.filter(
+        staff_id=staff_id,
+        timeslot__start_time__lt=end,
+        timeslot__end_time__gt=start,
+    ).exclude(status__in=RELEASED_STATUSES).exclude(timeslot_id=timeslot_id).exists()
+
+
+def book_timeslot(customer, timeslot_id, note=None):
+    """
+    預約指定時段，返回預約或 None，並附帶錯誤訊息。
+
+    先以單一條件式 UPDATE 同時檢查並增加已預約人數，同一時段的並行預約不會超賣。
+    再鎖定服務人員在時段涵蓋日期的佔用位圖列，確認沒有其他服務的時段預約與之重疊，
+    同一位服務人員的並行預約因此依序進行，不會經由不同服務的重疊時段被重複預約，
+    有重疊時整個交易回滾。取消預約同樣先更新時段列、後更新位圖列，兩者並行時不會形成死結。
+    建立預約後直接在已鎖定的位圖列上加入佔用的格，不經由訊號重算整天的位圖。
+    """
+    with transaction.atomic():
+        reserved = TimeSlot.objects.filter(
+            pk=timeslot_id,
+            is_active=True,
+            start_time__gt=timezone.now(),
+            booked_count__lt=F('max_capacity'),
+        ).update(booked_count=F('booked_count') + 1, updated_at=timezone.now())
+
+        if not reserved:
+            timeslot = TimeSlot.objects.filter(pk=timeslot_id).first()
+            if timeslot is None or not timeslot.is_active:
+                return None, SLOT_NOT_FOUND
+            if timeslot.start_time <= timezone.now():
+                return None, SLOT_EXPIRED
+            return None, SLOT_FULL
+
+        timeslot = TimeSlot.objects.select_related('schedule').get(pk=timeslot_id)
+        staff_id = timeslot.schedule.staff_id
+        occupancies = lock_interval(staff_id, timeslot.start_time, timeslot.end_time)
+        if _staff_conflict(occupancies, staff_id, timeslot.id, timeslot.start_time, timeslot.end_time):
+            # 連同已增加的預約人數一併回滾
+            transaction.set_rollback(True)
+            return None, STAFF_CONFLICT
+
+        mark_booked(occupancies, timeslot.start_time, timeslot.end_time)
+        appointment = Appointment(
+            customer=customer,
+            service_id=timeslot.service_id,
+            staff_id=staff_id,
+            timeslot=timeslot,
+            note=note,
+            created_by=customer,
+            updated_by=customer,
+        )
+        # 位圖已更新，儲存時的訊號不必再重算
+        appointment._occupancy_updated = True
+        appointment.save()
+        AppointmentHistory.objects.create(
+            appointment=appointment, status=appointment.status, updated_by=customer)
+
+    logger.info(f"預約成功: appointment={appointment.id}, timeslot={timeslot_id}, customer={customer.id}")
+    return appointment, None
+
+
+def cancel_appointment(customer, appointment_id):
+    """
+    取消客人自己的預約並釋放時段名額，返回預約或 None，並附帶錯誤訊息。
+    """
+    with transaction.atomic():
+        appointment = Appointment.objects.select_for_update().filter(
+            pk=appointment_id, customer=customer).first()
+        if appointment is None:
+            return None, APPOINTMENT_NOT_FOUND
+        if appointment.status not in ACTIVE_STATUSES:
+            return None, APPOINTMENT_NOT_CANCELABLE
+
+        # 先釋放時段名額再儲存預約（儲存時會鎖定佔用位圖列），與預約時段的鎖定順序一致
+        TimeSlot.objects.filter(pk=appointment.timeslot_id, booked_count__gt=0).update(
+            booked_count=F('booked_count') - 1, updated_at=timezone.now())
+        appointment.status = 'canceled'
+        appointment.updated_by = customer
+        appointment.save(update_fields=['status', 'updated_by', 'updated_at'])
+        AppointmentHistory.objects.create(
+            appointment=appointment, status=appointment.status, updated_by=customer)
+
+    logger.info(f"預約取消: appointment={appointment.id}, customer={customer.id}")
+    return appointment, None
+
+
+def complete_appointment(merchant, appointment_id):
+    """
+    商家登記客人已到店，將時段已開始的已確認預約改為已完成，返回預約或 None，並附帶錯誤訊息。
+    啟用 Store.tracks_attendance 的店鋪，未登記到店的預約會由 sweep_appointments 標記為未出席。
+    """
+    with transaction.atomic():
+        appointment = Appointment.objects.select_for_update(of=('self',)).select_related('timeslot').filter(
+            pk=appointment_id, staff__store__merchant=merchant).first()
+        if appointment is None:
+            return None, APPOINTMENT_NOT_FOUND
+        if appointment.status != 'confirmed' or appointment.timeslot.start_time > timezone.now():
+            return None, APPOINTMENT_NOT_COMPLETABLE
+
+        appointment.status = 'completed'
+        appointment.updated_by = merchant
+        appointment.save(update_fields=['status', 'updated_by', 'updated_at'])
+        AppointmentHistory.objects.create(
+            appointment=appointment, status=appointment.status, updated_by=merchant)
+
+    logger.info(f"預約已到店: appointment={appointment.id}, merchant={merchant.id}")
+    return appointment, None
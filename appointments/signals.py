@@ -0,0 +1,101 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from store.models import TimeSlot
+from store.occupancy import refresh_for_interval
+from store.rollups import mark_dirty
+from .models import Appointment, Feedback, Notification
+from .notifications import adjust_unread
+from .ratings import adjust_ratings
+
+
+def _refresh(staff_id, timeslot_id, occupancy=True):
+    """重新計算時段涵蓋日期的佔用位圖，並標記該日的營運統計需要重算。occupancy 為假時只標記統計。"""
+    slot = TimeSlot.objects.filter(pk=timeslot_id).values_list(
+        'start_time', 'end_time', 'schedule__staff__store_id').first()
+    if slot:
+        start, end, store_id = slot
+        if occupancy:
+            refresh_for_interval(staff_id, start, end)
+        # 與預約異動在同一交易中標記，標記只插入新列，同店同日的並行預約不會互相等待
+        mark_dirty([(store_id, timezone.localdate(start))])
+
+
+@receiver(post_init, sender=Appointment)
+def remember_appointment_slot(sender, instance, **kwargs):
+    """記錄預約載入時的人員與時段，以便改期或換人後一併更新舊的位圖。"""
+    instance._occupancy_original = (
+        instance.__dict__.get('staff_id'), instance.__dict__.get('timeslot_id'))
+
+
+@receiver(post_save, sender=Appointment)
+def update_occupancy_on_appointment_save(sender, instance, **kwargs):
+    """
+    預約建立、取消或標記未出席後更新服務人員的佔用位圖。
+    呼叫端已在鎖定的位圖列上更新時（_occupancy_updated，見 book_timeslot）不再重算。
+    """
+    current = (instance.staff_id, instance.timeslot_id)
+    _refresh(*current, occupancy=not getattr(instance, '_occupancy_updated', False))
+    instance._occupancy_updated = False
+    original = getattr(instance, '_occupancy_original', (None, None))
+    if None not in original and original != current:
+        _refresh(*original)
+    instance._occupancy_original = current
+
+
+@receiver(post_delete, sender=Appointment)
+def update_occupancy_on_appointment_delete(sender, instance, **kwargs):
+    _refresh(instance.staff_id, instance.timeslot_id)
+
+
+@receiver(post_init, sender=Notification)
+def remember_notification_read_state(sender, instance, **kwargs):
+    """記錄通知載入時的已讀狀態，以便逐筆儲存時判斷是否需要調整未讀數。"""
+    instance._was_read = instance.__dict__.get('is_read')
+
+
+@receiver(post_save, sender=Notification)
+def update_unread_count_on_notification_save(sender, instance, created, **kwargs):
+    """
+    逐筆建立或變更已讀狀態時調整未讀數。
+    bulk_create 與 QuerySet.update 不會觸發此訊號，需改用 appointments.notifications 的函式。
+    刪除不經由訊號處理，以免 QuerySet.delete 與刪除用戶時逐筆載入通知，需改用 delete_notifications。
+    """
+    if created:
+        delta = 0 if instance.is_read else 1
+    elif instance._was_read is not None and instance._was_read != instance.is_read:
+        delta = -1 if instance.is_read else 1
+    else:
+        delta = 0
+    if delta:
+        adjust_unread({instance.user_id: delta})
+    instance._was_read = instance.is_read
+
+
+@receiver(post_init, sender=Feedback)
+def remember_feedback_rating(sender, instance, **kwargs):
+    """記錄評價載入時的預約與評分，以便修改後從舊的統計扣除。"""
+    instance._rating_original = (
+        instance.__dict__.get('appointment_id'), instance.__dict__.get('rating'))
+
+
+@receiver(post_save, sender=Feedback)
+def update_ratings_on_feedback_save(sender, instance, created, **kwargs):
+    """評價建立或修改評分後增減統計。"""
+    original_appointment, original_rating = instance._rating_original
+    current = (instance.appointment_id, instance.rating)
+    if created:
+        adjust_ratings(instance.appointment_id, {instance.rating: 1})
+    elif original_rating is not None and (original_appointment, original_rating) != current:
+        if original_appointment == instance.appointment_id:
+            adjust_ratings(instance.appointment_id, {original_rating: -1, instance.rating: 1})
+        else:
+            adjust_ratings(original_appointment, {original_rating: -1})
+            adjust_ratings(instance.appointment_id, {instance.rating: 1})
+    instance._rating_original = current
+
+
+@receiver(post_delete, sender=Feedback)
+def update_ratings_on_feedback_delete(sender, instance, **kwargs):
+    adjust_ratings(instance.appointment_id, {instance._rating_original[1]: -1})
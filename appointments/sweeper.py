@@ -0,0 +1,132 @@
+"""
+預約狀態的排程掃描：時段開始時仍待確認的預約視為逾期並取消；
+啟用到店登記（Store.tracks_attendance）的店鋪，時段結束後仍未登記到店的已確認預約標記為未出席。
+未啟用的店鋪沒有到店紀錄可判斷，已確認的預約維持不變。
+
+依 TimeSlot.end_time 將資料切成固定長度的時間視窗，每個視窗在一個交易中
+以集合式 UPDATE 變更狀態、以 bulk_create 寫入對應的狀態紀錄，並釋放逾期預約的時段名額。
+QuerySet.update 不會觸發 post_save，受影響人員與日期的佔用位圖在視窗提交後於此明確重算，
+並標記營運統計需要重算的日期。
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min, Q
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from store.models import TimeSlot
+from store.occupancy import local_dates, refresh_occupancy
+from store.rollups import mark_staff_days
+from .models import Appointment, AppointmentHistory
+
+logger = logging.getLogger(__name__)
+
+# 時段結束後仍為已確認、且店鋪有登記到店的預約，才可判斷為未出席
+MISSED_CANDIDATES = Q(status='confirmed', staff__store__tracks_attendance=True)
+
+
+class SweepResult:
+    def __init__(self):
+        self.windows = 0
+        self.missed = 0
+        self.expired = 0
+        self.elapsed = 0.0
+
+
+def _release_slots(timeslot_counts):
+    """依 {時段 id: 釋放人數} 扣減已預約人數，相同人數的時段以一次 UPDATE 處理。"""
+    by_count = defaultdict(list)
+    for timeslot_id, count in timeslot_counts.items():
+        by_count[count].append(timeslot_id)
+    for count, timeslot_ids in by_count.items():
+        TimeSlot.objects.filter(pk__in=timeslot_ids).update(
+            booked_count=Greatest(F('booked_count') - count, 0), updated_at=timezone.now())
+
+
+def _transition(appointments, to_status, release=False):
+    """
+    將 appointments 改為 to_status 並寫入狀態紀錄，需在交易中呼叫。
+    返回變更的 (id, 人員 id, 時段 id, 開始時間, 結束時間)。
+    """
+    rows = list(
+        appointments.select_for_update(of=('self',))
+        .values_list('id', 'staff_id', 'timeslot_id', 'timeslot__start_time', 'timeslot__end_time')
+    )
+    if not rows:
+        return rows
+    ids = [row[0] for row in rows]
+    Appointment.objects.filter(pk__in=ids).update(
+        status=to_status, updated_by=None, updated_at=timezone.now())
+    AppointmentHistory.objects.bulk_create(
+        [AppointmentHistory(appointment_id=appointment_id, status=to_status) for appointment_id in ids])
+    if release:
+        released = defaultdict(int)
+        for row in rows:
+            released[row[2]] += 1
+        _release_slots(released)
+    return rows
+
+
+def sweep_window(window_start, window_end, now, grace):
+    """
+    處理時段結束時間落在 [window_start, window_end) 的預約，返回 (未出席數, 逾期數)。
+    """
+    in_window = Appointment.objects.filter(
+        timeslot__end_time__gte=window_start, timeslot__end_time__lt=window_end)
+    with transaction.atomic():
+        missed = _transition(
+            in_window.filter(MISSED_CANDIDATES, timeslot__end_time__lt=now - grace), 'missed')
+        expired = _transition(
+            in_window.filter(status='pending', timeslot__start_time__lte=now), 'canceled', release=True)
+        affected = {
+            (staff_id, day)
+            for _, staff_id, _, start, end in missed + expired
+            for day in local_dates(start, end)
+        }
+        # 與狀態轉換一起提交，避免提交後中斷而遺漏統計的重算
+        mark_staff_days(affected)
+
+    for staff_id, day in sorted(affected, key=lambda pair: (pair[1], pair[0])):
+        refresh_occupancy(staff_id, day)
+    return len(missed), len(expired)
+
+
+def sweep_appointments(since=None, window=timedelta(hours=24), grace=None, now=None, progress=None):
+    """
+    依時間視窗處理所有待轉換的預約，返回 SweepResult。
+
+    since 預設為仍需處理的預約中最早的時段結束時間，掃描到目前進行中的時段為止。
+    grace 為時段結束後多久才標記未出席，預設為 APPOINTMENT_MISSED_GRACE_MINUTES。
+    """
+    now = now or timezone.now()
+    if grace is None:
+        grace = timedelta(minutes=settings.APPOINTMENT_MISSED_GRACE_MINUTES)
+    # 已開始但尚未結束的時段，結束時間晚於 now，其中待確認的預約仍需逾期處理
+    bounds = Appointment.objects.filter(
+        MISSED_CANDIDATES | Q(status='pending'), timeslot__start_time__lte=now,
+    ).aggregate(earliest=Min('timeslot__end_time'), latest=Max('timeslot__end_time'))
+    if since is None:
+        since = bounds['earliest']
+
+    result = SweepResult()
+    started = time.monotonic()
+    window_start = since
+    while window_start is not None and bounds['latest'] is not None and window_start <= bounds['latest']:
+        window_end = window_start + window
+        missed, expired = sweep_window(window_start, window_end, now, grace)
+        result.windows += 1
+        result.missed += missed
+        result.expired += expired
+        if progress:
+            progress(result, window_end)
+        window_start = window_end
+    result.elapsed = time.monotonic() - started
+    logger.info(
+        f"預約狀態掃描完成: windows={result.windows}, missed={result.missed}, expired={result.expired}, "
+        f"elapsed={result.elapsed:.2f}s")
+    return result
@@ -1,3 +1,785 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from datetime import datetime, time, timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from booking_system.testing import QueryBudgetMixin, QueryPlanMixin, login, requires_plan_support
+from store.models import Store, Staff, Service, StaffOccupancy, WorkSchedule, TimeSlot
+from store.occupancy import interval_mask, local_dates, refresh_occupancy, to_int
+from .models import (
+    Appointment, AppointmentHistory, AppointmentHistoryArchive, Feedback, Notification, NotificationArchive,
+    NotificationCounter, ServiceRating, StaffRating, StoreRating,
+)
+from .notifications import (
+    INBOX_PAGE_SIZE, customers_affected_by_absence, delete_notifications, encode_cursor, fan_out,
+    get_unread_count, inbox_page, insert_notifications, mark_read, store_customers, _older_than,
+)
+from .retention import POLICIES, apply_policy
+from .sweeper import sweep_appointments
+from .services import book_timeslot, cancel_appointment, SLOT_FULL, STAFF_CONFLICT
+from . import urls
+
+# 使用自訂的用戶模型
+User = get_user_model()
+
+
+def create_timeslot(max_capacity=1):
+    """建立一個明天開始、可預約的時段。"""
+    merchant = User.objects.create_user(
+        username="merchant", email="merchant@example.com", password="TestPassword123!")
+    store = Store.objects.create(
+        merchant=merchant, name="幸福剪髮", opening_time=time(9), closing_time=time(18))
+    staff = Staff.objects.create(store=store, name="Alice")
+    service = Service.objects.create(store=store, name="剪髮", price=300, duration=60)
+    start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+    schedule = WorkSchedule.objects.create(
+        staff=staff, date=timezone.localdate(start),
+        start_time=time(0), end_time=time(23, 55))
+    return TimeSlot.objects.create(
+        schedule=schedule, service=service, start_time=start,
+        end_time=start + timedelta(hours=1), max_capacity=max_capacity)
+
+
+def create_future_slot(timeslot):
+    """在同一排班中建立一個晚一天、可預約的時段。"""
+    return TimeSlot.objects.create(
+        schedule=timeslot.schedule, service=timeslot.service,
+        start_time=timeslot.start_time + timedelta(days=1),
+        end_time=timeslot.end_time + timedelta(days=1), max_capacity=1)
+
+
+class BookingTest(TestCase):
+    def setUp(self):
+        """
+        初始化可容納兩人的時段與三位客人。
+        """
+        session = self.client.session
+        session["security_verified"] = True
+        session.save()
+
+        self.timeslot = create_timeslot(max_capacity=2)
+        self.customers = [
+            User.objects.create_user(
+                username=f"customer{i}", email=f"customer{i}@example.com", password="TestPassword123!")
+            for i in range(3)
+        ]
+
+    def test_book_until_full(self):
+        """
+        測試預約到容量上限後返回額滿訊息，並寫入預約歷史。
+        """
+        first, error = book_timeslot(self.customers[0], self.timeslot.id)
+        self.assertIsNone(error)
+        self.assertEqual(first.staff_id, self.timeslot.schedule.staff_id)
+        self.assertEqual(first.service_id, self.timeslot.service_id)
+        self.assertTrue(AppointmentHistory.objects.filter(appointment=first, status='pending').exists())
+
+        book_timeslot(self.customers[1], self.timeslot.id)
+        appointment, error = book_timeslot(self.customers[2], self.timeslot.id)
+        self.assertIsNone(appointment)
+        self.assertEqual(error, SLOT_FULL)
+        self.timeslot.refresh_from_db()
+        self.assertEqual(self.timeslot.booked_count, 2)
+
+    def test_cancel_releases_seat(self):
+        """
+        測試取消預約後釋放名額，且不可重複取消或取消他人的預約。
+        """
+        appointment, _ = book_timeslot(self.customers[0], self.timeslot.id)
+
+        _, error = cancel_appointment(self.customers[1], appointment.id)
+        self.assertIsNotNone(error)
+
+        canceled, error = cancel_appointment(self.customers[0], appointment.id)
+        self.assertIsNone(error)
+        self.assertEqual(canceled.status, 'canceled')
+        self.timeslot.refresh_from_db()
+        self.assertEqual(self.timeslot.booked_count, 0)
+
+        _, error = cancel_appointment(self.customers[0], appointment.id)
+        self.assertIsNotNone(error)
+        self.timeslot.refresh_from_db()
+        self.assertEqual(self.timeslot.booked_count, 0)
+
+    def test_past_timeslot_cannot_be_booked(self):
+        """
+        測試已開始的時段不可預約。
+        """
+        TimeSlot.objects.filter(pk=self.timeslot.pk).update(
+            start_time=timezone.now() - timedelta(hours=1))
+        appointment, error = book_timeslot(self.customers[0], self.timeslot.id)
+        self.assertIsNone(appointment)
+        self.assertEqual(error, "時段已過期")
+
+    def test_staff_cannot_be_double_booked_across_services(self):
+        """
+        測試同一位服務人員不同服務的重疊時段不可重複預約，相鄰的時段與同一時段的其他客人不受影響。
+        """
+        color = Service.objects.create(
+            store=self.timeslot.service.store, name="染髮", price=1200, duration=60)
+
+        def slot(offset):
+            return TimeSlot.objects.create(
+                schedule=self.timeslot.schedule, service=color,
+                start_time=self.timeslot.start_time + offset,
+                end_time=self.timeslot.end_time + offset)
+
+        overlapping = slot(timedelta(minutes=30))
+        # 時段開始時間未對齊 5 分鐘，相鄰時段在位圖上與既有預約共用一格
+        adjacent = slot(timedelta(hours=1))
+
+        booked = [book_timeslot(customer, self.timeslot.id) for customer in self.customers[:2]]
+        self.assertEqual([error for _, error in booked], [None, None])
+
+        appointment, error = book_timeslot(self.customers[2], overlapping.id)
+        self.assertIsNone(appointment)
+        self.assertEqual(error, STAFF_CONFLICT)
+        overlapping.refresh_from_db()
+        self.assertEqual(overlapping.booked_count, 0)
+
+        next_one, error = book_timeslot(self.customers[2], adjacent.id)
+        self.assertIsNone(error)
+
+        for appointment, _ in booked + [(next_one, None)]:
+            cancel_appointment(appointment.customer, appointment.id)
+        _, error = book_timeslot(self.customers[0], overlapping.id)
+        self.assertIsNone(error)
+
+    def test_booking_updates_locked_occupancy(self):
+        """
+        測試預約直接在已鎖定的位圖列上加入佔用的格，查詢數與當日已有的預約數無關，
+        結果與依排班和預約重算的位圖相同。
+        """
+        staff_id = self.timeslot.schedule.staff_id
+        day = timezone.localdate() + timedelta(days=3)
+        schedule = WorkSchedule.objects.create(staff_id=staff_id, date=day, start_time=time(9), end_time=time(18))
+        tz = timezone.get_current_timezone()
+        slots = [
+            TimeSlot.objects.create(
+                schedule=schedule, service=self.timeslot.service,
+                start_time=timezone.make_aware(datetime.combine(day, time(hour)), tz),
+                end_time=timezone.make_aware(datetime.combine(day, time(hour, 45)), tz))
+            for hour in range(9, 14)
+        ]
+
+        with CaptureQueriesContext(connection) as first, \
+                patch("appointments.signals.refresh_for_interval") as refresh:
+            book_timeslot(self.customers[0], slots[0].id)
+        refresh.assert_not_called()
+        for slot in slots[1:-1]:
+            book_timeslot(self.customers[1], slot.id)
+        with CaptureQueriesContext(connection) as busy:
+            book_timeslot(self.customers[2], slots[-1].id)
+        self.assertEqual(len(busy), len(first))
+
+        booked = to_int(StaffOccupancy.objects.get(staff_id=staff_id, date=day).booked_bits)
+        self.assertEqual(to_int(refresh_occupancy(staff_id, day).booked_bits), booked)
+
+    def test_book_endpoint(self):
+        """
+        測試預約 API 的成功、額滿與不存在的回應。
+        """
+        url = reverse('appointments:book', args=[self.timeslot.id])
+        for customer in self.customers[:2]:
+            login(self.client, customer)
+            response = self.client.post(url, {'note': '第一次來'})
+            self.assertEqual(response.status_code, 201)
+
+        login(self.client, self.customers[2])
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['error'], SLOT_FULL)
+
+        response = self.client.post(reverse('appointments:book', args=[self.timeslot.id + 1000]))
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 405)
+
+
+class BookingConcurrencyTest(TransactionTestCase):
+    """
+    對同一時段同時發出大量預約，確認接受數量恰好等於容量。
+    """
+    capacity = 5
+    attempts = 200
+    workers = 32
+
+    def setUp(self):
+        self.timeslot = create_timeslot(max_capacity=self.capacity)
+        User.objects.bulk_create([
+            User(username=f"rush{i}", email=f"rush{i}@example.com", password="!")
+            for i in range(self.attempts)
+        ])
+        self.customers = list(User.objects.filter(username__startswith="rush"))
+
+    def _book(self, customer):
+        try:
+            appointment, _ = book_timeslot(customer, self.timeslot.id)
+            return appointment is not None
+        finally:
+            connection.close()
+
+    def test_concurrent_bookings_never_oversell(self):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self._book, self.customers))
+
+        self.assertEqual(sum(results), self.capacity)
+        self.assertEqual(Appointment.objects.filter(timeslot=self.timeslot).count(), self.capacity)
+        self.timeslot.refresh_from_db()
+        self.assertEqual(self.timeslot.booked_count, self.capacity)
+
+
+class NotificationFanOutTest(TestCase):
+    def setUp(self):
+        """
+        初始化一個時段，其中兩位客人有預約、一位已取消，另有未預約的用戶。
+        """
+        self.timeslot = create_timeslot(max_capacity=3)
+        self.customers = [
+            User.objects.create_user(
+                username=f"customer{i}", email=f"customer{i}@example.com", password="TestPassword123!")
+            for i in range(7)
+        ]
+        for customer in self.customers[:3]:
+            book_timeslot(customer, self.timeslot.id)
+        appointment = Appointment.objects.get(customer=self.customers[2])
+        cancel_appointment(self.customers[2], appointment.id)
+
+    def test_fan_out_in_batches(self):
+        """
+        測試分批寫入通知，每批一次 INSERT，並回報進度。
+        """
+        audience = User.objects.filter(username__startswith="customer")
+        reported = []
+        with CaptureQueriesContext(connection) as queries:
+            total = fan_out(audience, "店休公告", batch_size=3, progress=reported.append)
+
+        self.assertEqual(total, 7)
+        self.assertEqual(reported, [3, 6, 7])
+        inserts = [
+            query for query in queries.captured_queries
+            if query["sql"].startswith(f'INSERT INTO "{Notification._meta.db_table}"')
+        ]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(
+            set(Notification.objects.values_list("user_id", flat=True)), {c.id for c in self.customers})
+        self.assertFalse(Notification.objects.exclude(message="店休公告").exists())
+
+    def test_audiences(self):
+        """
+        測試店鋪公告與請假通知的對象，且同一位客人只會收到一則。
+        """
+        book_timeslot(self.customers[0], self.timeslot.id)  # 同一位客人第二筆預約
+        staff = self.timeslot.schedule.staff
+
+        self.assertEqual(fan_out(store_customers(staff.store_id), "公告"), 3)
+        affected = customers_affected_by_absence(staff.id, self.timeslot.schedule.date)
+        self.assertEqual(set(affected), {self.customers[0], self.customers[1]})
+
+
+class UnreadCounterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="customer", email="customer@example.com", password="TestPassword123!")
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="TestPassword123!")
+
+    def test_counter_follows_create_and_mark_read(self):
+        """
+        測試逐筆建立、批次發送、逐筆已讀與批次已讀都會同步更新未讀數。
+        """
+        first = Notification.objects.create(user=self.user, message="預約成功")
+        Notification.objects.create(user=self.user, message="已讀通知", is_read=True)
+        fan_out(User.objects.all(), "店休公告")
+        self.assertEqual(get_unread_count(self.user.id), 2)
+        self.assertEqual(get_unread_count(self.other.id), 1)
+
+        first.is_read = True
+        first.save()
+        self.assertEqual(get_unread_count(self.user.id), 1)
+
+        self.assertEqual(mark_read(self.user.id), 1)
+        self.assertEqual(mark_read(self.user.id), 0)
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        self.assertEqual(get_unread_count(self.other.id), 1)
+
+    def test_delete_unread_decrements_counter(self):
+        """
+        測試 delete_notifications 以一次彙總扣減被刪除的未讀數，刪除已讀通知則不影響。
+        """
+        first = Notification.objects.create(user=self.user, message="預約成功")
+        Notification.objects.create(user=self.user, message="預約取消")
+        Notification.objects.create(user=self.user, message="已讀通知", is_read=True)
+        Notification.objects.create(user=self.other, message="預約成功")
+
+        self.assertEqual(delete_notifications(Notification.objects.filter(pk=first.pk)), 1)
+        self.assertEqual(get_unread_count(self.user.id), 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(delete_notifications(Notification.objects.filter(user__in=[self.user, self.other])), 3)
+        # 整批刪除，不逐筆載入通知
+        self.assertFalse(any('"appointments_notification"."message"' in query["sql"] for query in queries))
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        self.assertEqual(get_unread_count(self.other.id), 0)
+
+    def test_reconcile_repairs_drift(self):
+        """
+        測試 reconcile_unread_counts 修正偏差與遺漏的計數。
+        """
+        Notification.objects.create(user=self.user, message="預約成功")
+        Notification.objects.create(user=self.other, message="預約成功")
+        NotificationCounter.objects.filter(user=self.user).update(unread_count=5)
+        NotificationCounter.objects.filter(user=self.other).delete()
+
+        out = StringIO()
+        call_command("reconcile_unread_counts", stdout=out)
+        self.assertIn("修正 2 位", out.getvalue())
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        self.assertEqual(get_unread_count(self.other.id), 1)
+
+    def test_context_processor_badge(self):
+        """
+        測試頁面透過 context processor 顯示未讀徽章。
+        """
+        Notification.objects.create(user=self.user, message="預約成功")
+        login(self.client, self.user)
+
+        response = self.client.get(reverse("appointments:my_appointments"))
+        self.assertEqual(response.context["unread_notification_count"](), 1)
+        self.assertContains(response, '<span class="badge">1</span>', html=True)
+
+
+class NotificationInboxTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="customer", email="customer@example.com", password="TestPassword123!")
+        self.other = User.objects.create_user(
+            username="other", email="other@example.com", password="TestPassword123!")
+        insert_notifications([self.user.id] * (INBOX_PAGE_SIZE + 5), "店休公告")
+        insert_notifications([self.other.id], "店休公告")
+        # 一半的通知時間相同，確認游標以 id 區分先後
+        ids = list(Notification.objects.filter(user=self.user).order_by('id').values_list('id', flat=True))
+        Notification.objects.filter(id__in=ids[::2]).update(created_at=timezone.now() - timedelta(hours=1))
+        mark_read(self.user.id, id__in=ids[:3])
+        self.expected = list(
+            Notification.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True))
+
+        login(self.client, self.user)
+
+    def fetch(self, **params):
+        response = self.client.get(reverse("appointments:notification_list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_pages_follow_cursor(self):
+        """
+        測試依游標逐頁讀取時不重複也不遺漏，且只包含自己的通知。
+        """
+        first = self.fetch()
+        self.assertEqual(len(first["notifications"]), INBOX_PAGE_SIZE)
+        second = self.fetch(cursor=first["next_cursor"])
+        self.assertIsNone(second["next_cursor"])
+
+        ids = [n["id"] for n in first["notifications"] + second["notifications"]]
+        self.assertEqual(ids, self.expected)
+
+    def test_read_filter(self):
+        """
+        測試 read=0/1 只回傳未讀或已讀的通知。
+        """
+        unread = self.fetch(read="0")["notifications"] + self.fetch(
+            read="0", cursor=self.fetch(read="0")["next_cursor"])["notifications"]
+        self.assertEqual(len(unread), INBOX_PAGE_SIZE + 2)
+        self.assertFalse(any(n["is_read"] for n in unread))
+        self.assertEqual(len(self.fetch(read="1")["notifications"]), 3)
+
+    def test_mark_page_read(self):
+        """
+        測試只將該頁的游標區間標記為已讀，並同步更新未讀數。
+        """
+        page = self.fetch(read="0")
+        until = page["notifications"][-1]["cursor"]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse("appointments:notification_mark_read"), {"until": until})
+        self.assertEqual(response.json(), {"updated": INBOX_PAGE_SIZE, "unread_count": 2})
+        updates = [q for q in queries.captured_queries
+                   if q["sql"].startswith(f'UPDATE "{Notification._meta.db_table}"')]
+        self.assertEqual(len(updates), 1)
+
+        rest = self.fetch(read="0")["notifications"]
+        self.assertEqual([n["id"] for n in rest], [
+            n for n in self.expected if n in {r["id"] for r in rest}])
+        self.assertEqual(len(rest), 2)
+
+        response = self.client.post(
+            reverse("appointments:notification_mark_read"), {"after": until})
+        self.assertEqual(response.json(), {"updated": 2, "unread_count": 0})
+        self.assertEqual(get_unread_count(self.other.id), 1)
+
+    def test_mark_page_read_skips_newer_notifications(self):
+        """
+        測試在第一頁標記已讀時，載入頁面後才新增的通知不會被一併標記。
+        """
+        context = self.client.get(reverse("appointments:notification_inbox"), {"read": "0"}).context
+        insert_notifications([self.user.id], "新的預約")
+
+        response = self.client.post(reverse("appointments:notification_mark_read"), {
+            "from": context["newest"], "until": context["until"]})
+        self.assertEqual(response.json(), {"updated": INBOX_PAGE_SIZE, "unread_count": 3})
+        self.assertTrue(Notification.objects.filter(user=self.user, message="新的預約", is_read=False).exists())
+
+    def test_invalid_params(self):
+        """
+        測試游標或 read 格式錯誤時返回 400。
+        """
+        url = reverse("appointments:notification_list")
+        self.assertEqual(self.client.get(url, {"cursor": "abc"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"read": "yes"}).status_code, 400)
+        response = self.client.post(reverse("appointments:notification_mark_read"), {"until": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_inbox_page(self):
+        """
+        測試收件匣頁面顯示第一頁與下一頁的連結。
+        """
+        first = Notification.objects.get(id=self.expected[0])
+        response = self.client.get(reverse("appointments:notification_inbox"))
+        self.assertEqual(len(response.context["notifications"]), INBOX_PAGE_SIZE)
+        self.assertEqual(response.context["until"], encode_cursor(
+            Notification.objects.get(id=self.expected[INBOX_PAGE_SIZE - 1])))
+        self.assertContains(response, first.message)
+        self.assertContains(response, "下一頁")
+
+
+class RetentionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="customer", email="customer@example.com", password="TestPassword123!")
+        insert_notifications([self.user.id] * 7, "店休公告")
+        ids = list(Notification.objects.order_by('id').values_list('id', flat=True))
+        # 5 則過期已讀、1 則過期未讀、1 則近期已讀
+        self.expired = ids[:5]
+        Notification.objects.filter(id__in=ids[:6]).update(created_at=timezone.now() - timedelta(days=100))
+        mark_read(self.user.id, id__in=ids[:5] + ids[6:])
+
+    def test_archive_read_notifications(self):
+        """
+        測試只封存過期的已讀通知，封存後原表不再保留，且不影響未讀數。
+        """
+        out = StringIO()
+        call_command("apply_retention", "--policy", "notifications", "--batch-size", "2", stdout=out)
+        self.assertIn("notifications: 封存 5 筆", out.getvalue())
+
+        self.assertEqual(sorted(NotificationArchive.objects.values_list('id', flat=True)), self.expired)
+        self.assertFalse(Notification.objects.filter(id__in=self.expired).exists())
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        archived = NotificationArchive.objects.get(id=self.expired[0])
+        self.assertEqual((archived.user_id, archived.message), (self.user.id, "店休公告"))
+
+    def test_batches_and_deadline(self):
+        """
+        測試依批次大小分批處理，時間用盡時停止並標記為未完成。
+        """
+        policy = POLICIES["notifications"]
+        result = apply_policy(policy, batch_size=2, deadline=0)
+        self.assertEqual((result.processed, result.finished), (0, False))
+
+        batches = []
+        result = apply_policy(policy, batch_size=2, progress=lambda r: batches.append(r.processed))
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertTrue(result.finished)
+
+    def test_delete_closed_appointment_history(self):
+        """
+        測試 --delete 直接刪除時段已結束超過期限的預約狀態紀錄，不寫入封存表。
+        """
+        old_slot = create_timeslot(max_capacity=2)
+        book_timeslot(self.user, old_slot.id)
+        TimeSlot.objects.filter(id=old_slot.id).update(
+            start_time=timezone.now() - timedelta(days=400), end_time=timezone.now() - timedelta(days=399))
+        recent_slot = TimeSlot.objects.create(
+            schedule=old_slot.schedule, service=old_slot.service, start_time=old_slot.start_time,
+            end_time=old_slot.end_time, max_capacity=1)
+        book_timeslot(self.user, recent_slot.id)
+
+        out = StringIO()
+        call_command("apply_retention", "--policy", "appointment_history", "--delete", stdout=out)
+        self.assertIn("appointment_history: 刪除 1 筆", out.getvalue())
+        self.assertEqual(
+            list(AppointmentHistory.objects.values_list('appointment__timeslot', flat=True)), [recent_slot.id])
+        self.assertFalse(AppointmentHistoryArchive.objects.exists())
+
+
+class SweepAppointmentsTest(TestCase):
+    def setUp(self):
+        self.ended = create_timeslot(max_capacity=5)
+        self.customers = [
+            User.objects.create_user(
+                username=f"customer{i}", email=f"customer{i}@example.com", password="TestPassword123!")
+            for i in range(4)
+        ]
+        self.confirmed = [book_timeslot(customer, self.ended.id)[0] for customer in self.customers[:3]]
+        self.stale = book_timeslot(self.customers[3], self.ended.id)[0]
+        Appointment.objects.filter(id__in=[a.id for a in self.confirmed]).update(status='confirmed')
+
+        # 進行中的時段：待確認的預約應逾期，已確認的不變
+        self.ongoing = TimeSlot.objects.create(
+            schedule=self.ended.schedule, service=self.ended.service,
+            start_time=self.ended.start_time + timedelta(hours=2),
+            end_time=self.ended.end_time + timedelta(hours=2), max_capacity=2)
+        self.ongoing_pending = book_timeslot(self.customers[0], self.ongoing.id)[0]
+        self.ongoing_confirmed = book_timeslot(self.customers[1], self.ongoing.id)[0]
+        Appointment.objects.filter(id=self.ongoing_confirmed.id).update(status='confirmed')
+
+        self.future = book_timeslot(self.customers[2], create_future_slot(self.ended).id)[0]
+        self.store = self.ended.schedule.staff.store
+        Store.objects.filter(id=self.store.id).update(tracks_attendance=True)
+
+        now = timezone.now()
+        TimeSlot.objects.filter(id=self.ended.id).update(
+            start_time=now - timedelta(hours=3), end_time=now - timedelta(hours=2))
+        TimeSlot.objects.filter(id=self.ongoing.id).update(
+            start_time=now - timedelta(minutes=10), end_time=now + timedelta(minutes=50))
+
+    def status(self, appointment):
+        return Appointment.objects.get(id=appointment.id).status
+
+    def test_sweep_transitions(self):
+        """
+        測試以集合式 UPDATE 轉換狀態、寫入狀態紀錄、釋放名額並更新佔用位圖。
+        """
+        with CaptureQueriesContext(connection) as queries:
+            result = sweep_appointments(window=timedelta(days=7))
+        self.assertEqual((result.windows, result.missed, result.expired), (1, 3, 2))
+        appointment_updates = [
+            q for q in queries.captured_queries if q["sql"].startswith('UPDATE "appointments_appointment"')]
+        self.assertEqual(len(appointment_updates), 2)
+
+        for appointment in self.confirmed:
+            self.assertEqual(self.status(appointment), 'missed')
+        self.assertEqual(self.status(self.stale), 'canceled')
+        self.assertEqual(self.status(self.ongoing_pending), 'canceled')
+        self.assertEqual(self.status(self.ongoing_confirmed), 'confirmed')
+        self.assertEqual(self.status(self.future), 'pending')
+
+        self.assertEqual(
+            list(AppointmentHistory.objects.filter(appointment=self.stale).values_list('status', flat=True)),
+            ['pending', 'canceled'])
+        self.assertEqual(AppointmentHistory.objects.filter(status='missed', updated_by=None).count(), 3)
+        self.assertEqual(TimeSlot.objects.get(id=self.ended.id).booked_count, 3)
+        self.assertEqual(TimeSlot.objects.get(id=self.ongoing.id).booked_count, 1)
+
+        # 佔用位圖只剩進行中時段已確認的預約
+        ended = TimeSlot.objects.get(id=self.ended.id)
+        ongoing = TimeSlot.objects.get(id=self.ongoing.id)
+        for day in local_dates(ended.start_time, ended.end_time):
+            occupancy = StaffOccupancy.objects.get(staff=ended.schedule.staff, date=day)
+            self.assertEqual(
+                to_int(occupancy.booked_bits), interval_mask(day, ongoing.start_time, ongoing.end_time))
+
+        # 重複執行不會再變更
+        result = sweep_appointments(window=timedelta(days=7))
+        self.assertEqual((result.missed, result.expired), (0, 0))
+
+    def test_grace_period_and_command(self):
+        """
+        測試時段結束未超過寬限時間的預約不會被標記為未出席。
+        """
+        out = StringIO()
+        call_command("sweep_appointments", "--grace-minutes", "180", stdout=out)
+        self.assertIn("未出席 0 筆，逾期取消 2 筆", out.getvalue())
+        self.assertEqual(self.status(self.confirmed[0]), 'confirmed')
+
+
+    def test_attended_appointment_is_not_missed(self):
+        """
+        測試商家登記到店的預約改為已完成，掃描時不會被標記為未出席。
+        """
+        login(self.client, self.store.merchant)
+        response = self.client.post(reverse("appointments:complete", args=[self.confirmed[0].id]))
+        self.assertEqual(response.json(), {"appointment": self.confirmed[0].id, "status": "completed"})
+
+        # 尚未開始的時段與非自己店鋪的預約無法登記到店
+        response = self.client.post(reverse("appointments:complete", args=[self.future.id]))
+        self.assertEqual(response.status_code, 409)
+        login(self.client, self.customers[0])
+        response = self.client.post(reverse("appointments:complete", args=[self.confirmed[1].id]))
+        self.assertEqual(response.status_code, 404)
+
+        result = sweep_appointments(window=timedelta(days=7))
+        self.assertEqual((result.missed, result.expired), (2, 2))
+        self.assertEqual(self.status(self.confirmed[0]), 'completed')
+        self.assertEqual(
+            list(AppointmentHistory.objects.filter(appointment=self.confirmed[0]).values_list('status', flat=True)),
+            ['pending', 'completed'])
+
+    def test_store_without_attendance_keeps_confirmed(self):
+        """
+        測試未啟用到店登記的店鋪沒有到店紀錄可判斷，已確認的預約不會被標記為未出席。
+        """
+        Store.objects.filter(id=self.store.id).update(tracks_attendance=False)
+        result = sweep_appointments(window=timedelta(days=7))
+        self.assertEqual((result.missed, result.expired), (0, 2))
+        for appointment in self.confirmed:
+            self.assertEqual(self.status(appointment), 'confirmed')
+
+
+class RatingSummaryTest(TestCase):
+    def setUp(self):
+        timeslot = create_timeslot(max_capacity=5)
+        self.staff = timeslot.schedule.staff
+        self.service = timeslot.service
+        self.store = self.staff.store
+        self.appointments = [
+            book_timeslot(User.objects.create_user(
+                username=f"customer{i}", email=f"customer{i}@example.com", password="TestPassword123!"),
+                timeslot.id)[0]
+            for i in range(3)
+        ]
+
+    def summaries(self):
+        return [
+            StaffRating.objects.get(staff=self.staff),
+            ServiceRating.objects.get(service=self.service),
+            StoreRating.objects.get(store=self.store),
+        ]
+
+    def test_incremental_updates(self):
+        """
+        測試評價新增、修改與刪除時同步增減三張統計表。
+        """
+        first = Feedback.objects.create(appointment=self.appointments[0], rating=5)
+        Feedback.objects.create(appointment=self.appointments[1], rating=3)
+        for summary in self.summaries():
+            self.assertEqual((summary.count, summary.total, summary.histogram), (2, 8, [0, 0, 1, 0, 1]))
+            self.assertEqual(summary.average, 4)
+
+        first.rating = 1
+        first.save()
+        first.comment = "服務很好"
+        first.save()
+        for summary in self.summaries():
+            self.assertEqual((summary.count, summary.total, summary.histogram), (2, 4, [1, 0, 1, 0, 0]))
+
+        Feedback.objects.get(id=first.id).delete()
+        for summary in self.summaries():
+            self.assertEqual((summary.count, summary.total, summary.histogram), (1, 3, [0, 0, 1, 0, 0]))
+
+    def test_rebuild_command(self):
+        """
+        測試 rebuild_ratings 依現有評價重建統計，修正繞過訊號的寫入。
+        """
+        Feedback.objects.bulk_create([
+            Feedback(appointment=appointment, rating=rating)
+            for appointment, rating in zip(self.appointments, (4, 4, 2))
+        ])
+        self.assertFalse(StaffRating.objects.exists())
+
+        out = StringIO()
+        call_command("rebuild_ratings", stdout=out)
+        self.assertIn("staffrating 1 筆", out.getvalue())
+        for summary in self.summaries():
+            self.assertEqual((summary.count, summary.total, summary.histogram), (3, 10, [0, 1, 0, 2, 0]))
+
+        # 已有統計的對象就地覆寫，偏差的值被修正
+        StaffRating.objects.update(count=9, stars_1=9)
+        call_command("rebuild_ratings", stdout=StringIO())
+        for summary in self.summaries():
+            self.assertEqual((summary.count, summary.total, summary.histogram), (3, 10, [0, 1, 0, 2, 0]))
+
+    def test_ratings_view(self):
+        """
+        測試店鋪評價 API 以固定次數的查詢讀取統計。
+        """
+        Feedback.objects.create(appointment=self.appointments[0], rating=4)
+        login(self.client, self.appointments[0].customer)
+
+        response = self.client.get(reverse("store:ratings", kwargs={"store_id": self.store.id}))
+        data = response.json()
+        self.assertEqual(data["store"], {"count": 1, "average": 4, "histogram": [0, 0, 0, 1, 0]})
+        self.assertEqual(data["staff"], [
+            {"id": self.staff.id, "name": "Alice", "count": 1, "average": 4, "histogram": [0, 0, 0, 1, 0]}])
+        self.assertEqual(data["services"][0]["count"], 1)
+
+        response = self.client.get(reverse("store:ratings", kwargs={"store_id": self.store.id + 1}))
+        self.assertEqual(response.status_code, 404)
+
+
+@requires_plan_support
+class AppointmentQueryPlanTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        建立多位客人的預約與通知。
+        """
+        timeslot = create_timeslot(max_capacity=500)
+        User.objects.bulk_create([
+            User(username=f"customer{i}", email=f"customer{i}@example.com", password="!")
+            for i in range(50)
+        ])
+        customers = list(User.objects.filter(username__startswith="customer"))
+        Appointment.objects.bulk_create([
+            Appointment(customer=customer, service=timeslot.service, staff=timeslot.schedule.staff,
+                        timeslot=timeslot, status=status)
+            for customer in customers for status in ('pending', 'confirmed', 'canceled')
+        ])
+        Notification.objects.bulk_create([
+            Notification(user=customer, message=f"通知 {i}", is_read=i % 4 != 0)
+            for customer in customers for i in range(20)
+        ])
+        cls.customer = customers[0]
+
+    def test_appointment_by_customer_and_status(self):
+        self.assertUsesIndex(
+            Appointment.objects.filter(customer=self.customer, status='pending'), 'appointment_customer_status')
+
+    def test_notification_inbox(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.customer, is_read=True).order_by('-created_at', '-id'),
+            'notification_user_created')
+
+    def test_unread_notifications(self):
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.customer, is_read=False).order_by('-created_at', '-id'),
+            'notification_user_unread')
+
+    def test_inbox_page_after_cursor(self):
+        _, next_cursor = inbox_page(self.customer.id, limit=5)
+        with CaptureQueriesContext(connection) as queries:
+            inbox_page(self.customer.id, cursor=next_cursor, limit=5)
+        self.assertEqual(len(queries), 1)
+        # 以游標接續的查詢同樣沿著索引讀取
+        self.assertUsesIndex(
+            Notification.objects.filter(user=self.customer).filter(_older_than(next_cursor))
+            .order_by('-created_at', '-id'), 'notification_user_created')
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    post_urls = ("book", "cancel", "complete", "notification_mark_read")
+
+    def setUp(self):
+        self.timeslot = create_timeslot(max_capacity=2)
+        self.budget_user = User.objects.create_user(
+            username="customer", email="customer@example.com", password="TestPassword123!")
+        appointment, _ = book_timeslot(self.budget_user, self.timeslot.id)
+        self.url_kwargs = {
+            "book": {"timeslot_id": self.timeslot.id},
+            "cancel": {"appointment_id": appointment.id},
+            "complete": {"appointment_id": appointment.id},
+        }
+
+    def test_every_view_within_budget(self):
+        """
+        測試 appointments 的每個路由都宣告了查詢上限且未超過。
+        """
+        self.assertWithinQueryBudgets(urls.urlpatterns, "appointments")
@@ -8,4 +8,10 @@ urlpatterns = [
     path('my/', views.my_appointments, name='my_appointments'),
     path('history/', views.appointment_history, name='appointment_history'),
     path('reviews/', views.review_history, name='review_history'),
+    path('book/<int:timeslot_id>/', views.book, name='book'),
+    path('<int:appointment_id>/cancel/', views.cancel, name='cancel'),
+    path('<int:appointment_id>/complete/', views.complete, name='complete'),
+    path('notifications/', views.notification_inbox, name='notification_inbox'),
+    path('notifications/api/', views.notification_list, name='notification_list'),
+    path('notifications/mark-read/', views.notification_mark_read, name='notification_mark_read'),
 ]
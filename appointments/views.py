@@ -1,17 +1,175 @@
-from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.http import require_POST
 
+from asgiref.sync import sync_to_async
 
+from booking_system.query_budget import query_budget
+from booking_system.utils import arender
+from .notifications import decode_cursor, encode_cursor, get_unread_count, inbox_page, mark_range_read
+from .services import (
+    book_timeslot, cancel_appointment, complete_appointment, SLOT_NOT_FOUND, APPOINTMENT_NOT_FOUND,
+)
+
+READ_STATES = {"": None, "1": True, "0": False}
+
+
+@query_budget(3)
 @login_required
-def my_appointments(request):
-    return render(request, 'appointments/my_appointments.html')
+async def my_appointments(request):
+    return await arender(request, 'appointments/my_appointments.html')
 
 
+@query_budget(3)
 @login_required
-def appointment_history(request):
-    return render(request, 'appointments/appointment_history.html')
+async def appointment_history(request):
+    return await arender(request, 'appointments/appointment_history.html')
 
 
+@query_budget(3)
 @login_required
-def review_history(request):
-    return render(request, 'appointments/review_history.html')
+async def review_history(request):
+    return await arender(request, 'appointments/review_history.html')
+
+
+@query_budget(16)
+@login_required
+@require_POST
+async def book(request, timeslot_id):
+    """
+    預約指定時段，額滿或服務人員在該時段已有其他預約時返回 409。
+    """
+    # 預約需要在同一個交易中完成，交易無法跨越非同步 ORM 呼叫，因此整段在同步執行緒中執行
+    note = request.POST.get("note", "").strip() or None
+    user = await request.auser()
+    appointment, error_message = await sync_to_async(book_timeslot)(user, timeslot_id, note)
+    return _book_response(appointment, error_message)
+
+
+def _book_response(appointment, error_message):
+    if appointment is None:
+        status = 404 if error_message == SLOT_NOT_FOUND else 409
+        return JsonResponse({"error": error_message}, status=status)
+    return JsonResponse({"appointment": appointment.id, "status": appointment.status}, status=201)
+
+
+@query_budget(19)
+@login_required
+@require_POST
+async def cancel(request, appointment_id):
+    """
+    取消自己的預約。
+    """
+    user = await request.auser()
+    appointment, error_message = await sync_to_async(cancel_appointment)(user, appointment_id)
+    return _appointment_response(appointment, error_message)
+
+
+def _appointment_response(appointment, error_message):
+    if appointment is None:
+        status = 404 if error_message == APPOINTMENT_NOT_FOUND else 409
+        return JsonResponse({"error": error_message}, status=status)
+    return JsonResponse({"appointment": appointment.id, "status": appointment.status})
+
+
+@query_budget(18)
+@login_required
+@require_POST
+async def complete(request, appointment_id):
+    """
+    商家登記客人已到店。
+    """
+    user = await request.auser()
+    appointment, error_message = await sync_to_async(complete_appointment)(user, appointment_id)
+    return _appointment_response(appointment, error_message)
+
+
+@query_budget(4)
+@login_required
+async def notification_inbox(request):
+    """
+    通知收件匣頁面，以游標往下一頁，可用 read=0/1 篩選未讀或已讀。
+    """
+    params, error_response = _inbox_params(request)
+    if error_response is not None:
+        return error_response
+    user = await request.auser()
+    page = await sync_to_async(inbox_page)(user.id, *params)
+    return await arender(request, 'appointments/notification_inbox.html', _inbox_context(request, page))
+
+
+@query_budget(3)
+@login_required
+async def notification_list(request):
+    """
+    收件匣 API，回傳一頁通知與下一頁的游標。
+    """
+    params, error_response = _inbox_params(request)
+    if error_response is not None:
+        return error_response
+    user = await request.auser()
+    return _inbox_response(await sync_to_async(inbox_page)(user.id, *params))
+
+
+@query_budget(6)
+@login_required
+@require_POST
+async def notification_mark_read(request):
+    """
+    以單一 UPDATE 將游標區間內（不含 after，包含 from 與 until）的通知標記為已讀，
+    after 為載入該頁時的游標，from 與 until 為該頁第一則與最後一則的游標。
+    """
+    user = await request.auser()
+    try:
+        updated = await sync_to_async(mark_range_read)(
+            user.id, request.POST.get("after"), request.POST.get("until"), request.POST.get("from"))
+    except ValueError:
+        return JsonResponse({"error": "無效的游標"}, status=400)
+    return JsonResponse({"updated": updated, "unread_count": await sync_to_async(get_unread_count)(user.id)})
+
+
+def _inbox_params(request):
+    """
+    解析收件匣的參數，返回 ((游標, 已讀狀態), None) 或 (None, 錯誤回應)。
+    """
+    cursor = request.GET.get("cursor") or None
+    read = request.GET.get("read", "")
+    if read not in READ_STATES:
+        return None, JsonResponse({"error": "read 只能是 0 或 1"}, status=400)
+    if cursor is not None:
+        try:
+            # 先解析一次，格式錯誤時返回 400 而不是在查詢時出錯
+            decode_cursor(cursor)
+        except ValueError:
+            return None, JsonResponse({"error": "無效的游標"}, status=400)
+    return (cursor, READ_STATES[read]), None
+
+
+def _serialize_notification(notification):
+    return {
+        "id": notification.id,
+        "message": notification.message,
+        "is_read": notification.is_read,
+        "created_at": notification.created_at.isoformat(),
+        "cursor": encode_cursor(notification),
+    }
+
+
+def _inbox_response(page):
+    notifications, next_cursor = page
+    return JsonResponse({
+        "notifications": [_serialize_notification(notification) for notification in notifications],
+        "next_cursor": next_cursor,
+    })
+
+
+def _inbox_context(request, page):
+    notifications, next_cursor = page
+    return {
+        "notifications": notifications,
+        "cursor": request.GET.get("cursor", ""),
+        "newest": encode_cursor(notifications[0]) if notifications else "",
+        "until": encode_cursor(notifications[-1]) if notifications else "",
+        "next_cursor": next_cursor,
+        "read": request.GET.get("read", ""),
+    }
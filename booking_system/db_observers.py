@@ -0,0 +1,46 @@
+"""
+讓非同步中介層觀察請求中的查詢。
+
+資料庫連線綁定在執行緒上，非同步視圖的 ORM 呼叫是在 sync_to_async 的執行緒中執行，
+中介層在事件迴圈中對 connections 掛上的 execute_wrapper 看不到這些查詢。
+因此改在執行 ORM 的執行緒的連線上掛上一個共用的 _dispatch，
+再透過 ContextVar（會隨 sync_to_async 複製到該執行緒）找到目前請求的觀察者。
+"""
+import functools
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+_observers = ContextVar("query_observers", default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+    observers = _observers.get()
+    for observer in reversed(observers):
+        execute = functools.partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def install_dispatch():
+    """在目前執行緒的每個連線上掛上 _dispatch，重複呼叫不會重複掛上。"""
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if _dispatch not in wrappers:
+            wrappers.append(_dispatch)
+
+
+@asynccontextmanager
+async def aobserve_queries(observer):
+    """
+    在區塊內以 observer(execute, sql, params, many, context) 觀察查詢，
+    介面與 execute_wrapper 相同。
+    """
+    # 在 sync_to_async 預設使用的執行緒上掛上 _dispatch，非同步 ORM 與視圖中的同步呼叫都在這裡執行
+    await sync_to_async(install_dispatch)()
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield
+    finally:
+        _observers.reset(token)
@@ -0,0 +1,140 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# 讀取時允許使用唯讀副本
+_replica_allowed = ContextVar("replica_allowed", default=False)
+# 目前請求的路由狀態，請求以外（例如管理指令）為 None
+_request_state = ContextVar("replica_request_state", default=None)
+
+# 一律走主資料庫、也不觸發黏著的 app（session 讀寫必須即時一致）
+PRIMARY_ONLY_APPS = {"sessions"}
+
+
+class RequestRoutingState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replica_alias():
+    """已設定唯讀副本時回傳其 alias，否則回傳 None。"""
+    alias = getattr(settings, "REPLICA_DATABASE_ALIAS", "replica")
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def use_replica():
+    """在區塊內允許讀取唯讀副本。"""
+    token = _replica_allowed.set(True)
+    try:
+        yield
+    finally:
+        _replica_allowed.reset(token)
+
+
+def read_from_replica(view_func):
+    """
+    標記唯讀視圖，讓視圖中的查詢改由唯讀副本處理。
+    用戶剛寫入資料的黏著期間內仍會讀取主資料庫。
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(*args, **kwargs):
+            with use_replica():
+                return await view_func(*args, **kwargs)
+    else:
+        @wraps(view_func)
+        def _wrapped_view(*args, **kwargs):
+            with use_replica():
+                return view_func(*args, **kwargs)
+    return _wrapped_view
+
+
+class ReplicaRouter:
+    """
+    唯讀副本路由：寫入一律走主資料庫；標記為唯讀的視圖或 use_replica() 區塊中的讀取
+    改走唯讀副本。未設定副本時全部回退到主資料庫。
+    """
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        if alias is None or not _replica_allowed.get():
+            return "default"
+        if model._meta.app_label in PRIMARY_ONLY_APPS:
+            return "default"
+        state = _request_state.get()
+        if state is not None and (state.pinned or state.wrote):
+            return "default"
+        return alias
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本與主資料庫內容相同，跨連線的關聯視為同一個資料庫
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
+
+
+class ReplicaStickinessMiddleware:
+    """
+    讀寫一致性：請求中有寫入時，以 cookie 記錄 REPLICA_STICKY_SECONDS 秒的黏著期，
+    期間內同一用戶的讀取都改走主資料庫，確保看得到自己剛寫入的資料。
+    """
+    cookie_name = "db_pinned_until"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def _routing_state(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(self.cookie_name, 0))
+        except ValueError:
+            pinned_until = 0
+        return RequestRoutingState(pinned=pinned_until > time.time())
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self._routing_state(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._process_response(state, response)
+
+    async def __acall__(self, request):
+        # ContextVar 會隨 sync_to_async 複製到執行 ORM 的執行緒，但寫入標記是在同一個
+        # RequestRoutingState 物件上修改，因此非同步視圖中的寫入也能被記錄
+        state = self._routing_state(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self._process_response(state, response)
+
+    def _process_response(self, state, response):
+        if state.wrote and replica_alias() is not None:
+            sticky_seconds = getattr(settings, "REPLICA_STICKY_SECONDS", 10)
+            response.set_cookie(
+                self.cookie_name, f"{time.time() + sticky_seconds:.3f}",
+                max_age=sticky_seconds, httponly=True, samesite="Lax",
+            )
+        return response
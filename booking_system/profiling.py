@@ -0,0 +1,195 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template import base as template_base
+
+from .db_observers import aobserve_queries
+
+logger = logging.getLogger(__name__)
+
+# 目前請求的計時資料，讓模板渲染的計時能找到所屬請求
+_current_profile = ContextVar("current_profile", default=None)
+_template_patched = False
+
+
+class RequestProfile:
+    """單一請求的計時資料，時間單位為秒。"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = 0.0
+        self.app = None
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    @property
+    def middleware(self):
+        """中介層耗時：總時間扣除視圖（含模板渲染）的時間。"""
+        if self.app is None:
+            return self.total
+        return max(self.total - self.app, 0.0)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - started
+
+    def server_timing(self):
+        """組成 Server-Timing 標頭，時間單位為毫秒。"""
+        metrics = [
+            ("total", self.total, None),
+            ("app", self.app or 0.0, None),
+            ("db", self.sql_time, f"{self.sql_count} queries"),
+            ("tpl", self.template_time, None),
+            ("mw", self.middleware, None),
+        ]
+        return ", ".join(
+            f'{name};dur={seconds * 1000:.2f}' + (f';desc="{desc}"' if desc else "")
+            for name, seconds, desc in metrics
+        )
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total * 1000, 2),
+            "app_ms": round((self.app or 0.0) * 1000, 2),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_time * 1000, 2),
+            "template_ms": round(self.template_time * 1000, 2),
+            "middleware_ms": round(self.middleware * 1000, 2),
+        }
+
+
+def _patch_template_render():
+    """
+    包裝 Template.render 以累計模板渲染時間，只計算最外層，避免 include 重複計時。
+    沒有進行中的請求計時時直接呼叫原方法。
+    """
+    global _template_patched
+    if _template_patched:
+        return
+    original_render = template_base.Template.render
+
+    def render(self, context):
+        profile = _current_profile.get()
+        if profile is None:
+            return original_render(self, context)
+        profile.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            profile.template_depth -= 1
+            if profile.template_depth == 0:
+                profile.template_time += time.perf_counter() - started
+
+    template_base.Template.render = render
+    _template_patched = True
+
+
+class ProfilingMiddleware:
+    """
+    記錄每個請求的總時間、SQL 次數與時間、模板渲染時間與中介層時間，
+    以 Server-Timing 標頭回傳，並依 PROFILING_LOG_SAMPLE_RATE 抽樣寫入結構化日誌。
+    需放在 MIDDLEWARE 最前面，並搭配放在最後面的 ProfilingViewMiddleware。
+    PROFILING_ENABLED 為 False 時不會被載入，沒有任何額外負擔。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.sample_rate = getattr(settings, "PROFILING_LOG_SAMPLE_RATE", 0.0)
+        _patch_template_render()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        profile = RequestProfile()
+        request.profile = profile
+        token = _current_profile.set(profile)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self._finish(request, profile, response)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        request.profile = profile
+        token = _current_profile.set(profile)
+        try:
+            async with aobserve_queries(profile):
+                response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self._finish(request, profile, response)
+
+    def _finish(self, request, profile, response):
+        profile.total = time.perf_counter() - profile.started
+
+        response["Server-Timing"] = profile.server_timing()
+        if self.sample_rate and random.random() < self.sample_rate:
+            logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                **profile.as_dict(),
+            }))
+        return response
+
+
+class ProfilingViewMiddleware:
+    """
+    量測視圖本身（含模板渲染）的時間，需放在 MIDDLEWARE 最後面。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, started)
+        return response
+
+    def _record(self, request, started):
+        profile = getattr(request, "profile", None)
+        if profile is not None:
+            profile.app = time.perf_counter() - started
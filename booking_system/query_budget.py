@@ -0,0 +1,107 @@
+import logging
+from contextlib import ExitStack
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .db_observers import aobserve_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """請求的查詢次數超過視圖宣告的上限。"""
+
+
+def query_budget(max_queries):
+    """
+    宣告視圖在單一請求中允許的最大查詢次數（含 session 與用戶載入）。
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_view(*args, **kwargs):
+                return await view_func(*args, **kwargs)
+        else:
+            @wraps(view_func)
+            def _wrapped_view(*args, **kwargs):
+                return view_func(*args, **kwargs)
+        _wrapped_view.query_budget = max_queries
+        return _wrapped_view
+    return decorator
+
+
+def get_query_budget(view_func):
+    """取得視圖宣告的查詢上限，未宣告時使用 QUERY_BUDGET_DEFAULT。"""
+    return getattr(view_func, 'query_budget', getattr(settings, 'QUERY_BUDGET_DEFAULT', None))
+
+
+class QueryCounter:
+    """透過 execute_wrapper 計算所有資料庫連線上執行的查詢。"""
+
+    def __init__(self):
+        self.count = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+class QueryBudgetMiddleware:
+    """
+    依 QUERY_BUDGET_MODE 檢查每個請求的查詢次數：
+    'off' 不檢查、'log' 超過時記錄警告、'raise' 超過時拋出 QueryBudgetExceeded。
+    應放在 MIDDLEWARE 最前面，才能計入其他中介層的查詢。
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mode = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+        if mode == 'off':
+            return self.get_response(request)
+
+        counter = QueryCounter()
+        request.query_budget = None
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(counter))
+            response = self.get_response(request)
+        self._check(request, counter, mode)
+        return response
+
+    async def __acall__(self, request):
+        mode = getattr(settings, 'QUERY_BUDGET_MODE', 'off')
+        if mode == 'off':
+            return await self.get_response(request)
+
+        counter = QueryCounter()
+        request.query_budget = None
+        async with aobserve_queries(counter):
+            response = await self.get_response(request)
+        self._check(request, counter, mode)
+        return response
+
+    def _check(self, request, counter, mode):
+        budget = request.query_budget
+        if budget is not None and counter.count > budget:
+            message = f"查詢次數超過上限: path={request.path}, queries={counter.count}, budget={budget}"
+            if mode == 'raise':
+                raise QueryBudgetExceeded(message + "\n" + "\n".join(counter.queries))
+            logger.warning(message)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func)
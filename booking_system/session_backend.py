@@ -0,0 +1,208 @@
+"""
+分層 session 引擎：行程內 LRU → 共用快取（選用）→ 資料庫。
+
+讀取時依序查找三層，資料庫只在前兩層都未命中時才查詢。
+其他行程可能已修改或刪除 session，行程內 LRU 的內容需與共用快取中的版本一致才採用；
+沒有共用快取時，只有設定 SESSION_LRU_SINGLE_WRITER（只有單一行程寫入 session）才使用 LRU。
+寫入時比對資料指紋，內容未變且到期時間只差 SESSION_WRITE_COALESCE_SECONDS 內時
+略過資料庫寫入，避免每個請求都把相同的 session 寫回資料庫。
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.utils import timezone
+
+KEY_PREFIX = "booking_system.session"
+
+
+class LRUCache:
+    """
+    執行緒安全、容量有上限且帶存活時間的 LRU。
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_sessions = LRUCache(
+    max_size=getattr(settings, "SESSION_LRU_SIZE", 10000),
+    ttl=getattr(settings, "SESSION_LRU_TTL", 5),
+)
+
+
+class SessionStore(DBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        alias = getattr(settings, "SESSION_CACHE_ALIAS", None)
+        self._cache = caches[alias] if alias else None
+        # 最近一次與資料庫同步的 (資料指紋, 到期時間)
+        self._persisted = None
+        super().__init__(session_key)
+
+    def _cache_key(self, session_key):
+        return self.cache_key_prefix + session_key
+
+    def _version_key(self, session_key):
+        return self.cache_key_prefix + "version:" + session_key
+
+    def _uses_lru(self):
+        """有共用快取可以核對版本，或只有單一行程寫入 session 時才使用行程內 LRU。"""
+        return self._cache is not None or getattr(settings, "SESSION_LRU_SINGLE_WRITER", False)
+
+    def _fingerprint(self, data):
+        return hashlib.sha256(self.serializer().dumps(data)).hexdigest()
+
+    def _remember(self, data, expire_date):
+        """將 session 放入行程內 LRU 與共用快取。"""
+        fingerprint = self._fingerprint(data)
+        entry = {"data": copy.deepcopy(data), "expire_date": expire_date, "fingerprint": fingerprint}
+        if self._uses_lru():
+            local_sessions.set(self.session_key, entry)
+        if self._cache is not None:
+            # 版本與內容一起寫入，其他行程的 LRU 以版本判斷是否過期
+            self._cache.set_many({
+                self._cache_key(self.session_key): entry,
+                self._version_key(self.session_key): fingerprint,
+            }, self.get_expiry_age(expiry=expire_date))
+        self._persisted = (fingerprint, expire_date)
+
+    def _load_cached(self):
+        """
+        從行程內 LRU 或共用快取取得 session，未命中時返回 None。
+        有共用快取時只讀取版本核對 LRU 的內容，版本不同或已被刪除時改讀共用快取中的內容。
+        """
+        if not self._uses_lru():
+            return None
+        entry = local_sessions.get(self.session_key)
+        if self._cache is None:
+            return entry
+        try:
+            if entry is not None and self._cache.get(self._version_key(self.session_key)) == entry["fingerprint"]:
+                return entry
+            entry = self._cache.get(self._cache_key(self.session_key))
+        except Exception:
+            # 部分快取後端會因無效的鍵拋出例外，視為未命中
+            return None
+        if entry is None:
+            local_sessions.delete(self.session_key)
+        else:
+            local_sessions.set(self.session_key, entry)
+        return entry
+
+    def load(self):
+        if self.session_key is None:
+            return {}
+        entry = self._load_cached()
+        if entry is not None and entry["expire_date"] > timezone.now():
+            self._persisted = (entry["fingerprint"], entry["expire_date"])
+            return copy.deepcopy(entry["data"])
+
+        s = self._get_session_from_db()
+        if not s:
+            return {}
+        data = self.decode(s.session_data)
+        self._remember(data, s.expire_date)
+        return data
+
+    def exists(self, session_key):
+        if self._cache is not None:
+            if self._cache_key(session_key) in self._cache:
+                return True
+        elif self._uses_lru() and local_sessions.get(session_key) is not None:
+            return True
+        return super().exists(session_key)
+
+    def _write_is_redundant(self, data):
+        """內容未變且到期時間幾乎相同時不需要寫入資料庫。"""
+        if self._persisted is None:
+            return False
+        fingerprint, expire_date = self._persisted
+        if fingerprint != self._fingerprint(data):
+            return False
+        drift = (self.get_expiry_date() - expire_date).total_seconds()
+        return drift <= getattr(settings, "SESSION_WRITE_COALESCE_SECONDS", 60)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if not must_create and self._write_is_redundant(data):
+            return
+        super().save(must_create)
+        self._remember(data, self.get_expiry_date())
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        local_sessions.delete(session_key)
+        if self._cache is not None:
+            self._cache.delete_many([self._cache_key(session_key), self._version_key(session_key)])
+        if session_key == self.session_key:
+            self._persisted = None
+
+    def flush(self):
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
+
+    # 非同步介面沿用同一套分層邏輯
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    async def aflush(self):
+        return await sync_to_async(self.flush)()
+
+    async def acreate(self):
+        return await sync_to_async(self.create)()
@@ -47,6 +47,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "booking_system.profiling.ProfilingMiddleware",  # 請求計時（PROFILING_ENABLED），需放在最前面
+    "booking_system.query_budget.QueryBudgetMiddleware",  # 查詢次數上限檢查，需放在最前面
+    "booking_system.db_router.ReplicaStickinessMiddleware",  # 唯讀副本的讀寫一致性
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,6 +58,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "security_check.middleware.SecurityCheckMiddleware",
+    "booking_system.profiling.ProfilingViewMiddleware",  # 視圖計時，需放在最後面
 ]
 
 ROOT_URLCONF = "booking_system.urls"
@@ -70,6 +74,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "appointments.context_processors.unread_notifications",
             ],
         },
     },
@@ -92,6 +97,41 @@ DATABASES = {
     }
 }
 
+# 唯讀副本（選用）：設定 DATABASE_REPLICA_HOST 後，標記為唯讀的視圖改由副本處理
+DATABASE_REPLICA_HOST = config("DATABASE_REPLICA_HOST", default="")
+if DATABASE_REPLICA_HOST:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': DATABASE_REPLICA_HOST,
+        'PORT': config("DATABASE_REPLICA_PORT", default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ["booking_system.db_router.ReplicaRouter"]
+REPLICA_DATABASE_ALIAS = "replica"
+# 用戶寫入後維持讀取主資料庫的秒數（讀寫一致性）
+REPLICA_STICKY_SECONDS = config("REPLICA_STICKY_SECONDS", default=10, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# 店鋪目錄以快取中的版本號讓所有程序的目錄同時失效，版本號必須存放在所有程序共用的快取。
+# LocMemCache 只在單一程序內有效，其他程序看不到版本號的變更，會持續讀到舊目錄直到逾時，
+# 只適合開發與單一程序的部署。正式環境請設定共用的快取，例如：
+#   CACHE_BACKEND=django.core.cache.backends.redis.RedisCache CACHE_LOCATION=redis://127.0.0.1:6379/1
+#   CACHE_BACKEND=django.core.cache.backends.memcached.PyMemcacheCache CACHE_LOCATION=127.0.0.1:11211
+# 並安裝對應的客戶端套件（redis 或 pymemcache）
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="booking_system"),
+    }
+}
+
+# 店鋪目錄快取的存活時間（秒），目錄異動時會透過版本號立即失效
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -138,13 +178,56 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = 'users.User'
 
+# 以信箱登入（不分大小寫），保留 ModelBackend 讓管理後台可用使用者名稱登入
+AUTHENTICATION_BACKENDS = [
+    "users.backends.EmailBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
+# 登入節流：滑動視窗（秒）內允許的失敗次數，分別以 IP 與帳號計算
+LOGIN_THROTTLE_WINDOW = config("LOGIN_THROTTLE_WINDOW", default=300, cast=int)
+LOGIN_THROTTLE_IP_LIMIT = config("LOGIN_THROTTLE_IP_LIMIT", default=20, cast=int)
+LOGIN_THROTTLE_ACCOUNT_LIMIT = config("LOGIN_THROTTLE_ACCOUNT_LIMIT", default=5, cast=int)
+
+# 登入時密碼雜湊最多同時以 LOGIN_HASH_MAX_WORKERS 個執行緒計算
+LOGIN_HASH_MAX_WORKERS = config("LOGIN_HASH_MAX_WORKERS", default=4, cast=int)
+
+# 資料保留天數：已讀通知與時段已結束的預約狀態紀錄，超過後由 apply_retention 指令封存或刪除
+RETENTION_NOTIFICATION_DAYS = config("RETENTION_NOTIFICATION_DAYS", default=90, cast=int)
+RETENTION_HISTORY_DAYS = config("RETENTION_HISTORY_DAYS", default=365, cast=int)
+
+# 時段結束多少分鐘後，啟用到店登記的店鋪仍未登記到店的預約由 sweep_appointments 指令標記為未出席
+APPOINTMENT_MISSED_GRACE_MINUTES = config("APPOINTMENT_MISSED_GRACE_MINUTES", default=30, cast=int)
+
 
 # Turnstile Secret Key
 SECURITY_CHECK_SECRET_KEY = config("SECURITY_CHECK_SECRET_KEY")
+SECURITY_CHECK_VERIFY_URL = config(
+    "SECURITY_CHECK_VERIFY_URL", default="https://challenges.cloudflare.com/turnstile/v0/siteverify")
+# 驗證請求的逾時（秒）與共用連線池大小
+SECURITY_CHECK_TIMEOUT = config("SECURITY_CHECK_TIMEOUT", default=5.0, cast=float)
+SECURITY_CHECK_CONNECT_TIMEOUT = config("SECURITY_CHECK_CONNECT_TIMEOUT", default=2.0, cast=float)
+SECURITY_CHECK_MAX_CONNECTIONS = config("SECURITY_CHECK_MAX_CONNECTIONS", default=100, cast=int)
+# 驗證狀態的保存方式：session（資料庫）或 cookie（簽章 cookie，不需讀取 session）
+SECURITY_CHECK_MODE = config("SECURITY_CHECK_MODE", default="session")
+SECURITY_CHECK_COOKIE_NAME = "security_verified"
+SECURITY_CHECK_COOKIE_AGE = config("SECURITY_CHECK_COOKIE_AGE", default=60 * 60 * 24, cast=int)
+# 不需驗證即可存取的路徑前綴
+SECURITY_CHECK_EXEMPT_PATHS = ["/" + STATIC_URL.lstrip("/"), "/health/"]
 
 # Session 過期時間 20 分鐘
 SESSION_COOKIE_AGE = 1200
 
+# 分層 session：行程內 LRU → 共用快取（SESSION_CACHE_ALIAS，留空則不使用）→ 資料庫
+SESSION_ENGINE = "booking_system.session_backend"
+SESSION_CACHE_ALIAS = config("SESSION_CACHE_ALIAS", default="")
+SESSION_LRU_SIZE = 10000
+SESSION_LRU_TTL = 5
+# 沒有共用快取時，只有單一行程寫入 session（例如單一工作行程的部署）才可開啟，否則不使用行程內 LRU
+SESSION_LRU_SINGLE_WRITER = config("SESSION_LRU_SINGLE_WRITER", default=False, cast=bool)
+# 內容未變時，到期時間延後不超過此秒數就略過資料庫寫入
+SESSION_WRITE_COALESCE_SECONDS = 60
+
 
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 if not os.path.exists(LOG_DIR):
@@ -187,6 +270,9 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': True,
         },
+        'httpx': {  # 每次驗證請求的連線紀錄過於瑣碎
+            'level': 'WARNING',
+        },
         '': {
             'handlers': ['console', 'file'],
             'level': 'INFO',
@@ -195,6 +281,15 @@ LOGGING = {
     },
 }
 
+# 查詢次數上限檢查模式：off / log / raise，開發環境預設記錄警告
+QUERY_BUDGET_MODE = config("QUERY_BUDGET_MODE", default="log" if DEBUG else "off")
+# 未宣告 query_budget 的視圖使用的上限，None 表示不檢查
+QUERY_BUDGET_DEFAULT = None
+
+# 請求計時：以 Server-Timing 標頭回傳，並依比例抽樣寫入日誌
+PROFILING_ENABLED = config("PROFILING_ENABLED", default=False, cast=bool)
+PROFILING_LOG_SAMPLE_RATE = config("PROFILING_LOG_SAMPLE_RATE", default=0.01, cast=float)
+
 # 登入後跳轉路徑 && 登入路徑
 LOGIN_REDIRECT_URL = '/dashboard/'
 LOGIN_URL = '/users/login/'
@@ -0,0 +1,117 @@
+from functools import partial
+from unittest import skipUnless
+
+from django.db import connection, connections
+from django.test import override_settings
+from django.urls import reverse
+
+from .query_budget import get_query_budget
+from .session_backend import local_sessions
+
+
+def login(client, user):
+    """以 force_login 登入並標記已通過安全驗證，受 SecurityCheckMiddleware 保護的頁面才不會導向驗證頁。"""
+    client.force_login(user)
+    session = client.session
+    session["security_verified"] = True
+    session.save()
+
+
+def explain_plan(queryset):
+    """
+    取得查詢在目前資料庫上的執行計畫。
+    先收集資料表的統計資訊，讓規劃器能在多個可用的索引中依選擇性挑選。
+    PostgreSQL 會再關閉循序掃描的偏好，確認查詢在資料量變大後仍有索引可用。
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"ANALYZE {connection.ops.quote_name(queryset.model._meta.db_table)}")
+        if connection.vendor == 'postgresql':
+            cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+def sequential_scans(plan, table):
+    """找出執行計畫中對指定資料表的循序掃描。"""
+    lines = plan.splitlines()
+    if connection.vendor == 'postgresql':
+        return [line for line in lines if f"Seq Scan on {table}" in line]
+    return [
+        line for line in lines
+        if f"SCAN {table}" in line and "INDEX" not in line
+    ]
+
+
+requires_plan_support = skipUnless(
+    connection.vendor in ('postgresql', 'sqlite'), "僅支援 PostgreSQL 與 SQLite 的執行計畫檢查")
+
+
+class QueryPlanMixin:
+    """
+    測試熱門查詢的執行計畫使用為它建立的索引，沒有退化成循序掃描或改用其他索引。
+    """
+
+    def assertUsesIndex(self, queryset, index_name):
+        table = queryset.model._meta.db_table
+        plan = explain_plan(queryset)
+        scans = sequential_scans(plan, table)
+        self.assertFalse(scans, f"{table} 的查詢退化為循序掃描：\n{plan}")
+        self.assertIn(index_name, plan, f"{table} 的查詢未使用索引 {index_name}：\n{plan}")
+
+
+class ReplicaDatabaseMixin:
+    """
+    提供真實的唯讀副本連線。未設定副本時新增一個連到同一個測試資料庫的 alias，
+    讓測試確認查詢實際由哪一個連線執行。副本連線看不到主資料庫中尚未提交的測試資料，
+    相當於一個落後的副本。
+
+    alias 在測試資料庫建立後才加入，因此不列在類別的 databases 中，而是在 setUpClass 時補上。
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._added_replica = "replica" not in connections.settings
+        if cls._added_replica:
+            connections.settings["replica"] = {
+                **connections["default"].settings_dict, "TEST": {"MIRROR": "default"}}
+        cls.databases = {*cls.databases, "replica"}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls._added_replica:
+            connections["replica"].close()
+            del connections["replica"]
+            del connections.settings["replica"]
+
+
+class QueryBudgetMixin:
+    """
+    逐一請求 urlpatterns 中的每個視圖，確認都宣告了查詢上限且實際查詢次數不超過上限。
+    每個請求前清空行程內的 session LRU，上限需涵蓋從資料庫讀取 session 的查詢。
+    子類別需提供 budget_user（請求前登入的用戶），並可透過 url_kwargs、post_urls 與 post_data
+    指定路由參數、請求方法與表單內容。返回 {路由名稱: 回應}。
+    """
+    url_kwargs = {}
+    post_urls = ()
+    post_data = {}
+
+    def assertWithinQueryBudgets(self, urlpatterns, namespace):
+        responses = {}
+        for pattern in urlpatterns:
+            with self.subTest(pattern.name):
+                self.assertIsNotNone(
+                    get_query_budget(pattern.callback), f"{namespace}:{pattern.name} 未宣告 query_budget")
+                login(self.client, self.budget_user)
+                # 以冷的 session 計算：其他行程或 LRU 逾時後，session 需要從資料庫讀取
+                local_sessions.clear()
+                url = reverse(f"{namespace}:{pattern.name}", kwargs=self.url_kwargs.get(pattern.name, {}))
+                if pattern.name in self.post_urls:
+                    request = partial(self.client.post, url, self.post_data.get(pattern.name, {}))
+                else:
+                    request = partial(self.client.get, url)
+                with override_settings(QUERY_BUDGET_MODE='raise'):
+                    response = request()
+                self.assertLess(response.status_code, 500)
+                responses[pattern.name] = response
+        return responses
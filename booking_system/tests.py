@@ -0,0 +1,287 @@
+import json
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import connection, connections, router
+from django.http import HttpResponse
+
+from .db_router import ReplicaStickinessMiddleware, use_replica
+from .query_budget import QueryBudgetExceeded
+from .session_backend import SessionStore, local_sessions
+from .testing import ReplicaDatabaseMixin, login
+
+# 使用自訂的用戶模型
+User = get_user_model()
+
+
+def parse_server_timing(header):
+    """將 Server-Timing 標頭解析為 {名稱: 毫秒}。"""
+    metrics = {}
+    for item in header.split(","):
+        name, *params = item.strip().split(";")
+        for param in params:
+            if param.startswith("dur="):
+                metrics[name] = float(param[4:])
+    return metrics
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="TestPassword123!")
+        login(self.client, self.user)
+
+    def test_disabled_by_default(self):
+        """
+        測試未啟用時不加上 Server-Timing 標頭。
+        """
+        response = self.client.get(reverse("users:dashboard"))
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_LOG_SAMPLE_RATE=1.0)
+    def test_server_timing_header_and_log(self):
+        """
+        測試啟用後回傳各項耗時，並寫入結構化日誌。
+        """
+        with self.assertLogs("booking_system.profiling", level="INFO") as logs:
+            response = self.client.get(reverse("users:dashboard"))
+
+        metrics = parse_server_timing(response["Server-Timing"])
+        self.assertEqual(set(metrics), {"total", "app", "db", "tpl", "mw"})
+        self.assertGreater(metrics["tpl"], 0)
+        self.assertLessEqual(metrics["app"], metrics["total"])
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["path"], reverse("users:dashboard"))
+        self.assertEqual(record["status"], 200)
+        self.assertGreaterEqual(record["sql_count"], 1)  # 至少載入用戶
+        self.assertIn(f'desc="{record["sql_count"]} queries"', response["Server-Timing"])
+
+
+class ReplicaRouterTest(ReplicaDatabaseMixin, TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def replica_reads(self, func, *args):
+        """執行 func，返回結果與在唯讀副本連線上執行的查詢數。"""
+        with CaptureQueriesContext(connections["replica"]) as queries:
+            result = func(*args)
+        return result, len(queries)
+
+    @override_settings(REPLICA_DATABASE_ALIAS="unconfigured")
+    def test_falls_back_to_primary_without_replica(self):
+        """
+        測試未設定唯讀副本時一律讀取主資料庫。
+        """
+        with use_replica():
+            self.assertEqual(User.objects.all().db, "default")
+
+    def test_reads_replica_only_when_allowed(self):
+        """
+        測試只有標記的區塊讀取副本，寫入與 session 一律走主資料庫。
+        """
+        def read(model):
+            return model.objects.exists()
+
+        _, replica_queries = self.replica_reads(read, User)
+        self.assertEqual(replica_queries, 0)
+        with use_replica():
+            _, replica_queries = self.replica_reads(read, User)
+            self.assertEqual(replica_queries, 1)
+            _, replica_queries = self.replica_reads(read, Session)
+            self.assertEqual(replica_queries, 0)
+            self.assertEqual(router.db_for_write(User), "default")
+
+    def test_replica_lags_behind_uncommitted_writes(self):
+        """
+        測試副本是另一個連線：主資料庫尚未提交的寫入在副本上讀不到。
+        """
+        User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="TestPassword123!")
+        self.assertTrue(User.objects.using("default").exists())
+        self.assertFalse(User.objects.using("replica").exists())
+
+    def test_read_your_writes_stickiness(self):
+        """
+        測試寫入後的黏著期內，同一用戶的讀取改走主資料庫。
+        """
+        def view(request):
+            if request.method == "POST":
+                router.db_for_write(User)
+            with use_replica():
+                User.objects.exists()
+            return HttpResponse()
+
+        middleware = ReplicaStickinessMiddleware(view)
+        cookie = ReplicaStickinessMiddleware.cookie_name
+
+        response, replica_queries = self.replica_reads(middleware, self.factory.get("/"))
+        self.assertEqual(replica_queries, 1)
+        self.assertNotIn(cookie, response.cookies)
+
+        response, replica_queries = self.replica_reads(middleware, self.factory.post("/"))
+        self.assertEqual(replica_queries, 0)
+        self.assertIn(cookie, response.cookies)
+
+        request = self.factory.get("/")
+        request.COOKIES[cookie] = response.cookies[cookie].value
+        self.assertEqual(self.replica_reads(middleware, request)[1], 0)
+
+        request = self.factory.get("/")
+        request.COOKIES[cookie] = "0"
+        self.assertEqual(self.replica_reads(middleware, request)[1], 1)
+
+
+class TieredSessionTest(TestCase):
+    def setUp(self):
+        local_sessions.clear()
+
+    @override_settings(SESSION_LRU_SINGLE_WRITER=True)
+    def test_reads_are_served_from_memory(self):
+        """
+        測試只有單一行程寫入時，session 寫入後的讀取不需查詢資料庫。
+        """
+        session = SessionStore()
+        session["security_verified"] = True
+        session.create()
+
+        with self.assertNumQueries(0):
+            self.assertTrue(SessionStore(session.session_key)["security_verified"])
+
+        local_sessions.clear()
+        with self.assertNumQueries(1):
+            self.assertTrue(SessionStore(session.session_key)["security_verified"])
+
+    def test_memory_is_not_trusted_without_shared_cache(self):
+        """
+        測試沒有共用快取且可能有多個行程寫入時，讀取不使用行程內 LRU。
+        """
+        session = SessionStore()
+        session["cart"] = [1]
+        session.create()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(SessionStore(session.session_key)["cart"], [1])
+
+    @override_settings(SESSION_CACHE_ALIAS="default")
+    def test_stale_memory_checked_against_shared_version(self):
+        """
+        測試其他行程修改或刪除 session 後，行程內 LRU 的舊內容因版本不同而不被採用。
+        """
+        cache.clear()
+        session = SessionStore()
+        session["cart"] = [1]
+        session.create()
+        key = session.session_key
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(key)["cart"], [1])
+        stale = local_sessions.get(key)
+
+        # 模擬其他行程寫入，本行程的 LRU 仍是舊內容
+        other = SessionStore(key)
+        other["cart"] = [1, 2]
+        other.save()
+        local_sessions.set(key, stale)
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(key)["cart"], [1, 2])
+
+        # 模擬其他行程登出
+        SessionStore(key).delete()
+        local_sessions.set(key, stale)
+        self.assertIsNone(SessionStore(key).get("cart"))
+
+    def test_unchanged_data_is_not_written(self):
+        """
+        測試內容未變的寫入被略過，內容改變時才寫入資料庫。
+        """
+        session = SessionStore()
+        session["cart"] = [1, 2]
+        session.create()
+
+        loaded = SessionStore(session.session_key)
+        loaded["cart"] = [1, 2]
+        with self.assertNumQueries(0):
+            loaded.save()
+
+        loaded["cart"].append(3)
+        loaded.modified = True
+        with CaptureQueriesContext(connection) as queries:
+            loaded.save()
+        self.assertTrue(any("UPDATE" in query["sql"] for query in queries.captured_queries))
+        local_sessions.clear()
+        self.assertEqual(SessionStore(session.session_key)["cart"], [1, 2, 3])
+
+    def test_flush_invalidates_every_tier(self):
+        """
+        測試清除 session 後不會再從記憶體讀到舊資料。
+        """
+        session = SessionStore()
+        session["_auth_user_id"] = "1"
+        session.create()
+        key = session.session_key
+
+        SessionStore(key).flush()
+        self.assertEqual(SessionStore(key).get("_auth_user_id"), None)
+
+    def test_logout_keeps_security_verified(self):
+        """
+        測試登出後仍保留安全驗證狀態。
+        """
+        user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="TestPassword123!")
+        login(self.client, user)
+
+        response = self.client.get(reverse("users:logout"))
+        self.assertRedirects(response, reverse("users:login"))
+        self.assertNotIn("_auth_user_id", self.client.session)
+        self.assertTrue(self.client.session.get("security_verified"))
+
+
+class AsyncMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="TestPassword123!")
+
+    async def login(self):
+        await self.async_client.aforce_login(self.user)
+        session = await self.async_client.asession()
+        await session.aset("security_verified", True)
+        await session.asave()
+
+    async def test_async_chain_serves_async_views(self):
+        """
+        測試整條中介層以非同步模式執行非同步視圖，未驗證時仍會導向驗證頁。
+        """
+        response = await self.async_client.get(reverse("users:dashboard"))
+        self.assertRedirects(
+            response, reverse("security_check:check"), fetch_redirect_response=False)
+
+        await self.login()
+        response = await self.async_client.get(reverse("users:dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "testuser")
+
+    @override_settings(PROFILING_ENABLED=True)
+    async def test_async_profiling_counts_queries(self):
+        """
+        測試非同步模式下的計時仍計入視圖在同步執行緒中執行的查詢。
+        """
+        await self.login()
+        response = await self.async_client.get(reverse("users:dashboard"))
+        self.assertIn('db;dur=', response["Server-Timing"])
+        self.assertNotIn('desc="0 queries"', response["Server-Timing"])
+
+    async def test_async_query_budget_enforced(self):
+        """
+        測試非同步模式下超過查詢上限時同樣會拋出例外。
+        """
+        with override_settings(QUERY_BUDGET_MODE="raise"):
+            await self.login()
+            with patch("booking_system.query_budget.get_query_budget", return_value=0):
+                with self.assertRaises(QueryBudgetExceeded):
+                    await self.async_client.get(reverse("users:dashboard"))
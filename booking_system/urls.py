@@ -15,10 +15,18 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.http import HttpResponse
 from django.urls import path, include
 
+
+# 健康檢查，不存取資料庫
+def health(request):
+    return HttpResponse("ok", content_type="text/plain")
+
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("health/", health, name="health"),
     path("users/", include("users.urls", namespace="users")),
     path('appointments/', include('appointments.urls', namespace='appointments')),
     path('store/', include('store.urls', namespace='store')),
@@ -1,3 +1,7 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+
 def get_client_ip(request):
     """
     從請求中提取用戶的真實 IP 地址。
@@ -9,3 +13,14 @@ def get_client_ip(request):
     else:
         ip = request.META.get('REMOTE_ADDR', '未知 IP')
     return ip
+
+
+async def arender(request, template_name, context=None, **kwargs):
+    """
+    非同步視圖使用的 render。模板引擎沒有非同步介面，且渲染時可能延遲載入
+    request.user 或 session，因此在同步執行緒中渲染，不佔住事件迴圈。
+    """
+    if hasattr(request, "auser"):
+        # 沿用 login_required 以 auser() 載入的用戶，模板存取 request.user 時不必再查詢一次
+        request.user = await request.auser()
+    return await sync_to_async(render)(request, template_name, context, **kwargs)
@@ -1,19 +1,49 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 
+from .state import ais_verified, is_verified
+
 
 class SecurityCheckMiddleware:
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        self.exempt_prefixes = tuple(getattr(settings, "SECURITY_CHECK_EXEMPT_PATHS", ()))
+        self._check_path = None
 
-    def __call__(self, request):
-        # 如果用戶已驗證，放行
-        if request.session.get("security_verified", False):
-            return self.get_response(request)
+    @property
+    def check_path(self):
+        # 驗證頁面的路徑只需解析一次
+        if self._check_path is None:
+            self._check_path = reverse("security_check:check")
+        return self._check_path
 
+    def _needs_check(self, request):
+        # 靜態檔案與健康檢查等路徑不需驗證
+        if self.exempt_prefixes and request.path.startswith(self.exempt_prefixes):
+            return False
         # 如果請求的 URL 是驗證頁面，放行
-        if request.path == reverse("security_check:check"):
+        return request.path != self.check_path
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        # 如果用戶已驗證，放行
+        if not self._needs_check(request) or is_verified(request):
             return self.get_response(request)
 
         # 否則，重定向到驗證頁面
-        return redirect(reverse("security_check:check"))
+        return redirect(self.check_path)
+
+    async def __acall__(self, request):
+        if not self._needs_check(request) or await ais_verified(request):
+            return await self.get_response(request)
+        return redirect(self.check_path)
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core import signing
+
+# 簽章 cookie 的 salt，與 HttpRequest.get_signed_cookie 的計算方式一致
+COOKIE_SALT = "security_check"
+
+
+def uses_cookie():
+    return getattr(settings, "SECURITY_CHECK_MODE", "session") == "cookie"
+
+
+def is_verified(request):
+    """
+    判斷請求是否已通過安全驗證。
+    cookie 模式只檢查簽章與期限，不讀取 session，也不存取資料庫。
+    """
+    if uses_cookie():
+        return request.get_signed_cookie(
+            settings.SECURITY_CHECK_COOKIE_NAME, default=None,
+            salt=COOKIE_SALT, max_age=settings.SECURITY_CHECK_COOKIE_AGE,
+        ) == "1"
+    return request.session.get("security_verified", False)
+
+
+async def ais_verified(request):
+    """is_verified 的非同步版本，session 模式以非同步介面讀取 session。"""
+    if uses_cookie():
+        return is_verified(request)
+    return await request.session.aget("security_verified", False)
+
+
+def mark_verified(request, response):
+    """記錄驗證成功：cookie 模式寫入簽章 cookie，否則寫入 session。"""
+    if uses_cookie():
+        response.set_signed_cookie(
+            settings.SECURITY_CHECK_COOKIE_NAME, "1", salt=COOKIE_SALT,
+            max_age=settings.SECURITY_CHECK_COOKIE_AGE,
+            secure=request.is_secure(), httponly=True, samesite="Lax",
+        )
+    else:
+        request.session["security_verified"] = True
+    return response
+
+
+def signed_cookie_value():
+    """產生已驗證狀態的簽章 cookie 值，供壓測等工具直接帶入。"""
+    name = settings.SECURITY_CHECK_COOKIE_NAME
+    return signing.get_cookie_signer(salt=name + COOKIE_SALT).sign("1")
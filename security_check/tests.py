@@ -1,3 +1,160 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from .state import signed_cookie_value
+from .verification import averify_token, get_async_client
+from .views import check_security
+
+
+class StandInVerifyHandler(BaseHTTPRequestHandler):
+    """
+    模擬 Turnstile 驗證服務：token 為 'good' 時驗證成功，'slow' 時延遲回應。
+    """
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        token = form.get("response", [""])[0]
+        self.server.client_ports.add(self.client_address[1])
+        if token == "slow":
+            time.sleep(1)
+        body = json.dumps({"success": token == "good"}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客戶端已因逾時而中斷連線
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TurnstileVerificationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StandInVerifyHandler)
+        cls.server.daemon_threads = True
+        cls.server.client_ports = set()
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.settings_override = override_settings(
+            SECURITY_CHECK_VERIFY_URL=f"http://127.0.0.1:{cls.server.server_port}/siteverify",
+            SECURITY_CHECK_TIMEOUT=0.3,
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.client_ports.clear()
+
+    def test_client_closed_with_event_loop(self):
+        """
+        測試每個事件迴圈各自使用一個 client，迴圈結束時關閉，WSGI 下逐請求建立迴圈也不會留下連線。
+        """
+        clients = []
+
+        async def verify():
+            self.assertTrue(await averify_token("good", "127.0.0.1"))
+            clients.append(await get_async_client())
+
+        asyncio.run(verify())
+        async_to_sync(verify)()
+        self.assertIsNot(clients[0], clients[1])
+        self.assertTrue(all(client.is_closed for client in clients))
+
+    async def test_async_verification_reuses_connection(self):
+        """
+        測試非同步驗證共用 keep-alive 連線，且逾時視為失敗。
+        """
+        for _ in range(5):
+            self.assertTrue(await averify_token("good", "127.0.0.1"))
+        self.assertEqual(len(self.server.client_ports), 1)
+        self.assertFalse(await averify_token("bad", "127.0.0.1"))
+        self.assertFalse(await averify_token("slow", "127.0.0.1"))
+
+    async def test_view_marks_session_verified(self):
+        """
+        測試驗證頁面在驗證成功後設置 session 狀態。
+        """
+        factory = AsyncRequestFactory()
+
+        request = factory.post("/security_check/", {"cf-turnstile-response": "bad"})
+        request.session = SessionStore()
+        response = await check_security(request)
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(await request.session.aget("security_verified"))
+
+        request = factory.post("/security_check/", {"cf-turnstile-response": "good"})
+        request.session = SessionStore()
+        response = await check_security(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(await request.session.aget("security_verified"))
+
+
+@override_settings(SECURITY_CHECK_MODE="cookie")
+class SignedCookieModeTest(TestCase):
+    def test_unverified_request_costs_no_queries(self):
+        """
+        測試 cookie 模式下未驗證的請求直接重定向，不存取資料庫。
+        """
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("users:login"))
+        self.assertRedirects(response, reverse("security_check:check"), fetch_redirect_response=False)
+
+    def test_exempt_paths_skip_check(self):
+        """
+        測試健康檢查等路徑不需驗證。
+        """
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("health"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_signed_cookie_passes_check(self):
+        """
+        測試帶有效簽章 cookie 的請求放行，竄改或過期的 cookie 則被擋下。
+        """
+        self.client.cookies["security_verified"] = signed_cookie_value()
+        response = self.client.get(reverse("users:login"))
+        self.assertEqual(response.status_code, 200)
+
+        self.client.cookies["security_verified"] = signed_cookie_value() + "x"
+        response = self.client.get(reverse("users:login"))
+        self.assertEqual(response.status_code, 302)
+
+        self.client.cookies["security_verified"] = signed_cookie_value()
+        with override_settings(SECURITY_CHECK_COOKIE_AGE=-1):
+            response = self.client.get(reverse("users:login"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_view_sets_signed_cookie(self):
+        """
+        測試驗證成功後寫入簽章 cookie 而非 session。
+        """
+        with patch("security_check.views.averify_token", return_value=True):
+            response = self.client.post(
+                reverse("security_check:check"), {"cf-turnstile-response": "good"})
+        self.assertIn("security_verified", response.cookies)
+        self.assertNotIn("security_verified", self.client.session)
@@ -0,0 +1,70 @@
+import asyncio
+import logging
+import weakref
+
+import httpx
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# 每個事件迴圈共用一個連線池（keep-alive），連線綁定在建立時的事件迴圈上
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _payload(token, remote_ip):
+    return {
+        "secret": settings.SECURITY_CHECK_SECRET_KEY,
+        "response": token,
+        "remoteip": remote_ip,
+    }
+
+
+async def _client_lifetime(client):
+    """
+    事件迴圈結束時關閉 client。asyncio.run 結束前會以 shutdown_asyncgens
+    收尾尚未結束的非同步產生器，finally 在同一個事件迴圈中執行。
+    """
+    try:
+        yield client
+    finally:
+        await client.aclose()
+
+
+async def get_async_client():
+    """
+    取得目前事件迴圈共用的 httpx.AsyncClient，不存在時建立。
+    client 在事件迴圈結束時關閉，WSGI 下每個請求各自建立迴圈，連線不會跨請求留存。
+    """
+    loop = asyncio.get_running_loop()
+    client, _ = _async_clients.get(loop, (None, None))
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.SECURITY_CHECK_TIMEOUT,
+                connect=settings.SECURITY_CHECK_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.SECURITY_CHECK_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.SECURITY_CHECK_MAX_CONNECTIONS,
+            ),
+        )
+        lifetime = _client_lifetime(client)
+        await lifetime.__anext__()
+        # 事件迴圈只以弱參照追蹤產生器，需在此保留參照
+        _async_clients[loop] = (client, lifetime)
+    return client
+
+
+async def averify_token(token, remote_ip):
+    """
+    非同步向 Turnstile 驗證 Token，等待回應期間不佔用工作執行緒。
+    逾時或服務異常時視為驗證失敗。
+    """
+    try:
+        client = await get_async_client()
+        response = await client.post(
+            settings.SECURITY_CHECK_VERIFY_URL, data=_payload(token, remote_ip))
+        return response.json().get("success", False)
+    except (httpx.HTTPError, ValueError) as e:
+        logger.warning(f"Turnstile 驗證請求失敗: {type(e).__name__} {e}")
+        return False
@@ -0,0 +1,40 @@
+from .models import StaffOccupancy
+from .occupancy import free_windows
+
+
+def find_available_windows(service, start_date, end_date, staff_ids=None):
+    """
+    搜尋服務在日期區間內（含首尾）的可預約空檔。
+
+    依 Service.staff 找出可提供服務的人員，從 StaffOccupancy 的佔用位圖取出
+    有排班且未被預約的格，保留長度足以容納 Service.duration 的空檔。
+    空檔以 5 分鐘為單位，排班向內、預約向外取整。
+    整個搜尋只發出固定數量的查詢，與人員數和天數無關。
+
+    回傳列表，每筆為 {'staff_id', 'staff_name', 'date', 'start', 'end'}，
+    依人員與開始時間排序。
+    """
+    staff_qs = service.staff.filter(is_active=True)
+    if staff_ids is not None:
+        staff_qs = staff_qs.filter(pk__in=staff_ids)
+    staff_names = dict(staff_qs.values_list('id', 'name'))
+    if not staff_names:
+        return []
+
+    occupancies = StaffOccupancy.objects.filter(
+        staff_id__in=staff_names,
+        date__gte=start_date,
+        date__lte=end_date,
+    ).only('staff_id', 'date', 'schedule_bits', 'booked_bits').order_by('staff_id', 'date')
+
+    windows = []
+    for occupancy in occupancies:
+        for start, end in free_windows(occupancy, service.duration):
+            windows.append({
+                'staff_id': occupancy.staff_id,
+                'staff_name': staff_names[occupancy.staff_id],
+                'date': occupancy.date,
+                'start': start,
+                'end': end,
+            })
+    return windows
@@ -0,0 +1,105 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Store, ServiceCategory, Service, StaffRole, Staff
+
+
+def version_key(store_id):
+    return f"store:{store_id}:catalog:version"
+
+
+def catalog_key(store_id):
+    return f"store:{store_id}:catalog"
+
+
+def _new_version():
+    """以毫秒時間戳作為新版本號，避免版本鍵被淘汰後與快取中舊目錄的版本相同。"""
+    return int(time.time() * 1000)
+
+
+def bump_catalog_version(store_id):
+    """
+    讓店鋪目錄失效。快取中的目錄不會被刪除，版本號不符時會在下次讀取時重新組裝並覆蓋。
+    """
+    try:
+        cache.incr(version_key(store_id))
+    except ValueError:
+        cache.set(version_key(store_id), _new_version(), timeout=None)
+
+
+def build_catalog(store_id, using=None):
+    """
+    從資料庫組出店鋪的完整目錄，只包含啟用中的資料，回傳可直接序列化的 dict。
+    店鋪不存在時回傳 None。using 指定讀取的資料庫，預設由路由決定。
+    """
+    store = Store.objects.db_manager(using).filter(pk=store_id, is_active=True).first()
+    if store is None:
+        return None
+
+    categories = ServiceCategory.objects.db_manager(using).filter(store_id=store_id, is_active=True)
+    services = Service.objects.db_manager(using).filter(store_id=store_id, is_active=True).prefetch_related(
+        Prefetch('staff', queryset=Staff.objects.db_manager(using).filter(is_active=True).only('id')))
+    roles = StaffRole.objects.db_manager(using).filter(store_id=store_id, is_active=True)
+    staff = Staff.objects.db_manager(using).filter(store_id=store_id, is_active=True)
+
+    return {
+        'id': store.id,
+        'name': store.name,
+        'location': store.location,
+        'phone': store.phone,
+        'opening_time': store.opening_time.isoformat(),
+        'closing_time': store.closing_time.isoformat(),
+        'business_days': store.business_days,
+        'categories': [
+            {'id': category.id, 'name': category.name, 'description': category.description}
+            for category in categories
+        ],
+        'services': [
+            {
+                'id': service.id,
+                'name': service.name,
+                'category_id': service.category_id,
+                'description': service.description,
+                'price': str(service.price),
+                'duration': service.duration,
+                'staff_ids': [member.id for member in service.staff.all()],
+            }
+            for service in services
+        ],
+        'roles': [
+            {'id': role.id, 'name': role.name, 'category_id': role.category_id}
+            for role in roles
+        ],
+        'staff': [
+            {'id': member.id, 'name': member.name, 'role_id': member.role_id, 'expertise': member.expertise}
+            for member in staff
+        ],
+    }
+
+
+def get_store_catalog(store_id):
+    """
+    讀取店鋪目錄，優先使用快取。目錄內容變更時由 store.signals 更新版本號。
+
+    快取的目錄附帶組裝時的版本號，以 get_many 一次取回版本號與目錄，版本相符才使用，
+    命中時只需一次快取往返。組裝期間版本號被更新時，寫入的目錄版本不符，下次讀取會再重新組裝。
+    未命中時一律從主資料庫組裝，避免在唯讀視圖中把落後副本的舊資料寫進快取。
+    """
+    keys = version_key(store_id), catalog_key(store_id)
+    cached = cache.get_many(keys)
+    version = cached.get(keys[0])
+    if version is None:
+        cache.add(keys[0], _new_version(), timeout=None)
+        version = cache.get(keys[0])
+
+    entry = cached.get(keys[1])
+    if entry is not None and entry['version'] == version:
+        return entry['catalog']
+
+    catalog = build_catalog(store_id, using='default')
+    if catalog is not None:
+        cache.set(keys[1], {'version': version, 'catalog': catalog}, timeout=settings.CATALOG_CACHE_TIMEOUT)
+    return catalog
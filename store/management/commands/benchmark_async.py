@@ -0,0 +1,226 @@
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.test import Client
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import NoReverseMatch, reverse
+
+from security_check.state import signed_cookie_value, uses_cookie
+from .load_test import summarize
+
+User = get_user_model()
+
+DEFAULT_PATHS = ["users:dashboard", "store:store_list", "appointments:my_appointments"]
+
+
+class Command(BaseCommand):
+    help = (
+        "在同一台機器上比較 WSGI 處理器（執行緒池）與 ASGI 處理器（事件迴圈）"
+        "在高並行下的吞吐量與 p50/p95/p99 延遲。兩種處理器執行的是同一組非同步視圖，"
+        "WSGI 下每個請求需以 async_to_sync 建立事件迴圈執行視圖，結果另外記錄這部分的成本。"
+        "不需啟動伺服器，請求在臨時建立的測試資料庫中執行，結束後移除，不會寫入設定中的資料庫。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=["both", "wsgi", "asgi"], default="both",
+                            help="both 會依序執行兩種處理器並比較結果")
+        parser.add_argument("--path", action="append", dest="paths",
+                            help=f"受測的 URL 名稱或路徑，可重複，預設為 {', '.join(DEFAULT_PATHS)}")
+        parser.add_argument("--requests", type=int, default=500, help="每個路徑的請求數")
+        parser.add_argument("--concurrency", type=int, default=200, help="同時進行的請求數")
+        parser.add_argument("--host", default="localhost", help="請求的 Host 標頭，需在 ALLOWED_HOSTS 中")
+        parser.add_argument("--username", default="benchmark", help="模擬用戶的帳號")
+        parser.add_argument("--output", help="將結果寫入指定的 JSON 檔案")
+        parser.add_argument("--keepdb", action="store_true", help="保留並沿用既有的測試資料庫，同 test --keepdb")
+
+    def handle(self, *args, **options):
+        if min(options["requests"], options["concurrency"]) <= 0:
+            raise CommandError("--requests 與 --concurrency 必須大於 0")
+
+        paths = [self._resolve(path) for path in (options["paths"] or DEFAULT_PATHS)]
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        try:
+            if options["mode"] == "both":
+                result = self._compare(paths, options)
+            else:
+                result = self._run(options["mode"], paths, options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def _resolve(self, path):
+        if path.startswith("/"):
+            return path
+        try:
+            return reverse(path)
+        except NoReverseMatch:
+            raise CommandError(f"無法解析路徑: {path}")
+
+    def _compare(self, paths, options):
+        results = {mode: self._run(mode, paths, options) for mode in ("wsgi", "asgi")}
+        results["throughput_ratio"] = {
+            endpoint: round(stats["throughput"] / results["wsgi"]["endpoints"][endpoint]["throughput"], 2)
+            for endpoint, stats in results["asgi"]["endpoints"].items()
+            if results["wsgi"]["endpoints"].get(endpoint, {}).get("throughput")
+        }
+        return results
+
+    def _cookie_header(self, username):
+        """登入模擬用戶並通過安全驗證，回傳 Cookie 標頭。"""
+        user, _ = User.objects.get_or_create(
+            username=username, defaults={"email": f"{username}@example.com"})
+        client = Client()
+        client.force_login(user)
+        if uses_cookie():
+            client.cookies[settings.SECURITY_CHECK_COOKIE_NAME] = signed_cookie_value()
+        else:
+            session = client.session
+            session["security_verified"] = True
+            session.save()
+        return "; ".join(f"{name}={morsel.value}" for name, morsel in client.cookies.items())
+
+    def _run(self, mode, paths, options):
+        cookie = self._cookie_header(options["username"])
+        jobs = [path for _ in range(options["requests"]) for path in paths]
+        samples = defaultdict(list)
+        lock = threading.Lock()
+
+        def record(path, latency, status):
+            with lock:
+                samples[path].append((latency, status))
+
+        started = time.perf_counter()
+        if mode == "wsgi":
+            self._run_wsgi(jobs, cookie, options, record)
+        else:
+            asyncio.run(self._run_asgi(jobs, cookie, options, record))
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "mode": mode,
+            "concurrency": options["concurrency"],
+            "elapsed_seconds": round(elapsed, 3),
+            "endpoints": summarize(samples, elapsed),
+        }
+        if mode == "wsgi":
+            result["async_to_sync_ms"] = self._async_to_sync_cost(len(jobs), options["concurrency"])
+        return result
+
+    def _async_to_sync_cost(self, calls, concurrency):
+        """
+        以相同的執行緒池呼叫空的協程，量測 WSGI 下每個請求以 async_to_sync 執行非同步視圖的平均額外毫秒數。
+        """
+        async def noop():
+            pass
+
+        def call(_):
+            started = time.perf_counter()
+            async_to_sync(noop)()
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            durations = list(executor.map(call, range(calls)))
+        return round(sum(durations) / len(durations) * 1000, 3)
+
+    def _run_wsgi(self, jobs, cookie, options, record):
+        """以固定大小的執行緒池呼叫 WSGI 處理器，模擬多執行緒的 WSGI 伺服器。"""
+        application = get_wsgi_application()
+
+        def request(path):
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "SCRIPT_NAME": "",
+                "PATH_INFO": path,
+                "QUERY_STRING": "",
+                "SERVER_NAME": options["host"],
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "REMOTE_ADDR": "127.0.0.1",
+                "HTTP_HOST": options["host"],
+                "HTTP_COOKIE": cookie,
+                "wsgi.version": (1, 0),
+                "wsgi.url_scheme": "http",
+                "wsgi.input": io.BytesIO(),
+                "wsgi.errors": sys.stderr,
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+            }
+            status = []
+            started = time.perf_counter()
+            response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            record(path, time.perf_counter() - started, int(status[0].split()[0]))
+
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            list(executor.map(request, jobs))
+
+    async def _run_asgi(self, jobs, cookie, options, record):
+        """以 concurrency 個協程同時呼叫 ASGI 處理器，模擬單一事件迴圈的 ASGI 伺服器。"""
+        application = get_asgi_application()
+        pending = iter(jobs)
+
+        async def request(path):
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [(b"host", options["host"].encode()), (b"cookie", cookie.encode())],
+                "client": ("127.0.0.1", 0),
+                "server": (options["host"], 80),
+            }
+            status = []
+            body_sent = False
+            finished = asyncio.Event()
+
+            async def receive():
+                # 第一次回傳請求內容，之後等到回應送出後才通知連線結束
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await finished.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+                elif message["type"] == "http.response.body" and not message.get("more_body"):
+                    finished.set()
+
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            record(path, time.perf_counter() - started, status[0])
+
+        async def worker():
+            for path in pending:
+                await request(path)
+
+        await asyncio.gather(*(worker() for _ in range(options["concurrency"])))
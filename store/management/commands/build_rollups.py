@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.rollups import mark_range, process_dirty_days
+
+
+class Command(BaseCommand):
+    help = (
+        "重算有變動的店鋪日的營收與使用率統計。指定 --from 時先標記區間內所有有排班或預約的日子，"
+        "用於初次導入或服務價格調整後重算。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start_date", help="重算區間的起始日期（YYYY-MM-DD）")
+        parser.add_argument("--to", dest="end_date", help="重算區間的結束日期（YYYY-MM-DD），預設不限")
+        parser.add_argument("--limit", type=int, help="本次最多處理的店鋪日數，預設全部")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options["start_date"]) if options["start_date"] else None
+            end_date = date.fromisoformat(options["end_date"]) if options["end_date"] else None
+        except ValueError:
+            raise CommandError("日期格式錯誤，請使用 YYYY-MM-DD")
+        if end_date and not start_date:
+            raise CommandError("指定 --to 時需同時指定 --from")
+        if options["limit"] is not None and options["limit"] <= 0:
+            raise CommandError("--limit 必須大於 0")
+
+        if start_date:
+            marked = mark_range(start_date, end_date)
+            self.stdout.write(f"已標記 {marked} 個店鋪日")
+
+        def progress(processed):
+            if processed % 100 == 0:
+                self.stdout.write(f"已重算 {processed} 個店鋪日")
+
+        processed = process_dirty_days(limit=options["limit"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"完成：重算 {processed} 個店鋪日"))
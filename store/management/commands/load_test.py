@@ -0,0 +1,174 @@
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from importlib import import_module
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from security_check.state import signed_cookie_value, uses_cookie
+from store.models import Service, TimeSlot
+
+User = get_user_model()
+
+
+def percentile(sorted_values, pct):
+    """以最近排名法計算百分位數，輸入需已排序。"""
+    if not sorted_values:
+        return None
+    rank = max(int(-(-pct * len(sorted_values) // 100)), 1)
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    將 {端點: [(延遲秒數, 狀態碼), ...]} 彙整為吞吐量與延遲百分位數（毫秒）。
+    """
+    report = {}
+    for endpoint, records in sorted(samples.items()):
+        latencies = sorted(latency * 1000 for latency, _ in records)
+        statuses = defaultdict(int)
+        for _, status in records:
+            statuses[str(status)] += 1
+        report[endpoint] = {
+            "requests": len(records),
+            "throughput": round(len(records) / elapsed, 2) if elapsed else None,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(latencies[-1], 2),
+            "status": dict(statuses),
+        }
+    return report
+
+
+class Command(BaseCommand):
+    help = (
+        "以多個並行模擬客戶端對本機伺服器執行登入、儀表板、店鋪列表、空檔搜尋與預約流程，"
+        "並以 JSON 輸出各端點的吞吐量與 p50/p95/p99 延遲。伺服器需與本指令使用同一個資料庫。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="受測伺服器網址")
+        parser.add_argument("--clients", type=int, default=10, help="並行客戶端數量")
+        parser.add_argument("--iterations", type=int, default=20, help="每個客戶端執行瀏覽與預約流程的次數")
+        parser.add_argument("--service", type=int, required=True, help="空檔搜尋與預約使用的服務 id")
+        parser.add_argument("--days", type=int, default=7, help="空檔搜尋的天數")
+        parser.add_argument("--prefix", default="loadtest", help="模擬用戶的帳號前綴")
+        parser.add_argument("--output", help="將結果寫入指定的 JSON 檔案")
+
+    def handle(self, *args, **options):
+        if min(options["clients"], options["iterations"], options["days"]) <= 0:
+            raise CommandError("--clients、--iterations 與 --days 必須大於 0")
+        try:
+            self.service = Service.objects.get(pk=options["service"])
+        except Service.DoesNotExist:
+            raise CommandError("服務不存在")
+
+        self.base_url = options["base_url"].rstrip("/")
+        self.days = options["days"]
+        self.password = "LoadTest12345"
+        self.timeslot_ids = list(
+            TimeSlot.objects.filter(
+                service=self.service, is_active=True, start_time__gt=timezone.now(),
+                booked_count__lt=F("max_capacity"),
+            ).values_list("id", flat=True)
+        )
+        emails = self._prepare_users(options["prefix"], options["clients"])
+
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["clients"]) as executor:
+            list(executor.map(lambda email: self._run_client(email, options["iterations"]), emails))
+        elapsed = time.perf_counter() - started
+
+        result = {
+            "base_url": self.base_url,
+            "clients": options["clients"],
+            "iterations": options["iterations"],
+            "elapsed_seconds": round(elapsed, 3),
+            "endpoints": summarize(self.samples, elapsed),
+        }
+        output = json.dumps(result, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def _prepare_users(self, prefix, count):
+        """建立或重用模擬用戶，所有用戶共用同一個密碼雜湊以節省準備時間。"""
+        emails = [f"{prefix}{i}@example.com" for i in range(count)]
+        existing = set(User.objects.filter(email__in=emails).values_list("email", flat=True))
+        password_hash = make_password(self.password)
+        User.objects.bulk_create([
+            User(username=email.split("@")[0], email=email, password=password_hash)
+            for email in emails if email not in existing
+        ])
+        User.objects.filter(email__in=emails).update(password=password_hash)
+        return emails
+
+    def _verified_session(self):
+        """建立已通過安全驗證的 session，讓模擬客戶端略過 Turnstile 頁面（session 模式）。"""
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session["security_verified"] = True
+        session.create()
+        return session.session_key
+
+    def _request(self, client, endpoint, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = client.request(method, self.base_url + path, allow_redirects=False, timeout=30, **kwargs)
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        latency = time.perf_counter() - started
+        with self.lock:
+            self.samples[endpoint].append((latency, status))
+        return response
+
+    def _csrf_headers(self, client):
+        return {"X-CSRFToken": client.cookies.get(settings.CSRF_COOKIE_NAME, "")}
+
+    def _run_client(self, email, iterations):
+        with requests.Session() as client:
+            if uses_cookie():
+                client.cookies.set(settings.SECURITY_CHECK_COOKIE_NAME, signed_cookie_value())
+            else:
+                client.cookies.set(settings.SESSION_COOKIE_NAME, self._verified_session())
+
+            # 登入（先取得 CSRF cookie）
+            self._request(client, "login_page", "GET", reverse("users:login"))
+            self._request(
+                client, "login", "POST", reverse("users:login"),
+                data={"email": email, "password": self.password},
+                headers=self._csrf_headers(client),
+            )
+
+            availability_url = reverse("store:availability", args=[self.service.id])
+            for _ in range(iterations):
+                self._request(client, "dashboard", "GET", reverse("users:dashboard"))
+                self._request(client, "store_list", "GET", reverse("store:store_list"))
+                start = date.today() + timedelta(days=random.randint(0, 6))
+                self._request(
+                    client, "availability", "GET", availability_url,
+                    params={"start": start.isoformat(),
+                            "end": (start + timedelta(days=self.days - 1)).isoformat()},
+                )
+                if self.timeslot_ids:
+                    self._request(
+                        client, "book", "POST",
+                        reverse("appointments:book", args=[random.choice(self.timeslot_ids)]),
+                        headers=self._csrf_headers(client),
+                    )
@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.materializer import materialize_timeslots
+
+
+class Command(BaseCommand):
+    help = "依排班與服務時長產生可預約時段，只處理尚未產生過的排班，可重複執行。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start_date", help="起始日期（YYYY-MM-DD），預設為今天")
+        parser.add_argument("--to", dest="end_date", help="結束日期（YYYY-MM-DD），預設不限")
+        parser.add_argument("--batch-size", type=int, default=500, help="每個交易處理的排班數")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options["start_date"]) if options["start_date"] else date.today()
+            end_date = date.fromisoformat(options["end_date"]) if options["end_date"] else None
+        except ValueError:
+            raise CommandError("日期格式錯誤，請使用 YYYY-MM-DD")
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size 必須大於 0")
+
+        def progress(schedules, slots):
+            self.stdout.write(f"已處理排班 {schedules} 筆，新增時段 {slots} 筆")
+
+        schedules, slots = materialize_timeslots(
+            start_date, end_date, batch_size=options["batch_size"], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"完成：處理排班 {schedules} 筆，新增時段 {slots} 筆"))
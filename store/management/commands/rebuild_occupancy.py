@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import WorkSchedule
+from store.occupancy import refresh_occupancy
+
+
+class Command(BaseCommand):
+    help = "依排班與預約重建服務人員的每日佔用位圖，用於初次導入或修復資料。"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start_date", help="起始日期（YYYY-MM-DD），預設為今天")
+        parser.add_argument("--to", dest="end_date", help="結束日期（YYYY-MM-DD），預設不限")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options["start_date"]) if options["start_date"] else date.today()
+            end_date = date.fromisoformat(options["end_date"]) if options["end_date"] else None
+        except ValueError:
+            raise CommandError("日期格式錯誤，請使用 YYYY-MM-DD")
+
+        pairs = WorkSchedule.objects.filter(date__gte=start_date)
+        if end_date:
+            pairs = pairs.filter(date__lte=end_date)
+        pairs = pairs.values_list("staff_id", "date").distinct().order_by("date", "staff_id")
+
+        count = 0
+        for staff_id, day in pairs.iterator():
+            refresh_occupancy(staff_id, day)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"完成：重建佔用位圖 {count} 筆"))
@@ -0,0 +1,95 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Service, TimeSlot, WorkSchedule
+
+
+def iter_slot_bounds(schedule_date, start_time, end_time, duration):
+    """
+    依服務時長切分排班區間，逐一產生 (開始, 結束) 的具時區時間。
+    不足一個完整時長的尾段會被捨棄。
+    """
+    tz = timezone.get_current_timezone()
+    cursor = timezone.make_aware(datetime.combine(schedule_date, start_time), tz)
+    end = timezone.make_aware(datetime.combine(schedule_date, end_time), tz)
+    step = timedelta(minutes=duration)
+    while cursor + step <= end:
+        yield cursor, cursor + step
+        cursor += step
+
+
+def pending_schedules(start_date=None, end_date=None):
+    """尚未產生時段的有效排班。"""
+    queryset = WorkSchedule.objects.filter(materialized_at__isnull=True, is_active=True)
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+    return queryset
+
+
+def materialize_batch(schedules, batch_size=1000):
+    """
+    為一批排班產生時段，並在同一個短交易內標記為已產生。
+
+    已存在時段的 (排班, 服務) 組合會被跳過，因此中途失敗或重複執行都不會產生重複時段。
+    回傳新建立的時段數量。
+    """
+    schedule_ids = [schedule.id for schedule in schedules]
+    staff_ids = {schedule.staff_id for schedule in schedules}
+
+    services_by_staff = defaultdict(list)
+    performable = Service.staff.through.objects.filter(
+        staff_id__in=staff_ids, service__is_active=True,
+    ).values_list('staff_id', 'service_id', 'service__duration')
+    for staff_id, service_id, duration in performable:
+        if duration and duration > 0:
+            services_by_staff[staff_id].append((service_id, duration))
+
+    with transaction.atomic():
+        existing = set(
+            TimeSlot.objects.filter(schedule_id__in=schedule_ids)
+            .values_list('schedule_id', 'service_id')
+            .distinct()
+        )
+        slots = []
+        for schedule in schedules:
+            for service_id, duration in services_by_staff.get(schedule.staff_id, []):
+                if (schedule.id, service_id) in existing:
+                    continue
+                for start, end in iter_slot_bounds(
+                        schedule.date, schedule.start_time, schedule.end_time, duration):
+                    slots.append(TimeSlot(
+                        schedule_id=schedule.id, service_id=service_id,
+                        start_time=start, end_time=end,
+                    ))
+        TimeSlot.objects.bulk_create(slots, batch_size=batch_size)
+        # 只更新展開時間，不影響佔用位圖，略過訊號無妨
+        WorkSchedule.objects.filter(id__in=schedule_ids).update(materialized_at=timezone.now())
+    return len(slots)
+
+
+def materialize_timeslots(start_date=None, end_date=None, batch_size=500, progress=None):
+    """
+    以排班 id 遞增的方式分批處理所有待產生的排班。
+    每批獨立提交，可隨時中斷並從未標記的排班繼續。
+    回傳 (處理排班數, 新建時段數)。
+    """
+    queryset = pending_schedules(start_date, end_date).only(
+        'id', 'staff_id', 'date', 'start_time', 'end_time').order_by('id')
+    last_id = 0
+    total_schedules = 0
+    total_slots = 0
+    while True:
+        schedules = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not schedules:
+            break
+        total_slots += materialize_batch(schedules)
+        total_schedules += len(schedules)
+        last_id = schedules[-1].id
+        if progress:
+            progress(total_schedules, total_slots)
+    return total_schedules, total_slots
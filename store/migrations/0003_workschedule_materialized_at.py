@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="workschedule",
+            name="materialized_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="已產生對應時段的時間，空值表示尚未產生",
+                null=True,
+            ),
+        ),
+    ]
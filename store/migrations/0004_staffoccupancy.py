@@ -0,0 +1,58 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0003_workschedule_materialized_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StaffOccupancy",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(help_text="日期")),
+                (
+                    "schedule_bits",
+                    models.BinaryField(
+                        default=bytes,
+                        help_text="排班可工作時間的位圖，每個位元代表一格",
+                    ),
+                ),
+                (
+                    "booked_bits",
+                    models.BinaryField(
+                        default=bytes, help_text="已預約時間的位圖，每個位元代表一格"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="最後更新時間"),
+                ),
+                (
+                    "staff",
+                    models.ForeignKey(
+                        help_text="服務人員",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="occupancies",
+                        to="store.staff",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("staff", "date")},
+            },
+        ),
+    ]
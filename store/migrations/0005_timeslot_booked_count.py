@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0004_staffoccupancy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="timeslot",
+            name="booked_count",
+            field=models.IntegerField(default=0, help_text="時段已被預約的人數"),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0005_timeslot_booked_count"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["service", "start_time"],
+                name="timeslot_service_start_active",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workschedule",
+            index=models.Index(
+                fields=["staff", "date"], name="workschedule_staff_date"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="workschedule",
+            index=models.Index(
+                condition=models.Q(
+                    ("is_active", True), ("materialized_at__isnull", True)
+                ),
+                fields=["date"],
+                name="workschedule_pending_date",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0006_hot_path_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="timeslot",
+            index=models.Index(fields=["end_time"], name="timeslot_end_time"),
+        ),
+    ]
@@ -0,0 +1,229 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0007_timeslot_end_time_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupDirtyDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(help_text="日期")),
+                (
+                    "marked_at",
+                    models.DateTimeField(
+                        help_text="最後標記時間，處理期間再次標記時會保留到下次處理"
+                    ),
+                ),
+                (
+                    "store",
+                    models.ForeignKey(
+                        help_text="店鋪",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollup_dirty_days",
+                        to="store.store",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("store", "date")},
+            },
+        ),
+        migrations.CreateModel(
+            name="ServiceDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(help_text="日期")),
+                (
+                    "appointments",
+                    models.PositiveIntegerField(default=0, help_text="有效預約數"),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="已確認預約的服務金額",
+                        max_digits=12,
+                    ),
+                ),
+                (
+                    "booked_minutes",
+                    models.PositiveIntegerField(default=0, help_text="已預約的分鐘數"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="最後計算時間"),
+                ),
+                (
+                    "service",
+                    models.ForeignKey(
+                        help_text="服務",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="store.service",
+                    ),
+                ),
+                (
+                    "store",
+                    models.ForeignKey(
+                        help_text="店鋪，用於依店鋪查詢",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="service_daily_rollups",
+                        to="store.store",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["store", "date"], name="service_rollup_store_date"
+                    )
+                ],
+                "unique_together": {("service", "date")},
+            },
+        ),
+        migrations.CreateModel(
+            name="StaffDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(help_text="日期")),
+                (
+                    "appointments",
+                    models.PositiveIntegerField(default=0, help_text="有效預約數"),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="已確認預約的服務金額",
+                        max_digits=12,
+                    ),
+                ),
+                (
+                    "booked_minutes",
+                    models.PositiveIntegerField(default=0, help_text="已預約的分鐘數"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="最後計算時間"),
+                ),
+                (
+                    "scheduled_minutes",
+                    models.PositiveIntegerField(default=0, help_text="排班的分鐘數"),
+                ),
+                (
+                    "staff",
+                    models.ForeignKey(
+                        help_text="服務人員",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="store.staff",
+                    ),
+                ),
+                (
+                    "store",
+                    models.ForeignKey(
+                        help_text="店鋪，用於依店鋪查詢",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="staff_daily_rollups",
+                        to="store.store",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["store", "date"], name="staff_rollup_store_date"
+                    )
+                ],
+                "unique_together": {("staff", "date")},
+            },
+        ),
+        migrations.CreateModel(
+            name="StoreDailyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField(help_text="日期")),
+                (
+                    "appointments",
+                    models.PositiveIntegerField(default=0, help_text="有效預約數"),
+                ),
+                (
+                    "revenue",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        help_text="已確認預約的服務金額",
+                        max_digits=12,
+                    ),
+                ),
+                (
+                    "booked_minutes",
+                    models.PositiveIntegerField(default=0, help_text="已預約的分鐘數"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, help_text="最後計算時間"),
+                ),
+                (
+                    "scheduled_minutes",
+                    models.PositiveIntegerField(
+                        default=0, help_text="所有服務人員排班的分鐘數"
+                    ),
+                ),
+                (
+                    "store",
+                    models.ForeignKey(
+                        help_text="店鋪",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_rollups",
+                        to="store.store",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("store", "date")},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0008_daily_rollups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="store",
+            name="tracks_attendance",
+            field=models.BooleanField(
+                default=False,
+                help_text="是否由店家登記客人到店；啟用後，時段結束仍未登記到店的已確認預約會被標記為未出席",
+            ),
+        ),
+    ]
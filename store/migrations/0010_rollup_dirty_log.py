@@ -0,0 +1,31 @@
+# Generated by Django 5.1.3 on 2026-10-18 04:54
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0009_store_tracks_attendance"),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name="rollupdirtyday",
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name="rollupdirtyday",
+            name="marked_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, help_text="標記時間"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="rollupdirtyday",
+            index=models.Index(
+                fields=["store", "date"], name="rollup_dirty_store_date"
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+from collections import defaultdict
+
+from django.db import migrations
+from django.utils import timezone
+
+from store.occupancy import (
+    RELEASED_STATUSES, day_bounds, interval_mask, local_dates, schedule_mask, to_bytes,
+)
+
+
+def backfill_occupancy(apps, schema_editor):
+    """依今天起的排班與預約回填服務人員的每日佔用位圖，已存在的列以重算結果覆蓋。"""
+    Appointment = apps.get_model("appointments", "Appointment")
+    StaffOccupancy = apps.get_model("store", "StaffOccupancy")
+    WorkSchedule = apps.get_model("store", "WorkSchedule")
+    today = timezone.localdate()
+
+    schedules = defaultdict(int)
+    for staff_id, day, start_time, end_time in WorkSchedule.objects.filter(
+            date__gte=today, is_active=True,
+    ).values_list("staff_id", "date", "start_time", "end_time").iterator():
+        schedules[(staff_id, day)] |= schedule_mask(day, start_time, end_time)
+
+    booked = defaultdict(int)
+    for staff_id, start, end in Appointment.objects.filter(
+            timeslot__end_time__gt=day_bounds(today)[0],
+    ).exclude(
+        status__in=RELEASED_STATUSES,
+    ).values_list("staff_id", "timeslot__start_time", "timeslot__end_time").iterator():
+        for day in local_dates(start, end):
+            if day >= today:
+                booked[(staff_id, day)] |= interval_mask(day, start, end)
+
+    now = timezone.now()
+    StaffOccupancy.objects.bulk_create(
+        [
+            StaffOccupancy(
+                staff_id=staff_id, date=day, updated_at=now,
+                schedule_bits=to_bytes(schedules[(staff_id, day)]),
+                booked_bits=to_bytes(booked[(staff_id, day)]),
+            )
+            for staff_id, day in set(schedules) | set(booked)
+        ],
+        batch_size=1000, update_conflicts=True, unique_fields=["staff", "date"],
+        update_fields=["schedule_bits", "booked_bits", "updated_at"],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("appointments", "0010_drop_redundant_notification_index"),
+        ("store", "0010_rollup_dirty_log"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_occupancy, migrations.RunPython.noop),
+    ]
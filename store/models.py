@@ -38,6 +38,10 @@ class Store(models.Model):
         default=True,
         help_text="店鋪是否啟用，預設為啟用狀態"
     )
+    tracks_attendance = models.BooleanField(
+        default=False,
+        help_text="是否由店家登記客人到店；啟用後，時段結束仍未登記到店的已確認預約會被標記為未出席"
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         help_text="店鋪的創建時間"
@@ -273,6 +277,9 @@ class WorkSchedule(models.Model):
     start_time = models.TimeField(help_text="排班開始時間")
     end_time = models.TimeField(help_text="排班結束時間")
     is_active = models.BooleanField(default=True, help_text="排班是否啟用")
+    materialized_at = models.DateTimeField(
+        null=True, blank=True, help_text="已產生對應時段的時間，空值表示尚未產生"
+    )
     created_at = models.DateTimeField(auto_now_add=True, help_text="創建時間")
     updated_at = models.DateTimeField(auto_now=True, help_text="最後修改時間")
     created_by = models.ForeignKey(
@@ -286,11 +293,46 @@ class WorkSchedule(models.Model):
 
     class Meta:
         ordering = ['date', 'start_time']
+        indexes = [
+            # 依人員與日期區間查詢排班
+            models.Index(fields=['staff', 'date'], name='workschedule_staff_date'),
+            # 時段產生器只掃描尚未產生的排班
+            models.Index(
+                fields=['date'], name='workschedule_pending_date',
+                condition=models.Q(materialized_at__isnull=True, is_active=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.staff.name} - {self.date} ({self.start_time} ~ {self.end_time})"
 
 
+class StaffOccupancy(models.Model):
+    """
+    服務人員每日佔用位圖，以 5 分鐘為一格記錄排班與已預約的時間。
+    由 store.occupancy 維護，用於以位元運算快速判斷空檔與重疊。
+    排班與預約的 bulk_create 及 QuerySet.update 不會觸發訊號，改動排班時間、狀態或人員後
+    需呼叫 refresh_occupancy 或執行 rebuild_occupancy 指令。
+    """
+    staff = models.ForeignKey(
+        'Staff', on_delete=models.CASCADE, related_name="occupancies", help_text="服務人員"
+    )
+    date = models.DateField(help_text="日期")
+    schedule_bits = models.BinaryField(
+        default=bytes, help_text="排班可工作時間的位圖，每個位元代表一格"
+    )
+    booked_bits = models.BinaryField(
+        default=bytes, help_text="已預約時間的位圖，每個位元代表一格"
+    )
+    updated_at = models.DateTimeField(auto_now=True, help_text="最後更新時間")
+
+    class Meta:
+        unique_together = ('staff', 'date')
+
+    def __str__(self):
+        return f"{self.staff.name} - {self.date}"
+
+
 class TimeSlot(models.Model):
     """
     時段模型，記錄具體可預約的時間段。
@@ -304,6 +346,7 @@ class TimeSlot(models.Model):
     start_time = models.DateTimeField(help_text="時段開始時間")
     end_time = models.DateTimeField(help_text="時段結束時間")
     max_capacity = models.IntegerField(default=1, help_text="時段最大預約人數")
+    booked_count = models.IntegerField(default=0, help_text="時段已被預約的人數")
     is_active = models.BooleanField(default=True, help_text="時段是否有效")
     created_at = models.DateTimeField(auto_now_add=True, help_text="創建時間")
     updated_at = models.DateTimeField(auto_now=True, help_text="最後修改時間")
@@ -318,6 +361,101 @@ class TimeSlot(models.Model):
 
     class Meta:
         ordering = ['start_time']
+        indexes = [
+            # 依服務與開始時間查詢有效時段
+            models.Index(
+                fields=['service', 'start_time'], name='timeslot_service_start_active',
+                condition=models.Q(is_active=True),
+            ),
+            # 預約狀態掃描依結束時間分段處理
+            models.Index(fields=['end_time'], name='timeslot_end_time'),
+        ]
 
     def __str__(self):
         return f"{self.service.name} ({self.schedule.staff.name}): {self.start_time} - {self.end_time}"
+
+
+class RollupDirtyDay(models.Model):
+    """
+    需要重算營運報表的店鋪與日期。預約或排班異動時在同一交易中插入一列，
+    同一店鋪日可有多列，由 store.rollups 合併處理後移除，只重算有變動的日子。
+    """
+    store = models.ForeignKey(
+        'Store', on_delete=models.CASCADE, related_name="rollup_dirty_days", help_text="店鋪"
+    )
+    date = models.DateField(help_text="日期")
+    marked_at = models.DateTimeField(default=now, help_text="標記時間")
+
+    class Meta:
+        # 只插入不更新，同店同日的並行交易不會互相等待
+        indexes = [models.Index(fields=['store', 'date'], name='rollup_dirty_store_date')]
+
+    def __str__(self):
+        return f"{self.store_id} - {self.date}"
+
+
+class DailyRollup(models.Model):
+    """
+    每日營運統計的共用欄位，由 store.rollups 依預約、服務價格與排班計算。
+    營收只計入已確認的預約，預約數與已預約分鐘數計入待確認與已確認的預約。
+    """
+    date = models.DateField(help_text="日期")
+    appointments = models.PositiveIntegerField(default=0, help_text="有效預約數")
+    revenue = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, help_text="已確認預約的服務金額"
+    )
+    booked_minutes = models.PositiveIntegerField(default=0, help_text="已預約的分鐘數")
+    updated_at = models.DateTimeField(auto_now=True, help_text="最後計算時間")
+
+    class Meta:
+        abstract = True
+
+
+class StoreDailyRollup(DailyRollup):
+    store = models.ForeignKey(
+        'Store', on_delete=models.CASCADE, related_name="daily_rollups", help_text="店鋪"
+    )
+    scheduled_minutes = models.PositiveIntegerField(default=0, help_text="所有服務人員排班的分鐘數")
+
+    class Meta:
+        unique_together = ('store', 'date')
+
+    def __str__(self):
+        return f"{self.store_id} - {self.date}"
+
+
+class StaffDailyRollup(DailyRollup):
+    staff = models.ForeignKey(
+        'Staff', on_delete=models.CASCADE, related_name="daily_rollups", help_text="服務人員"
+    )
+    store = models.ForeignKey(
+        'Store', on_delete=models.CASCADE, related_name="staff_daily_rollups", help_text="店鋪，用於依店鋪查詢"
+    )
+    scheduled_minutes = models.PositiveIntegerField(default=0, help_text="排班的分鐘數")
+
+    class Meta:
+        unique_together = ('staff', 'date')
+        indexes = [
+            models.Index(fields=['store', 'date'], name='staff_rollup_store_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.staff_id} - {self.date}"
+
+
+class ServiceDailyRollup(DailyRollup):
+    service = models.ForeignKey(
+        'Service', on_delete=models.CASCADE, related_name="daily_rollups", help_text="服務"
+    )
+    store = models.ForeignKey(
+        'Store', on_delete=models.CASCADE, related_name="service_daily_rollups", help_text="店鋪，用於依店鋪查詢"
+    )
+
+    class Meta:
+        unique_together = ('service', 'date')
+        indexes = [
+            models.Index(fields=['store', 'date'], name='service_rollup_store_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.service_id} - {self.date}"
@@ -0,0 +1,193 @@
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import StaffOccupancy, WorkSchedule
+
+
+# 每格的分鐘數與每日格數
+SLOT_MINUTES = 5
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+
+# 不佔用服務人員時間的預約狀態
+RELEASED_STATUSES = ('canceled', 'missed')
+
+
+def to_int(bits):
+    """將位圖 bytes 轉為整數，第 i 個位元代表當日第 i 格。"""
+    return int.from_bytes(bytes(bits or b''), 'little')
+
+
+def to_bytes(mask):
+    """將整數位圖轉回固定長度的 bytes。"""
+    return mask.to_bytes(BITMAP_BYTES, 'little')
+
+
+def day_bounds(day):
+    """當地時區下某日的開始與結束時間。"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, time.min), tz)
+    return start, start + timedelta(days=1)
+
+
+def range_mask(first, last):
+    """第 first 格（含）到第 last 格（不含）的位元遮罩。"""
+    first = max(first, 0)
+    last = min(last, SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def interval_mask(day, start, end, inclusive=True):
+    """
+    將具時區的區間轉為某日的位元遮罩，超出當日的部分會被截斷。
+    inclusive 為真時向外取整（任何碰到的格都算佔用），否則向內取整（只保留完整的格）。
+    """
+    day_start, _ = day_bounds(day)
+    first_minutes = (start - day_start).total_seconds() / 60
+    last_minutes = (end - day_start).total_seconds() / 60
+    if inclusive:
+        first = int(first_minutes // SLOT_MINUTES)
+        last = -int(-last_minutes // SLOT_MINUTES)
+    else:
+        first = -int(-first_minutes // SLOT_MINUTES)
+        last = int(last_minutes // SLOT_MINUTES)
+    return range_mask(first, last)
+
+
+def schedule_mask(day, start_time, end_time):
+    """排班時間的位元遮罩，只計入完整的格。"""
+    tz = timezone.get_current_timezone()
+    start = timezone.make_aware(datetime.combine(day, start_time), tz)
+    end = timezone.make_aware(datetime.combine(day, end_time), tz)
+    return interval_mask(day, start, end, inclusive=False)
+
+
+def iter_runs(mask):
+    """逐一產生遮罩中連續為 1 的 (開始格, 結束格)。"""
+    index = 0
+    while mask:
+        # 跳過低位的 0
+        zeros = (mask & -mask).bit_length() - 1
+        mask >>= zeros
+        index += zeros
+        # 計算連續 1 的長度
+        ones = (~mask & (mask + 1)).bit_length() - 1
+        yield index, index + ones
+        mask >>= ones
+        index += ones
+
+
+def free_mask(occupancy):
+    """可預約的格：有排班且未被預約。"""
+    return to_int(occupancy.schedule_bits) & ~to_int(occupancy.booked_bits)
+
+
+def free_windows(occupancy, duration=0):
+    """
+    回傳佔用位圖中長度至少 duration 分鐘的空檔 [(開始, 結束), ...]。
+    """
+    day_start, _ = day_bounds(occupancy.date)
+    needed = -(-duration // SLOT_MINUTES)
+    return [
+        (day_start + timedelta(minutes=first * SLOT_MINUTES),
+         day_start + timedelta(minutes=last * SLOT_MINUTES))
+        for first, last in iter_runs(free_mask(occupancy))
+        if last - first >= needed
+    ]
+
+
+def is_free(occupancy, start, end):
+    """判斷區間是否完全落在排班內且未與任何預約重疊。"""
+    mask = interval_mask(occupancy.date, start, end)
+    return mask != 0 and mask & ~free_mask(occupancy) == 0
+
+
+def local_dates(start, end):
+    """區間涵蓋的當地日期。"""
+    day = timezone.localtime(start).date()
+    last = timezone.localtime(end - timedelta(microseconds=1)).date()
+    dates = []
+    while day <= last:
+        dates.append(day)
+        day += timedelta(days=1)
+    return dates
+
+
+def _lock_occupancy(staff_id, day):
+    """取得並鎖定佔用位圖列，不存在時先建立。"""
+    try:
+        with transaction.atomic():
+            StaffOccupancy.objects.get_or_create(staff_id=staff_id, date=day)
+    except IntegrityError:
+        # 其他交易同時建立了同一列
+        pass
+    return StaffOccupancy.objects.select_for_update().get(staff_id=staff_id, date=day)
+
+
+def lock_interval(staff_id, start, end):
+    """依日期順序鎖定區間涵蓋每一天的佔用位圖列並返回，需在交易中呼叫。"""
+    return [_lock_occupancy(staff_id, day) for day in local_dates(start, end)]
+
+
+def overlaps_booking(occupancy, start, end):
+    """
+    判斷區間是否碰到已預約的格。以格為單位向外取整，
+    未對齊 5 分鐘的相鄰預約也會視為重疊，需要精確結果時再以預約確認。
+    """
+    return (interval_mask(occupancy.date, start, end) & to_int(occupancy.booked_bits)) != 0
+
+
+def mark_booked(occupancies, start, end):
+    """
+    在已鎖定的佔用位圖列上直接加入新預約佔用的格，需在鎖定這些列的交易中呼叫。
+    不重新讀取當日的排班與預約，成本與當日的預約數無關。
+    """
+    for occupancy in occupancies:
+        booked = to_int(occupancy.booked_bits) | interval_mask(occupancy.date, start, end)
+        occupancy.booked_bits = to_bytes(booked)
+        occupancy.save(update_fields=['booked_bits', 'updated_at'])
+
+
+def refresh_occupancy(staff_id, day):
+    """
+    依排班與預約重新計算某位服務人員某日的佔用位圖。
+
+    先鎖定位圖列再讀取來源資料，確保同一人員同日的並行更新依序進行，
+    後提交的交易一定看得到先提交的預約。
+    """
+    from appointments.models import Appointment
+
+    with transaction.atomic():
+        occupancy = _lock_occupancy(staff_id, day)
+
+        schedule = 0
+        for start_time, end_time in WorkSchedule.objects.filter(
+                staff_id=staff_id, date=day, is_active=True,
+        ).values_list('start_time', 'end_time'):
+            schedule |= schedule_mask(day, start_time, end_time)
+
+        day_start, day_end = day_bounds(day)
+        booked = 0
+        for start, end in Appointment.objects.filter(
+                staff_id=staff_id,
+                timeslot__start_time__lt=day_end,
+                timeslot__end_time__gt=day_start,
+        ).exclude(
+            status__in=RELEASED_STATUSES,
+        ).values_list('timeslot__start_time', 'timeslot__end_time'):
+            booked |= interval_mask(day, start, end)
+
+        occupancy.schedule_bits = to_bytes(schedule)
+        occupancy.booked_bits = to_bytes(booked)
+        occupancy.save(update_fields=['schedule_bits', 'booked_bits', 'updated_at'])
+    return occupancy
+
+
+def refresh_for_interval(staff_id, start, end):
+    """重新計算區間涵蓋的每一天。"""
+    for day in local_dates(start, end):
+        refresh_occupancy(staff_id, day)
@@ -0,0 +1,198 @@
+"""
+店鋪的每日營運統計：營收（依 Service.price）與服務人員的使用率（已預約分鐘數 / 排班分鐘數）。
+
+預約或排班異動時在同一交易中以 mark_dirty 標記受影響的店鋪與日期，標記與異動一起提交或回滾。
+process_dirty_days 只重算被標記的日子，每個店鋪日在一個交易中以原始資料重新計算店鋪、服務人員與服務三張統計表。
+服務價格調整不會自動標記，需以 build_rollups --from/--to 重算指定區間。
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .models import (
+    RollupDirtyDay, ServiceDailyRollup, Staff, StaffDailyRollup, StoreDailyRollup, WorkSchedule,
+)
+from .occupancy import day_bounds
+
+# 計入預約數與已預約分鐘數的狀態，營收計入已確認與已完成（已到店）。
+# 過去的日子經 sweep_appointments 後只剩已完成、未登記到店的已確認與未出席，未出席不計入
+BOOKED_STATUSES = ('pending', 'confirmed', 'completed')
+REVENUE_STATUSES = ('confirmed', 'completed')
+
+
+def mark_dirty(store_days):
+    """
+    標記 (店鋪 id, 日期) 需要重算，需與造成變動的寫入在同一交易中呼叫。
+    只插入新列，不鎖定已有的標記，重複的標記由 process_dirty_days 合併。
+    """
+    now = timezone.now()
+    rows = [
+        RollupDirtyDay(store_id=store_id, date=day, marked_at=now)
+        for store_id, day in set(store_days) if store_id is not None
+    ]
+    if rows:
+        RollupDirtyDay.objects.bulk_create(rows, batch_size=1000)
+
+
+def mark_staff_days(staff_days):
+    """依 (服務人員 id, 日期) 標記服務人員所屬店鋪的日期。"""
+    staff_days = set(staff_days)
+    if not staff_days:
+        return
+    stores = dict(
+        Staff.objects.filter(pk__in={staff_id for staff_id, _ in staff_days}).values_list('id', 'store_id'))
+    mark_dirty((stores.get(staff_id), day) for staff_id, day in staff_days)
+
+
+def _minutes(start, end):
+    return int((end - start).total_seconds() // 60)
+
+
+def rebuild_day(store_id, day):
+    """以預約與排班重新計算店鋪某日的三張統計表，需在交易中呼叫。"""
+    from appointments.models import Appointment
+
+    day_start, day_end = day_bounds(day)
+    appointments = Appointment.objects.filter(
+        staff__store_id=store_id,
+        timeslot__start_time__gte=day_start,
+        timeslot__start_time__lt=day_end,
+        status__in=BOOKED_STATUSES,
+    ).values_list('staff_id', 'service_id', 'status', 'service__price', 'timeslot__start_time', 'timeslot__end_time')
+
+    def empty():
+        return {'appointments': 0, 'revenue': Decimal(0), 'booked_minutes': 0}
+
+    staff = defaultdict(lambda: {**empty(), 'scheduled_minutes': 0})
+    services = defaultdict(empty)
+    for staff_id, service_id, status, price, start, end in appointments:
+        for totals in (staff[staff_id], services[service_id]):
+            totals['appointments'] += 1
+            totals['booked_minutes'] += _minutes(start, end)
+            if status in REVENUE_STATUSES:
+                totals['revenue'] += price
+
+    tz = timezone.get_current_timezone()
+    for staff_id, start_time, end_time in WorkSchedule.objects.filter(
+            staff__store_id=store_id, date=day, is_active=True,
+    ).values_list('staff_id', 'start_time', 'end_time'):
+        staff[staff_id]['scheduled_minutes'] += _minutes(
+            timezone.make_aware(datetime.combine(day, start_time), tz),
+            timezone.make_aware(datetime.combine(day, end_time), tz))
+
+    store = {**empty(), 'scheduled_minutes': 0}
+    for totals in staff.values():
+        for field, value in totals.items():
+            store[field] += value
+
+    for model in (StoreDailyRollup, StaffDailyRollup, ServiceDailyRollup):
+        model.objects.filter(store_id=store_id, date=day).delete()
+    if staff:
+        StoreDailyRollup.objects.create(store_id=store_id, date=day, **store)
+    StaffDailyRollup.objects.bulk_create([
+        StaffDailyRollup(staff_id=staff_id, store_id=store_id, date=day, **totals)
+        for staff_id, totals in staff.items()
+    ])
+    ServiceDailyRollup.objects.bulk_create([
+        ServiceDailyRollup(service_id=service_id, store_id=store_id, date=day, **totals)
+        for service_id, totals in services.items()
+    ])
+
+
+def process_dirty_days(limit=None, progress=None):
+    """
+    重算被標記的店鋪日，返回處理的數量。
+
+    同一店鋪日的多筆標記合併為一次重算，每個店鋪日在獨立的交易中重算，
+    並移除讀取時已存在的標記（id 不大於當時的最大值）。重算期間新增的標記保留到下次執行。
+    """
+    markers = (
+        RollupDirtyDay.objects.values('store_id', 'date').annotate(last_id=Max('id'))
+        .order_by('date', 'store_id').values_list('store_id', 'date', 'last_id')
+    )
+    if limit:
+        markers = markers[:limit]
+    processed = 0
+    for store_id, day, last_id in list(markers):
+        with transaction.atomic():
+            rebuild_day(store_id, day)
+            RollupDirtyDay.objects.filter(store_id=store_id, date=day, id__lte=last_id).delete()
+        processed += 1
+        if progress:
+            progress(processed)
+    return processed
+
+
+def mark_range(start_date, end_date=None):
+    """標記區間內有排班或預約的店鋪日，用於初次導入或服務價格調整後重算，返回標記的數量。"""
+    from appointments.models import Appointment
+
+    schedules = WorkSchedule.objects.filter(date__gte=start_date)
+    appointments = Appointment.objects.filter(timeslot__start_time__gte=day_bounds(start_date)[0])
+    if end_date:
+        schedules = schedules.filter(date__lte=end_date)
+        appointments = appointments.filter(timeslot__start_time__lt=day_bounds(end_date)[1])
+
+    store_days = set(schedules.values_list('staff__store_id', 'date').distinct())
+    for store_id, start in appointments.values_list('staff__store_id', 'timeslot__start_time').iterator():
+        store_days.add((store_id, timezone.localdate(start)))
+    mark_dirty(store_days)
+    return len(store_days)
+
+
+def _money(value):
+    # SQLite 的 SUM 不保留小數位數，統一格式為兩位小數
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def _utilization(booked_minutes, scheduled_minutes):
+    return round(booked_minutes / scheduled_minutes, 4) if scheduled_minutes else None
+
+
+def store_report(store_id, start_date, end_date):
+    """
+    從統計表讀取店鋪在日期區間內的每日營收與使用率，以及服務人員、服務在區間內的合計，共三次查詢。
+    """
+    sums = {field: Sum(field) for field in ('appointments', 'revenue', 'booked_minutes')}
+    in_range = {'store_id': store_id, 'date__gte': start_date, 'date__lte': end_date}
+
+    days = [
+        {
+            "date": row.date.isoformat(),
+            "appointments": row.appointments,
+            "revenue": _money(row.revenue),
+            "booked_minutes": row.booked_minutes,
+            "scheduled_minutes": row.scheduled_minutes,
+            "utilization": _utilization(row.booked_minutes, row.scheduled_minutes),
+        }
+        for row in StoreDailyRollup.objects.filter(**in_range).order_by('date')
+    ]
+    staff = [
+        {
+            "id": row["staff_id"],
+            "name": row["staff__name"],
+            "appointments": row["appointments"],
+            "revenue": _money(row["revenue"]),
+            "booked_minutes": row["booked_minutes"],
+            "scheduled_minutes": row["scheduled_minutes"],
+            "utilization": _utilization(row["booked_minutes"], row["scheduled_minutes"]),
+        }
+        for row in StaffDailyRollup.objects.filter(**in_range).values('staff_id', 'staff__name')
+        .annotate(scheduled_minutes=Sum('scheduled_minutes'), **sums).order_by('staff_id')
+    ]
+    services = [
+        {
+            "id": row["service_id"],
+            "name": row["service__name"],
+            "appointments": row["appointments"],
+            "revenue": _money(row["revenue"]),
+            "booked_minutes": row["booked_minutes"],
+        }
+        for row in ServiceDailyRollup.objects.filter(**in_range).values('service_id', 'service__name')
+        .annotate(**sums).order_by('service_id')
+    ]
+    return {"store": store_id, "days": days, "staff": staff, "services": services}
@@ -0,0 +1,64 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .models import Store, ServiceCategory, Service, StaffRole, Staff, WorkSchedule
+from .occupancy import refresh_occupancy
+from .rollups import mark_staff_days
+
+
+@receiver(post_init, sender=WorkSchedule)
+def remember_schedule_day(sender, instance, **kwargs):
+    """記錄排班載入時的人員與日期，以便異動後一併更新舊的位圖。"""
+    instance._occupancy_original = (instance.__dict__.get('staff_id'), instance.__dict__.get('date'))
+
+
+@receiver(post_save, sender=WorkSchedule)
+def update_occupancy_on_schedule_save(sender, instance, **kwargs):
+    refresh_occupancy(instance.staff_id, instance.date)
+    affected = [(instance.staff_id, instance.date)]
+    original = getattr(instance, '_occupancy_original', (None, None))
+    if None not in original and original != (instance.staff_id, instance.date):
+        refresh_occupancy(*original)
+        affected.append(original)
+    # 排班分鐘數影響使用率，與排班異動在同一交易中標記
+    mark_staff_days(affected)
+    instance._occupancy_original = (instance.staff_id, instance.date)
+
+
+@receiver(post_delete, sender=WorkSchedule)
+def update_occupancy_on_schedule_delete(sender, instance, **kwargs):
+    refresh_occupancy(instance.staff_id, instance.date)
+    mark_staff_days([(instance.staff_id, instance.date)])
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=StaffRole)
+@receiver(post_delete, sender=StaffRole)
+@receiver(post_save, sender=Staff)
+@receiver(post_delete, sender=Staff)
+def invalidate_catalog(sender, instance, **kwargs):
+    """店鋪目錄相關資料異動後，於交易提交時更新目錄版本。"""
+    store_id = instance.pk if sender is Store else instance.store_id
+    transaction.on_commit(lambda: bump_catalog_version(store_id))
+
+
+@receiver(m2m_changed, sender=Service.staff.through)
+def invalidate_catalog_on_staff_change(sender, instance, action, pk_set, **kwargs):
+    """服務與服務人員的關聯異動後更新目錄版本。"""
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Service):
+        store_ids = {instance.store_id}
+    else:
+        # 從服務人員端異動時，受影響的是被加入或移除的服務所屬店鋪
+        store_ids = set(Service.objects.filter(pk__in=pk_set or ()).values_list('store_id', flat=True))
+        store_ids.add(instance.store_id)
+    for store_id in store_ids:
+        transaction.on_commit(lambda store_id=store_id: bump_catalog_version(store_id))
@@ -1,3 +1,706 @@
-from django.test import TestCase
+import json
+from importlib import import_module
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.apps import apps
+from django.core.management import call_command
+from django.core.cache import cache
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from appointments.models import Appointment
+from appointments.sweeper import sweep_appointments
+from booking_system.db_router import use_replica
+from booking_system.testing import (
+    QueryBudgetMixin, QueryPlanMixin, ReplicaDatabaseMixin, login, requires_plan_support,
+)
+from .availability import find_available_windows
+from .catalog import get_store_catalog
+from .models import (
+    Store, Staff, StaffRole, Service, ServiceCategory, WorkSchedule, TimeSlot, StaffOccupancy,
+    RollupDirtyDay, StoreDailyRollup, StaffDailyRollup, ServiceDailyRollup,
+)
+from . import occupancy, urls
+from .rollups import mark_dirty, process_dirty_days, rebuild_day
+from .management.commands.load_test import percentile
+
+# 使用自訂的用戶模型
+User = get_user_model()
+
+
+def aware(day, hour, minute=0):
+    """建立具時區的測試時間。"""
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class AvailabilityTest(TestCase):
+    def setUp(self):
+        """
+        初始化店鋪、服務、人員與排班。
+        """
+        session = self.client.session
+        session["security_verified"] = True
+        session.save()
+
+        self.merchant = User.objects.create_user(
+            username="merchant", email="merchant@example.com", password="TestPassword123!")
+        self.customer = User.objects.create_user(
+            username="customer", email="customer@example.com", password="TestPassword123!")
+        self.store = Store.objects.create(
+            merchant=self.merchant, name="幸福剪髮",
+            opening_time=time(9), closing_time=time(18))
+        self.service = Service.objects.create(
+            store=self.store, name="男生剪髮", price=300, duration=60)
+        self.alice = Staff.objects.create(store=self.store, name="Alice")
+        self.bob = Staff.objects.create(store=self.store, name="Bob")
+        self.service.staff.add(self.alice, self.bob)
+
+        self.day = date(2030, 1, 7)
+        self.alice_schedule = WorkSchedule.objects.create(
+            staff=self.alice, date=self.day, start_time=time(9), end_time=time(12))
+        WorkSchedule.objects.create(
+            staff=self.bob, date=self.day, start_time=time(13), end_time=time(15))
+
+    def book(self, staff, schedule, start, end):
+        timeslot = TimeSlot.objects.create(
+            schedule=schedule, service=self.service, start_time=start, end_time=end)
+        return Appointment.objects.create(
+            customer=self.customer, service=self.service, staff=staff, timeslot=timeslot)
+
+    def test_windows_exclude_booked_timeslots(self):
+        """
+        測試已預約的時段會從空檔中扣除，且過短的空檔不回傳。
+        """
+        self.book(self.alice, self.alice_schedule,
+                  aware(self.day, 10), aware(self.day, 11, 30))
+
+        windows = find_available_windows(self.service, self.day, self.day)
+        self.assertEqual(
+            [(w['staff_id'], w['start'], w['end']) for w in windows],
+            [
+                (self.alice.id, aware(self.day, 9), aware(self.day, 10)),
+                (self.bob.id, aware(self.day, 13), aware(self.day, 15)),
+            ],
+        )
+
+    def test_canceled_appointment_frees_window(self):
+        """
+        測試已取消的預約不佔用空檔。
+        """
+        appointment = self.book(self.alice, self.alice_schedule,
+                                aware(self.day, 10), aware(self.day, 11))
+        appointment.status = 'canceled'
+        appointment.save()
+
+        windows = find_available_windows(self.service, self.day, self.day, [self.alice.id])
+        self.assertEqual(
+            [(w['start'], w['end']) for w in windows],
+            [(aware(self.day, 9), aware(self.day, 12))],
+        )
+
+    def test_windows_follow_occupancy_bitmap(self):
+        """
+        測試空檔取自佔用位圖，未對齊 5 分鐘的排班與預約依格取整。
+        """
+        self.alice_schedule.start_time = time(9, 2)
+        self.alice_schedule.save()
+        self.book(self.alice, self.alice_schedule,
+                  aware(self.day, 10, 58), aware(self.day, 11, 1))
+
+        windows = find_available_windows(self.service, self.day, self.day, [self.alice.id])
+        self.assertEqual(
+            [(w['date'], w['start'], w['end']) for w in windows],
+            [(self.day, aware(self.day, 9, 5), aware(self.day, 10, 55))],
+        )
+
+    def test_query_count_is_constant(self):
+        """
+        測試查詢次數不隨人員與排班數量增加。
+        """
+        for i in range(20):
+            staff = Staff.objects.create(store=self.store, name=f"Staff {i}")
+            self.service.staff.add(staff)
+            for offset in range(7):
+                WorkSchedule.objects.create(
+                    staff=staff, date=self.day + timedelta(days=offset),
+                    start_time=time(9), end_time=time(18))
+
+        with self.assertNumQueries(2):
+            windows = find_available_windows(
+                self.service, self.day, self.day + timedelta(days=6))
+        self.assertEqual(len(windows), 20 * 7 + 2)
+
+    def test_availability_endpoint(self):
+        """
+        測試空檔搜尋 API 的回應格式與參數驗證。
+        """
+        self.client.force_login(self.customer)
+        url = reverse('store:availability', args=[self.service.id])
+
+        response = self.client.get(url, {
+            'start': self.day.isoformat(), 'end': self.day.isoformat(), 'staff': self.bob.id})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['duration'], 60)
+        self.assertEqual(len(data['windows']), 1)
+        self.assertEqual(data['windows'][0]['staff_name'], 'Bob')
+
+        response = self.client.get(url, {'start': 'not-a-date'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(url, {'start': '2030-01-01', 'end': '2030-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class MaterializeTimeSlotsTest(TestCase):
+    def setUp(self):
+        """
+        初始化兩項服務與一位可提供兩者的服務人員。
+        """
+        merchant = User.objects.create_user(
+            username="merchant", email="merchant@example.com", password="TestPassword123!")
+        store = Store.objects.create(
+            merchant=merchant, name="幸福剪髮", opening_time=time(9), closing_time=time(18))
+        self.staff = Staff.objects.create(store=store, name="Alice")
+        self.haircut = Service.objects.create(store=store, name="剪髮", price=300, duration=60)
+        self.wash = Service.objects.create(store=store, name="洗髮", price=200, duration=45)
+        self.haircut.staff.add(self.staff)
+        self.wash.staff.add(self.staff)
+        self.day = date(2030, 1, 7)
+        self.schedule = WorkSchedule.objects.create(
+            staff=self.staff, date=self.day, start_time=time(9), end_time=time(12))
+
+    def materialize(self):
+        call_command("materialize_timeslots", "--from", "2030-01-01", stdout=StringIO())
+
+    def test_expands_schedule_per_service(self):
+        """
+        測試排班依各服務時長切分為時段，並標記為已產生。
+        """
+        self.materialize()
+
+        haircut_slots = TimeSlot.objects.filter(service=self.haircut)
+        self.assertEqual(
+            [slot.start_time for slot in haircut_slots],
+            [aware(self.day, 9), aware(self.day, 10), aware(self.day, 11)],
+        )
+        # 180 分鐘可容納 4 個 45 分鐘時段
+        self.assertEqual(TimeSlot.objects.filter(service=self.wash).count(), 4)
+        self.schedule.refresh_from_db()
+        self.assertIsNotNone(self.schedule.materialized_at)
+
+    def test_rerun_is_idempotent(self):
+        """
+        測試重複執行不會重建時段，且只處理新增的排班。
+        """
+        self.materialize()
+        first_ids = set(TimeSlot.objects.values_list("id", flat=True))
+
+        self.materialize()
+        self.assertEqual(set(TimeSlot.objects.values_list("id", flat=True)), first_ids)
+
+        WorkSchedule.objects.create(
+            staff=self.staff, date=self.day + timedelta(days=1), start_time=time(9), end_time=time(10))
+        self.materialize()
+        self.assertEqual(TimeSlot.objects.count(), len(first_ids) + 2)
+
+    def test_resume_skips_existing_pairs(self):
+        """
+        測試中斷後續跑時，已存在時段的 (排班, 服務) 組合不會重複產生。
+        """
+        TimeSlot.objects.create(
+            schedule=self.schedule, service=self.haircut,
+            start_time=aware(self.day, 9), end_time=aware(self.day, 10))
+
+        self.materialize()
+        self.assertEqual(TimeSlot.objects.filter(service=self.haircut).count(), 1)
+        self.assertEqual(TimeSlot.objects.filter(service=self.wash).count(), 4)
+
+
+class OccupancyTest(TestCase):
+    def setUp(self):
+        """
+        初始化一位 09:00-12:00 排班的服務人員。
+        """
+        merchant = User.objects.create_user(
+            username="merchant", email="merchant@example.com", password="TestPassword123!")
+        self.customer = User.objects.create_user(
+            username="customer", email="customer@example.com", password="TestPassword123!")
+        store = Store.objects.create(
+            merchant=merchant, name="幸福剪髮", opening_time=time(9), closing_time=time(18))
+        self.staff = Staff.objects.create(store=store, name="Alice")
+        self.service = Service.objects.create(store=store, name="剪髮", price=300, duration=30)
+        self.day = date(2030, 1, 7)
+        self.schedule = WorkSchedule.objects.create(
+            staff=self.staff, date=self.day, start_time=time(9), end_time=time(12))
+
+    def occupancy(self):
+        return StaffOccupancy.objects.get(staff=self.staff, date=self.day)
+
+    def book(self, start, end):
+        timeslot = TimeSlot.objects.create(
+            schedule=self.schedule, service=self.service, start_time=start, end_time=end)
+        return Appointment.objects.create(
+            customer=self.customer, service=self.service, staff=self.staff, timeslot=timeslot)
+
+    def test_iter_runs(self):
+        """
+        測試從位元遮罩中找出連續區段。
+        """
+        self.assertEqual(list(occupancy.iter_runs(0b1110011)), [(0, 2), (4, 7)])
+        self.assertEqual(list(occupancy.iter_runs(0)), [])
+
+    def test_schedule_creates_bitmap(self):
+        """
+        測試建立排班後自動產生位圖，長度為固定的位元組數。
+        """
+        record = self.occupancy()
+        self.assertEqual(len(bytes(record.schedule_bits)), occupancy.BITMAP_BYTES)
+        self.assertEqual(
+            occupancy.free_windows(record),
+            [(aware(self.day, 9), aware(self.day, 12))],
+        )
+
+    def test_appointment_lifecycle_updates_bitmap(self):
+        """
+        測試預約建立、取消與未出席時位圖同步更新。
+        """
+        appointment = self.book(aware(self.day, 10), aware(self.day, 10, 30))
+        record = self.occupancy()
+        self.assertFalse(occupancy.is_free(record, aware(self.day, 10), aware(self.day, 11)))
+        self.assertTrue(occupancy.is_free(record, aware(self.day, 10, 30), aware(self.day, 11)))
+        self.assertEqual(
+            occupancy.free_windows(record, duration=60),
+            [(aware(self.day, 9), aware(self.day, 10)), (aware(self.day, 10, 30), aware(self.day, 12))],
+        )
+
+        appointment.status = 'canceled'
+        appointment.save()
+        self.assertTrue(occupancy.is_free(self.occupancy(), aware(self.day, 10), aware(self.day, 11)))
+
+        appointment.status = 'pending'
+        appointment.save()
+        appointment.status = 'missed'
+        appointment.save()
+        self.assertTrue(occupancy.is_free(self.occupancy(), aware(self.day, 10), aware(self.day, 11)))
+
+    def test_outside_schedule_is_not_free(self):
+        """
+        測試排班以外的時間不視為空檔。
+        """
+        self.assertFalse(occupancy.is_free(self.occupancy(), aware(self.day, 11, 30), aware(self.day, 12, 30)))
+
+    def test_rebuild_command(self):
+        """
+        測試重建指令可補齊遺失的位圖。
+        """
+        StaffOccupancy.objects.all().delete()
+        call_command("rebuild_occupancy", "--from", "2030-01-01", stdout=StringIO())
+        self.assertEqual(len(occupancy.free_windows(self.occupancy())), 1)
+
+    def test_migration_backfills_future_days(self):
+        """
+        測試 0011 遷移依今天起的排班與預約回填位圖，結果與逐日重算相同。
+        """
+        self.book(aware(self.day, 10), aware(self.day, 10, 30))
+        expected = self.occupancy()
+        StaffOccupancy.objects.all().delete()
+
+        backfill = import_module("store.migrations.0011_backfill_staff_occupancy").backfill_occupancy
+        backfill(apps, None)
+        record = self.occupancy()
+        self.assertEqual(
+            (bytes(record.schedule_bits), bytes(record.booked_bits)),
+            (bytes(expected.schedule_bits), bytes(expected.booked_bits)))
+
+
+class LoadTestCommandTest(LiveServerTestCase):
+    def setUp(self):
+        merchant = User.objects.create_user(
+            username="merchant", email="merchant@example.com", password="TestPassword123!")
+        store = Store.objects.create(
+            merchant=merchant, name="幸福剪髮", opening_time=time(9), closing_time=time(18))
+        staff = Staff.objects.create(store=store, name="Alice")
+        self.service = Service.objects.create(store=store, name="剪髮", price=300, duration=60)
+        self.service.staff.add(staff)
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        schedule = WorkSchedule.objects.create(
+            staff=staff, date=timezone.localdate(start), start_time=time(0), end_time=time(23, 55))
+        TimeSlot.objects.create(
+            schedule=schedule, service=self.service, start_time=start,
+            end_time=start + timedelta(hours=1), max_capacity=1)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_reports_every_flow(self):
+        """
+        測試對本機伺服器執行壓測後，輸出每個端點的百分位數，且預約不會超賣。
+        """
+        out = StringIO()
+        call_command(
+            "load_test", "--base-url", self.live_server_url, "--clients", "2",
+            "--iterations", "2", "--service", str(self.service.id), stdout=out)
+        report = json.loads(out.getvalue())
+
+        endpoints = report["endpoints"]
+        self.assertEqual(
+            set(endpoints),
+            {"login_page", "login", "dashboard", "store_list", "availability", "book"},
+        )
+        self.assertEqual(endpoints["login"]["status"], {"302": 2})
+        self.assertEqual(endpoints["dashboard"]["status"], {"200": 4})
+        self.assertEqual(endpoints["availability"]["status"], {"200": 4})
+        self.assertEqual(endpoints["book"]["status"], {"201": 1, "409": 3})
+        for stats in endpoints.values():
+            self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+
+
+class BenchmarkAsyncCommandTest(TransactionTestCase):
+    def test_wsgi_and_asgi_modes_report_every_path(self):
+        """
+        測試 WSGI 與 ASGI 處理器都以已登入且通過驗證的狀態請求每個路徑，並輸出吞吐量，
+        WSGI 另外記錄 async_to_sync 的成本。
+        測試中已在測試資料庫上執行，以 --keepdb 沿用而不重建。
+        """
+        out = StringIO()
+        call_command(
+            "benchmark_async", "--requests", "5", "--concurrency", "4", "--keepdb",
+            "--host", "testserver", "--path", "users:dashboard", "--path", "store:store_list", stdout=out)
+        report = json.loads(out.getvalue())
+
+        for mode in ("wsgi", "asgi"):
+            self.assertEqual(
+                set(report[mode]["endpoints"]), {reverse("users:dashboard"), reverse("store:store_list")})
+            for stats in report[mode]["endpoints"].values():
+                self.assertEqual(stats["status"], {"200": 5})
+                self.assertGreater(stats["throughput"], 0)
+        self.assertGreater(report["wsgi"]["async_to_sync_ms"], 0)
+        self.assertEqual(set(report["throughput_ratio"]), {reverse("users:dashboard"), reverse("store:store_list")})
+
+
+@requires_plan_support
+class StoreQueryPlanTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        建立多位人員與多日排班、時段，模擬實際資料分布。
+        """
+        merchant = User.objects.create_user(
+            username="merchant", email="merchant@example.com", password="TestPassword123!")
+        store = Store.objects.create(
+            merchant=merchant, name="幸福剪髮", opening_time=time(9), closing_time=time(18))
+        cls.service = Service.objects.create(store=store, name="剪髮", price=300, duration=60)
+        cls.day = date(2030, 1, 7)
+        staff_list = Staff.objects.bulk_create([Staff(store=store, name=f"Staff {i}") for i in range(20)])
+        schedules = WorkSchedule.objects.bulk_create([
+            WorkSchedule(staff=staff, date=cls.day + timedelta(days=offset),
+                         start_time=time(9), end_time=time(18))
+            for staff in staff_list for offset in range(30)
+        ])
+        TimeSlot.objects.bulk_create([
+            TimeSlot(schedule=schedule, service=cls.service,
+                     start_time=aware(schedule.date, hour), end_time=aware(schedule.date, hour + 1))
+            for schedule in schedules for hour in range(9, 18)
+        ])
+        cls.staff = staff_list[0]
+
+    def test_timeslot_by_service_and_start(self):
+        self.assertUsesIndex(TimeSlot.objects.filter(
+            service=self.service, is_active=True,
+            start_time__gte=aware(self.day, 0), start_time__lt=aware(self.day + timedelta(days=7), 0),
+        ), 'timeslot_service_start_active')
+
+    def test_workschedule_by_staff_and_date(self):
+        self.assertUsesIndex(WorkSchedule.objects.filter(
+            staff=self.staff, date__gte=self.day, date__lte=self.day + timedelta(days=6)),
+            'workschedule_staff_date')
+
+    def test_pending_workschedule(self):
+        self.assertUsesIndex(WorkSchedule.objects.filter(
+            materialized_at__isnull=True, is_active=True, date__gte=self.day).order_by('date'),
+            'workschedule_pending_date')
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        """
+        初始化一間有排班與預約的店鋪，讓每個路由都有資料可讀。
+        """
+        merchant = User.objects.create_user(
+            username="merchant", email="merchant@example.com", password="TestPassword123!")
+        self.budget_user = User.objects.create_user(
+            username="customer", email="customer@example.com", password="TestPassword123!")
+        store = Store.objects.create(
+            merchant=merchant, name="幸福剪髮", opening_time=time(9), closing_time=time(18))
+        service = Service.objects.create(store=store, name="男生剪髮", price=300, duration=60)
+        staff = Staff.objects.create(store=store, name="Alice")
+        service.staff.add(staff)
+
+        day = date(2030, 1, 7)
+        schedule = WorkSchedule.objects.create(staff=staff, date=day, start_time=time(9), end_time=time(12))
+        timeslot = TimeSlot.objects.create(
+            schedule=schedule, service=service, start_time=aware(day, 10), end_time=aware(day, 11))
+        Appointment.objects.create(customer=self.budget_user, service=service, staff=staff, timeslot=timeslot)
+
+        self.url_kwargs = {
+            "availability": {"service_id": service.id},
+            "store_catalog": {"store_id": store.id},
+            "ratings": {"store_id": store.id},
+            "report": {"store_id": store.id},
+        }
+
+    def test_every_view_within_budget(self):
+        """
+        測試 store 的每個路由都宣告了查詢上限且未超過。
+        """
+        self.assertWithinQueryBudgets(urls.urlpatterns, "store")
+
+
+class CatalogCacheTest(ReplicaDatabaseMixin, TestCase):
+    def setUp(self):
+        """
+        初始化店鋪目錄資料並清空快取。
+        """
+        cache.clear()
+        merchant = User.objects.create_user(
+            username="merchant", email="merchant@example.com", password="TestPassword123!")
+        self.store = Store.objects.create(
+            merchant=merchant, name="幸福剪髮", opening_time=time(9), closing_time=time(18))
+        self.category = ServiceCategory.objects.create(store=self.store, name="剪髮")
+        role = StaffRole.objects.create(store=self.store, name="設計師")
+        self.staff = Staff.objects.create(store=self.store, name="Alice", role=role)
+        self.service = Service.objects.create(
+            store=self.store, name="男生剪髮", category=self.category, price=300, duration=60)
+        self.service.staff.add(self.staff)
+
+    def test_second_read_hits_cache(self):
+        """
+        測試目錄在第一次讀取後不再查詢資料庫。
+        """
+        catalog = get_store_catalog(self.store.id)
+        self.assertEqual(catalog["services"][0]["staff_ids"], [self.staff.id])
+        self.assertEqual(catalog["services"][0]["price"], "300.00")
+        self.assertEqual(catalog["roles"][0]["name"], "設計師")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(get_store_catalog(self.store.id), catalog)
+
+    def test_hit_is_single_cache_round_trip(self):
+        """
+        測試命中時以一次 get_many 同時取回版本號與目錄。
+        """
+        catalog = get_store_catalog(self.store.id)
+        with patch("store.catalog.cache", wraps=cache) as spy:
+            self.assertEqual(get_store_catalog(self.store.id), catalog)
+        self.assertEqual([call[0] for call in spy.method_calls], ["get_many"])
+
+    def test_fill_reads_primary_in_replica_views(self):
+        """
+        測試唯讀視圖中快取未命中時，目錄由主資料庫組裝，不會讀到落後副本的資料。
+        """
+        with use_replica(), CaptureQueriesContext(connections["replica"]) as replica_queries:
+            catalog = get_store_catalog(self.store.id)
+        self.assertEqual(len(replica_queries), 0)
+        self.assertEqual(catalog["services"][0]["staff_ids"], [self.staff.id])
+
+    def test_changes_invalidate_catalog(self):
+        """
+        測試目錄相關資料與服務人員關聯異動後，目錄立即更新。
+        """
+        get_store_catalog(self.store.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.price = 350
+            self.service.save()
+        self.assertEqual(get_store_catalog(self.store.id)["services"][0]["price"], "350.00")
+
+        bob = Staff.objects.create(store=self.store, name="Bob")
+        with self.captureOnCommitCallbacks(execute=True):
+            bob.services.add(self.service)
+        self.assertEqual(
+            sorted(get_store_catalog(self.store.id)["services"][0]["staff_ids"]),
+            sorted([self.staff.id, bob.id]),
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.delete()
+        self.assertEqual(get_store_catalog(self.store.id)["categories"], [])
+
+    def test_inactive_store_has_no_catalog(self):
+        """
+        測試停用的店鋪不回傳目錄。
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.store.is_active = False
+            self.store.save()
+        self.assertIsNone(get_store_catalog(self.store.id))
+
+
+class RollupTest(TestCase):
+    def setUp(self):
+        self.merchant = User.objects.create_user(
+            username="merchant", email="merchant@example.com", password="TestPassword123!")
+        self.customer = User.objects.create_user(
+            username="customer", email="customer@example.com", password="TestPassword123!")
+        self.store = Store.objects.create(
+            merchant=self.merchant, name="幸福剪髮", opening_time=time(9), closing_time=time(18))
+        self.cut = Service.objects.create(store=self.store, name="男生剪髮", price=300, duration=60)
+        self.wash = Service.objects.create(store=self.store, name="洗髮", price=150, duration=30)
+        self.alice = Staff.objects.create(store=self.store, name="Alice")
+        self.bob = Staff.objects.create(store=self.store, name="Bob")
+
+        self.day = date(2030, 1, 7)
+        self.next_day = self.day + timedelta(days=1)
+        self.alice_schedule = WorkSchedule.objects.create(
+            staff=self.alice, date=self.day, start_time=time(9), end_time=time(12))
+        self.bob_schedule = WorkSchedule.objects.create(
+            staff=self.bob, date=self.day, start_time=time(13), end_time=time(15))
+        self.next_schedule = WorkSchedule.objects.create(
+            staff=self.alice, date=self.next_day, start_time=time(9), end_time=time(10))
+
+        self.confirmed = self.book(self.alice, self.alice_schedule, self.cut, 9, 10, 'confirmed')
+        self.pending = self.book(self.alice, self.alice_schedule, self.wash, 10, 10.5, 'pending')
+        self.book(self.bob, self.bob_schedule, self.cut, 13, 14, 'canceled')
+        self.book(self.alice, self.next_schedule, self.cut, 9, 10, 'confirmed', day=self.next_day)
+
+    def book(self, staff, schedule, service, start, end, status, day=None):
+        day = day or self.day
+        timeslot = TimeSlot.objects.create(
+            schedule=schedule, service=service,
+            start_time=aware(day, int(start), int(start % 1 * 60)),
+            end_time=aware(day, int(end), int(end % 1 * 60)))
+        return Appointment.objects.create(
+            customer=self.customer, service=service, staff=staff, timeslot=timeslot, status=status)
+
+    def test_rollup_dirty_days(self):
+        """
+        測試只重算被標記的店鋪日，且統計符合預約、服務價格與排班。
+        """
+        self.assertEqual(process_dirty_days(), 2)
+        self.assertFalse(RollupDirtyDay.objects.exists())
+
+        store = StoreDailyRollup.objects.get(store=self.store, date=self.day)
+        self.assertEqual(
+            (store.appointments, store.revenue, store.booked_minutes, store.scheduled_minutes),
+            (2, 300, 90, 300))
+        alice = StaffDailyRollup.objects.get(staff=self.alice, date=self.day)
+        self.assertEqual((alice.appointments, alice.booked_minutes, alice.scheduled_minutes), (2, 90, 180))
+        bob = StaffDailyRollup.objects.get(staff=self.bob, date=self.day)
+        self.assertEqual((bob.appointments, bob.revenue, bob.scheduled_minutes), (0, 0, 120))
+        wash = ServiceDailyRollup.objects.get(service=self.wash, date=self.day)
+        self.assertEqual((wash.appointments, wash.revenue, wash.booked_minutes), (1, 0, 30))
+
+        # 確認待確認的預約後，只有當天需要重算
+        self.pending.status = 'confirmed'
+        self.pending.save()
+        self.assertEqual(list(RollupDirtyDay.objects.values_list('date', flat=True)), [self.day])
+        self.assertEqual(process_dirty_days(), 1)
+        self.assertEqual(StoreDailyRollup.objects.get(store=self.store, date=self.day).revenue, 450)
+
+        # 排班異動影響使用率
+        self.bob_schedule.delete()
+        process_dirty_days()
+        self.assertFalse(StaffDailyRollup.objects.filter(staff=self.bob, date=self.day).exists())
+        self.assertEqual(StoreDailyRollup.objects.get(store=self.store, date=self.day).scheduled_minutes, 180)
+
+    def test_marker_rolls_back_with_change(self):
+        """
+        測試標記與預約異動在同一交易中寫入，交易回滾時標記一併回滾。
+        """
+        process_dirty_days()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.pending.status = 'confirmed'
+            self.pending.save()
+            self.assertTrue(RollupDirtyDay.objects.exists())
+            raise RuntimeError
+        self.assertFalse(RollupDirtyDay.objects.exists())
+
+    def test_duplicate_markers_rebuild_once(self):
+        """
+        測試同一店鋪日的多筆標記只重算一次，重算期間新增的標記保留到下次處理。
+        """
+        process_dirty_days()
+        mark_dirty([(self.store.id, self.day)])
+        mark_dirty([(self.store.id, self.day)])
+
+        def rebuild_and_mark(store_id, day):
+            rebuild_day(store_id, day)
+            mark_dirty([(store_id, day)])
+
+        with patch("store.rollups.rebuild_day", side_effect=rebuild_and_mark) as rebuild:
+            self.assertEqual(process_dirty_days(), 1)
+        self.assertEqual(rebuild.call_count, 1)
+        self.assertEqual(RollupDirtyDay.objects.count(), 1)
+
+    def test_past_day_survives_sweep(self):
+        """
+        測試過去的日子經預約狀態掃描後，已完成與未登記到店的已確認預約仍計入營收與使用率，
+        逾期取消與未出席的預約不計入。
+        """
+        day = timezone.localdate() - timedelta(days=2)
+        attended_store = Store.objects.create(
+            merchant=self.merchant, name="準時剪髮", opening_time=time(9), closing_time=time(18),
+            tracks_attendance=True)
+        carol = Staff.objects.create(store=attended_store, name="Carol")
+        trim = Service.objects.create(store=attended_store, name="修剪", price=200, duration=60)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule = WorkSchedule.objects.create(staff=self.alice, date=day, start_time=time(9), end_time=time(13))
+            self.book(self.alice, schedule, self.cut, 9, 10, 'confirmed', day=day)
+            self.book(self.alice, schedule, self.cut, 10, 11, 'completed', day=day)
+            self.book(self.alice, schedule, self.wash, 11, 11.5, 'pending', day=day)
+            carol_schedule = WorkSchedule.objects.create(staff=carol, date=day, start_time=time(9), end_time=time(11))
+            self.book(carol, carol_schedule, trim, 9, 10, 'completed', day=day)
+            self.book(carol, carol_schedule, trim, 10, 11, 'confirmed', day=day)
+
+        result = sweep_appointments()
+        self.assertEqual((result.missed, result.expired), (1, 1))
+        process_dirty_days()
+
+        store = StoreDailyRollup.objects.get(store=self.store, date=day)
+        self.assertEqual((store.appointments, store.revenue, store.booked_minutes), (2, 600, 120))
+        attended = StoreDailyRollup.objects.get(store=attended_store, date=day)
+        self.assertEqual((attended.appointments, attended.revenue, attended.booked_minutes), (1, 200, 60))
+
+    def test_build_command_marks_range(self):
+        """
+        測試 build_rollups --from/--to 重算區間內的每一天，不在區間內的不處理。
+        """
+        process_dirty_days()
+        StoreDailyRollup.objects.all().delete()
+        out = StringIO()
+        call_command("build_rollups", "--from", self.next_day.isoformat(), "--to", self.next_day.isoformat(),
+                     stdout=out)
+        self.assertIn("重算 1 個店鋪日", out.getvalue())
+        self.assertEqual(list(StoreDailyRollup.objects.values_list('date', flat=True)), [self.next_day])
+
+    def test_report_view(self):
+        """
+        測試營運報表從統計表讀取，且只有店鋪的商家可以查看。
+        """
+        process_dirty_days()
+        url = reverse("store:report", kwargs={"store_id": self.store.id})
+        params = {"start": self.day.isoformat(), "end": self.next_day.isoformat()}
+
+        login(self.client, self.customer)
+        self.assertEqual(self.client.get(url, params).status_code, 404)
+
+        login(self.client, self.merchant)
+        data = self.client.get(url, params).json()
+        self.assertEqual([day["date"] for day in data["days"]], [self.day.isoformat(), self.next_day.isoformat()])
+        self.assertEqual(data["days"][0]["utilization"], 0.3)
+        alice = next(row for row in data["staff"] if row["id"] == self.alice.id)
+        self.assertEqual((alice["appointments"], alice["revenue"], alice["utilization"]), (3, "600.00", 0.625))
+        self.assertEqual(
+            {row["name"]: row["appointments"] for row in data["services"]}, {"男生剪髮": 2, "洗髮": 1})
+
+        self.assertEqual(self.client.get(url, {"start": "2030-01-08", "end": "2030-01-07"}).status_code, 400)
@@ -18,4 +18,16 @@ urlpatterns = [
 
     # 預約管理
     path('appointments/', views.appointment_list, name='appointment_list'),
+
+    # 店鋪目錄
+    path('<int:store_id>/catalog/', views.store_catalog, name='store_catalog'),
+
+    # 評價統計
+    path('<int:store_id>/ratings/', views.ratings, name='ratings'),
+
+    # 營運報表
+    path('<int:store_id>/report/', views.report, name='report'),
+
+    # 空檔搜尋
+    path('services/<int:service_id>/availability/', views.availability, name='availability'),
 ]
@@ -1,32 +1,181 @@
-from django.shortcuts import render
+from datetime import date, timedelta
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from appointments.ratings import store_ratings
+from booking_system.db_router import read_from_replica
+from booking_system.query_budget import query_budget
+from booking_system.utils import arender
+from .availability import find_available_windows
+from .catalog import get_store_catalog
+from .models import Service, Store
+from .rollups import store_report
+
+# 單次空檔搜尋允許的最大天數
+AVAILABILITY_MAX_DAYS = 31
+# 單次營運報表允許的最大天數
+REPORT_MAX_DAYS = 366
 
 
 # 店鋪管理
+@query_budget(3)
 @login_required
-def store_list(request):
-    return render(request, 'store/store_list.html')
+async def store_list(request):
+    return await arender(request, 'store/store_list.html')
 
 
 # 角色分類管理
+@query_budget(3)
 @login_required
-def role_category_list(request):
-    return render(request, 'store/role_category_list.html')
+async def role_category_list(request):
+    return await arender(request, 'store/role_category_list.html')
 
 
 # 服務管理
+@query_budget(3)
 @login_required
-def service_list(request):
-    return render(request, 'store/service_list.html')
+async def service_list(request):
+    return await arender(request, 'store/service_list.html')
 
 
 # 人員管理
+@query_budget(3)
 @login_required
-def staff_list(request):
-    return render(request, 'store/staff_list.html')
+async def staff_list(request):
+    return await arender(request, 'store/staff_list.html')
 
 
 # 預約管理
+@query_budget(3)
+@login_required
+async def appointment_list(request):
+    return await arender(request, 'store/appointment_list.html')
+
+
+# 店鋪目錄
+@query_budget(8)
+@login_required
+@require_GET
+@read_from_replica
+async def store_catalog(request, store_id):
+    """
+    回傳店鋪的服務分類、服務、角色與服務人員，資料來自快取。
+    """
+    # 目錄讀取以快取為主，未命中時的組裝查詢在同步執行緒中執行
+    catalog = await sync_to_async(get_store_catalog)(store_id)
+    if catalog is None:
+        return JsonResponse({"error": "店鋪不存在"}, status=404)
+    return JsonResponse(catalog)
+
+
+# 評價統計
+@query_budget(5)
+@login_required
+@require_GET
+@read_from_replica
+async def ratings(request, store_id):
+    """
+    回傳店鋪、服務人員與服務的評價筆數、平均與 1-5 分分布，資料來自評價統計表。
+    """
+    summary = await sync_to_async(store_ratings)(store_id)
+    if summary is None:
+        return JsonResponse({"error": "店鋪不存在"}, status=404)
+    return JsonResponse(summary)
+
+
+# 營運報表
+@query_budget(6)
 @login_required
-def appointment_list(request):
-    return render(request, 'store/appointment_list.html')
+@require_GET
+@read_from_replica
+async def report(request, store_id):
+    """
+    商家自己店鋪的每日營收與使用率，以及服務人員、服務在區間內的合計，資料來自每日統計表。
+    參數：start、end（YYYY-MM-DD，預設為最近 30 天）。
+    """
+    params, error_response = _report_params(request)
+    if error_response is not None:
+        return error_response
+    user = await request.auser()
+    if not await Store.objects.filter(pk=store_id, merchant=user).aexists():
+        return JsonResponse({"error": "店鋪不存在"}, status=404)
+    return JsonResponse(await sync_to_async(store_report)(store_id, *params))
+
+
+def _report_params(request):
+    """
+    解析營運報表的日期區間，返回 ((開始日期, 結束日期), None) 或 (None, 錯誤回應)。
+    """
+    try:
+        end_date = date.fromisoformat(request.GET.get("end") or timezone.localdate().isoformat())
+        start_date = date.fromisoformat(
+            request.GET.get("start") or (end_date - timedelta(days=29)).isoformat())
+    except ValueError:
+        return None, JsonResponse({"error": "參數格式錯誤"}, status=400)
+
+    if end_date < start_date:
+        return None, JsonResponse({"error": "結束日期不可早於開始日期"}, status=400)
+    if (end_date - start_date).days >= REPORT_MAX_DAYS:
+        return None, JsonResponse({"error": f"查詢區間不可超過 {REPORT_MAX_DAYS} 天"}, status=400)
+    return (start_date, end_date), None
+
+
+# 空檔搜尋
+@query_budget(6)
+@login_required
+@require_GET
+@read_from_replica
+async def availability(request, service_id):
+    """
+    查詢服務在日期區間內的可預約空檔。
+    參數：start、end（YYYY-MM-DD，預設為今天起 7 天），staff（可重複，篩選服務人員）。
+    """
+    service = await Service.objects.filter(pk=service_id, is_active=True).afirst()
+    if service is None:
+        return JsonResponse({"error": "服務不存在"}, status=404)
+
+    params, error_response = _availability_params(request)
+    if error_response is not None:
+        return error_response
+    windows = await sync_to_async(find_available_windows)(service, *params)
+    return _availability_response(service, windows)
+
+
+def _availability_params(request):
+    """
+    解析空檔搜尋的參數，返回 ((開始日期, 結束日期, 服務人員 id), None) 或 (None, 錯誤回應)。
+    """
+    try:
+        start_date = date.fromisoformat(request.GET.get("start") or date.today().isoformat())
+        end_date = date.fromisoformat(
+            request.GET.get("end") or (start_date + timedelta(days=6)).isoformat())
+        staff_ids = [int(staff_id) for staff_id in request.GET.getlist("staff")] or None
+    except ValueError:
+        return None, JsonResponse({"error": "參數格式錯誤"}, status=400)
+
+    if end_date < start_date:
+        return None, JsonResponse({"error": "結束日期不可早於開始日期"}, status=400)
+    if (end_date - start_date).days >= AVAILABILITY_MAX_DAYS:
+        return None, JsonResponse({"error": f"查詢區間不可超過 {AVAILABILITY_MAX_DAYS} 天"}, status=400)
+    return (start_date, end_date, staff_ids), None
+
+
+def _availability_response(service, windows):
+    return JsonResponse({
+        "service": service.id,
+        "duration": service.duration,
+        "windows": [
+            {
+                "staff_id": window["staff_id"],
+                "staff_name": window["staff_name"],
+                "date": window["date"].isoformat(),
+                "start": window["start"].isoformat(),
+                "end": window["end"].isoformat(),
+            }
+            for window in windows
+        ],
+    })
@@ -0,0 +1,64 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.exceptions import PermissionDenied
+from django.db.models.functions import Lower
+
+from . import hashing, throttle
+
+
+def users_with_email(email):
+    """
+    以不分大小寫的方式查詢信箱。user_email_ci_unique 是排除空白信箱的部分索引，
+    條件需寫成 lower(email) = ... 並同樣排除空白信箱，規劃器才能確認查詢符合索引條件而使用它。
+    """
+    User = get_user_model()
+    return User._default_manager.annotate(email_lower=Lower('email')).filter(
+        email_lower=email.strip().lower()).exclude(email='')
+
+
+class EmailBackend(ModelBackend):
+    """
+    以信箱與密碼驗證。IP 或帳號的失敗次數超過上限時，在執行密碼雜湊前就拒絕。
+    """
+
+    def authenticate(self, request, email=None, password=None):
+        if not email or password is None:
+            return None
+        if throttle.is_throttled(request, email):
+            # PermissionDenied 會讓 django.contrib.auth.authenticate 停止嘗試其他後端
+            raise PermissionDenied
+
+        user = users_with_email(email).first()
+        if user is None:
+            # 仍執行一次雜湊，避免以回應時間判斷信箱是否存在
+            get_user_model()().set_password(password)
+        elif user.check_password(password) and self.user_can_authenticate(user):
+            throttle.reset_account(email)
+            return user
+        throttle.record_failure(request, email)
+        return None
+
+    async def aauthenticate(self, request, email=None, password=None):
+        """
+        非同步版本：查詢以非同步 ORM 執行，密碼雜湊交給 users.hashing 的執行緒池。
+        """
+        if not email or password is None:
+            return None
+        if await sync_to_async(throttle.is_throttled)(request, email):
+            raise PermissionDenied
+
+        user = await users_with_email(email).afirst()
+        if user is None:
+            await hashing.amake_password(password)
+        else:
+            is_correct, must_update = await hashing.averify_password(password, user.password)
+            if is_correct and self.user_can_authenticate(user):
+                if must_update:
+                    # 雜湊演算法或迭代次數已更新，登入成功時順便重新雜湊
+                    user.password = await hashing.amake_password(password)
+                    await user.asave(update_fields=["password"])
+                await sync_to_async(throttle.reset_account)(email)
+                return user
+        await sync_to_async(throttle.record_failure)(request, email)
+        return None
@@ -0,0 +1,60 @@
+"""
+非同步登入使用的密碼雜湊執行緒池。
+
+密碼雜湊（PBKDF2）每次需要數十毫秒，直接在事件迴圈中執行會卡住其他請求。
+這裡把雜湊交給大小固定的執行緒池，同時執行的雜湊數不超過 LOGIN_HASH_MAX_WORKERS，
+登入尖峰時多出的請求會在池中排隊，不會佔住事件迴圈或 Django 共用的同步執行緒。
+hashlib 計算時會釋放 GIL，因此多個執行緒可以真正平行計算。
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "LOGIN_HASH_MAX_WORKERS", 4),
+                thread_name_prefix="password-hasher",
+            )
+        return _executor
+
+
+def shutdown_executor():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+@receiver(setting_changed)
+def _reset_executor(setting, **kwargs):
+    # 測試中調整上限時重新建立執行緒池
+    if setting == "LOGIN_HASH_MAX_WORKERS":
+        shutdown_executor()
+
+
+async def _run(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(func, *args))
+
+
+async def averify_password(password, encoded):
+    """返回 (密碼是否正確, 是否需要以目前的雜湊演算法重新雜湊)。"""
+    return await _run(verify_password, password, encoded)
+
+
+async def amake_password(password):
+    return await _run(make_password, password)
@@ -0,0 +1,200 @@
+"""
+大量匯入用戶：逐行讀取 CSV、以與註冊相同的規則驗證、在多個行程中計算密碼雜湊，
+再以 bulk_create 分批寫入。
+
+每批寫入後把已處理的資料列數記錄到進度檔，中斷後可從上次完成的批次繼續。
+"""
+import csv
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from .services import EMAIL_TAKEN, USERNAME_TAKEN, integrity_error_message
+from .validators import validate_mobile_number, validate_password_strength
+
+REQUIRED_COLUMNS = ("username", "email", "phone_number", "password")
+
+
+class ImportResult:
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.skipped += 1
+        self.errors.append((line, message))
+
+
+def _init_worker():
+    # spawn 啟動的子行程需要自行載入 Django 設定，fork 則已載入，setup 會直接返回
+    django.setup()
+
+
+def validate_row(row):
+    """驗證單列資料，返回錯誤訊息或 None。"""
+    username = (row.get("username") or "").strip()
+    email = (row.get("email") or "").strip()
+    phone_number = (row.get("phone_number") or "").strip()
+    password = row.get("password") or ""
+    if not username:
+        return "缺少使用者名稱"
+    if not email:
+        return "缺少電子郵件"
+    if not validate_mobile_number(phone_number):
+        return "手機號碼格式錯誤（格式：09xxxxxxxx）"
+    try:
+        validate_password_strength(password)
+    except ValidationError as e:
+        return " ".join(e.messages)
+    return None
+
+
+def _existing(usernames, emails):
+    """
+    以兩次查詢取得資料庫中已存在的使用者名稱與信箱（小寫）。
+    信箱的條件同樣排除空白信箱，才能使用 user_email_ci_unique 部分索引。
+    """
+    User = get_user_model()
+    taken_usernames = set(
+        User.objects.filter(username__in=usernames).values_list("username", flat=True))
+    taken_emails = set(
+        User.objects.annotate(email_lower=Lower("email"))
+        .filter(email_lower__in=emails).exclude(email="").values_list("email_lower", flat=True))
+    return taken_usernames, taken_emails
+
+
+def import_batch(rows, hash_passwords, result):
+    """
+    驗證並寫入一批 (列號, 資料列)。與資料庫或同批資料重複的列會被略過並記錄原因。
+    整批寫入時若與其他請求同時建立的帳號衝突，改為逐列寫入，其餘的列仍會匯入。
+    """
+    User = get_user_model()
+    valid = []
+    for line, row in rows:
+        error = validate_row(row)
+        if error:
+            result.add_error(line, error)
+        else:
+            valid.append((line, row))
+
+    # 以寫入時的正規化值比對，避免檢查時不重複、寫入時才違反唯一限制
+    normalized = [
+        (
+            line, row,
+            User.normalize_username(row["username"].strip()),
+            User.objects.normalize_email(row["email"].strip()),
+        )
+        for line, row in valid
+    ]
+    taken_usernames, taken_emails = _existing(
+        [username for _, _, username, _ in normalized],
+        [email.lower() for _, _, _, email in normalized],
+    )
+    accepted = []
+    for line, row, username, email in normalized:
+        if username in taken_usernames:
+            result.add_error(line, USERNAME_TAKEN)
+            continue
+        if email.lower() in taken_emails:
+            result.add_error(line, EMAIL_TAKEN)
+            continue
+        taken_usernames.add(username)
+        taken_emails.add(email.lower())
+        accepted.append((line, row, username, email))
+
+    hashed = hash_passwords([row["password"] for _, row, _, _ in accepted])
+    users = [
+        (line, User(
+            username=username,
+            email=email,
+            phone_number=row["phone_number"].strip(),
+            password=password,
+        ))
+        for (line, row, username, email), password in zip(accepted, hashed)
+    ]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([user for _, user in users])
+        result.created += len(users)
+    except IntegrityError:
+        # 檢查之後有其他請求搶先註冊了相同的帳號，改為逐列寫入，只略過衝突的列
+        for line, user in users:
+            try:
+                with transaction.atomic():
+                    user.save(force_insert=True)
+            except IntegrityError as e:
+                result.add_error(line, integrity_error_message(e))
+            else:
+                result.created += 1
+
+
+def read_checkpoint(path):
+    """讀取進度檔中已處理的資料列數，沒有進度檔時為 0。"""
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path, encoding="utf-8") as f:
+        content = f.read().strip()
+    return int(content) if content else 0
+
+
+def write_checkpoint(path, processed):
+    # 先寫入暫存檔再取代，避免中斷時留下不完整的進度檔
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(str(processed))
+    os.replace(temp_path, path)
+
+
+def import_users(path, batch_size=1000, workers=None, checkpoint=None, progress=None):
+    """
+    匯入 CSV 中的用戶，回傳 ImportResult。
+
+    workers 為計算密碼雜湊的行程數，預設為 CPU 數量，0 表示在目前行程中計算。
+    指定 checkpoint 時會略過進度檔記錄的資料列，並在每批寫入後更新進度。
+    """
+    result = ImportResult()
+    skip = read_checkpoint(checkpoint)
+    workers = os.cpu_count() if workers is None else workers
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers else None
+
+    def hash_passwords(passwords):
+        if executor is None:
+            return [make_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (workers * 4))
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
+
+    try:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise ValueError(f"CSV 缺少欄位: {', '.join(missing)}")
+
+            # 第 1 列為標題，資料從第 2 列開始
+            rows = enumerate(reader, start=2)
+            for _ in islice(rows, skip):
+                pass
+            result.processed = skip
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                import_batch(batch, hash_passwords, result)
+                result.processed += len(batch)
+                if checkpoint:
+                    write_checkpoint(checkpoint, result.processed)
+                if progress:
+                    progress(result)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return result
@@ -0,0 +1,51 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.importer import import_users
+
+
+class Command(BaseCommand):
+    help = (
+        "從 CSV（欄位：username, email, phone_number, password）大量匯入用戶。"
+        "密碼雜湊以多個行程計算，中斷後可用 --resume 從上次完成的批次繼續。"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV 檔案路徑（UTF-8）")
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批寫入的資料列數")
+        parser.add_argument("--workers", type=int, default=None,
+                            help="計算密碼雜湊的行程數，預設為 CPU 數量，0 表示不使用子行程")
+        parser.add_argument("--checkpoint", help="進度檔路徑，預設為 <CSV 路徑>.progress")
+        parser.add_argument("--resume", action="store_true", help="依進度檔略過已處理的資料列")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size 必須大於 0")
+        if options["workers"] is not None and options["workers"] < 0:
+            raise CommandError("--workers 不可小於 0")
+
+        checkpoint = options["checkpoint"] or f"{options['path']}.progress"
+        if not options["resume"] and os.path.exists(checkpoint):
+            # 重新匯入時清除舊進度，避免誤略過資料列
+            os.remove(checkpoint)
+
+        def progress(result):
+            self.stdout.write(
+                f"已處理 {result.processed} 列，新增 {result.created} 位用戶，略過 {result.skipped} 列")
+
+        try:
+            result = import_users(
+                options["path"],
+                batch_size=options["batch_size"],
+                workers=options["workers"],
+                checkpoint=checkpoint,
+                progress=progress,
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for line, message in result.errors:
+            self.stderr.write(f"第 {line} 列：{message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"完成：處理 {result.processed} 列，新增 {result.created} 位用戶，略過 {result.skipped} 列"))
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.3 on 2026-10-18 03:22
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """
+    加上唯一限制前，確認沒有只差在大小寫的重複信箱，否則建立索引時才失敗，訊息難以判讀。
+    重複的帳號可能各自有預約與評價，無法自動合併，需先手動處理後再執行遷移。
+    """
+    User = apps.get_model("users", "User")
+    duplicates = list(
+        User.objects.exclude(email="")
+        .values(email_lower=Lower("email"))
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .order_by("email_lower")
+        .values_list("email_lower", flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "以下信箱有不分大小寫重複的帳號，請先合併或修改後再執行遷移（最多列出 20 筆）：\n"
+            + "\n".join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="user",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("email"),
+                condition=models.Q(("email", ""), _negated=True),
+                name="user_email_ci_unique",
+            ),
+        ),
+    ]
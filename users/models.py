@@ -1,6 +1,7 @@
 # users/models
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class User(AbstractUser):
@@ -31,5 +32,14 @@ class User(AbstractUser):
         help_text="用戶資料的最後更新時間"
     )
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # 信箱不分大小寫唯一，同時作為登入查詢的索引；空白信箱（例如管理員帳號）不受限制
+            models.UniqueConstraint(
+                Lower('email'), name='user_email_ci_unique',
+                condition=~models.Q(email=''),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.get_role_display()})"
@@ -0,0 +1,77 @@
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .validators import validate_mobile_number, validate_password_strength
+
+logger = logging.getLogger(__name__)
+
+# 錯誤訊息
+USERNAME_TAKEN = "該使用者名稱已被使用。"
+EMAIL_TAKEN = "該電子郵件已被註冊。"
+REGISTRATION_FAILED = "註冊失敗，請稍後再試。"
+INVALID_MOBILE_NUMBER = "請輸入有效的手機號碼（格式：09xxxxxxxx）。"
+PASSWORD_MISMATCH = "密碼與確認密碼不一致。"
+
+# 唯一限制名稱（例如 user_email_ci_unique、users_user_username_key，
+# SQLite 則為錯誤訊息中的欄位或索引名稱）包含的關鍵字對應的錯誤訊息
+CONSTRAINT_MESSAGES = (
+    ("email", EMAIL_TAKEN),
+    ("username", USERNAME_TAKEN),
+)
+
+
+def _constraint_name(error):
+    """取得違反的限制名稱；PostgreSQL 由 diag 提供，其他資料庫回退到錯誤訊息。"""
+    diag = getattr(error.__cause__, "diag", None)
+    return getattr(diag, "constraint_name", None) or str(error)
+
+
+def integrity_error_message(error):
+    """將唯一限制的 IntegrityError 轉換為欄位層級的錯誤訊息。"""
+    name = _constraint_name(error)
+    for marker, message in CONSTRAINT_MESSAGES:
+        if marker in name:
+            return message
+    return REGISTRATION_FAILED
+
+
+def validate_registration(password, phone_number=None, confirm_password=None):
+    """
+    檢查手機號碼格式、確認密碼與密碼強度，不通過時拋出 ValidationError。
+    phone_number 與 confirm_password 為 None 時略過對應的檢查。
+    """
+    if phone_number is not None and not validate_mobile_number(phone_number):
+        raise ValidationError(INVALID_MOBILE_NUMBER)
+    if confirm_password is not None and password != confirm_password:
+        raise ValidationError(PASSWORD_MISMATCH)
+    validate_password_strength(password)
+
+
+def register_user(username, email, password, phone_number=None, confirm_password=None):
+    """
+    建立用戶，返回用戶或 None，並附帶錯誤訊息。
+
+    寫入前先以 validate_registration 檢查輸入，不通過時拋出 ValidationError，由呼叫端顯示訊息。
+    不事先查詢使用者名稱與信箱是否已存在，直接 INSERT 並由資料庫的唯一限制判斷，
+    只需一次往返，也不會在檢查與建立之間被其他請求搶先。
+    其他例外不在此處理，交由呼叫端決定如何回應。
+    """
+    validate_registration(password, phone_number, confirm_password)
+    User = get_user_model()
+    try:
+        # 以 savepoint 包住，失敗時不影響外層交易
+        with transaction.atomic():
+            user = User.objects.create_user(
+                username=username,
+                email=email,
+                password=password,
+                phone_number=phone_number,
+            )
+    except IntegrityError as e:
+        message = integrity_error_message(e)
+        logger.info(f"用戶註冊失敗（唯一限制）: username={username}, email={email}, error={e}")
+        return None, message
+    return user, None
@@ -1,9 +1,29 @@
-from django.test import TestCase
+import asyncio
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.contrib.messages.storage import default_storage
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import verify_password
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 from unittest.mock import patch
 import logging
 
+from booking_system.testing import QueryBudgetMixin, QueryPlanMixin, requires_plan_support
+from . import hashing, throttle, urls, views
+from .backends import users_with_email
+from .services import register_user, EMAIL_TAKEN, INVALID_MOBILE_NUMBER, PASSWORD_MISMATCH, USERNAME_TAKEN
+
 # 使用自訂的用戶模型
 User = get_user_model()
 
@@ -157,11 +177,168 @@ class RegisterCustomerTest(TestCase):
         self.assertIn('value=""', response_text)
 
 
+class RegisterUserServiceTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(
+            username='user1', email='user1@example.com', phone_number='0911111111', password='Aa1234567890')
+
+    def test_register_user_single_insert(self):
+        """
+        測試註冊只執行 INSERT，不事先查詢唯一性。
+        """
+        with CaptureQueriesContext(connection) as queries:
+            user, error = register_user('user2', 'user2@example.com', 'Aa1234567890', '0912345678')
+        self.assertIsNone(error)
+        self.assertEqual(user.username, 'user2')
+        statements = [query['sql'].split()[0].upper() for query in queries.captured_queries]
+        self.assertNotIn('SELECT', statements)
+        self.assertEqual(statements.count('INSERT'), 1)
+
+    def test_register_user_duplicate_username(self):
+        """
+        測試重複使用者名稱返回對應的錯誤訊息。
+        """
+        user, error = register_user('user1', 'other@example.com', 'Aa1234567890')
+        self.assertIsNone(user)
+        self.assertEqual(error, USERNAME_TAKEN)
+
+    def test_register_user_duplicate_email_case_insensitive(self):
+        """
+        測試大小寫不同的重複信箱返回對應的錯誤訊息。
+        """
+        user, error = register_user('user2', 'User1@Example.com', 'Aa1234567890')
+        self.assertIsNone(user)
+        self.assertEqual(error, EMAIL_TAKEN)
+        self.assertEqual(User.objects.count(), 1)
+
+
+    def test_register_user_validates_before_insert(self):
+        """
+        測試手機號碼、確認密碼與密碼強度不通過時拋出 ValidationError，且不寫入資料庫。
+        """
+        cases = [
+            (('user2', 'user2@example.com', 'Aa1234567890', '1234567'), INVALID_MOBILE_NUMBER),
+            (('user2', 'user2@example.com', 'Aa1234567890', '0912345678', 'Aa12345678'), PASSWORD_MISMATCH),
+            (('user2', 'user2@example.com', '123456', '0912345678', '123456'), "密碼長度至少為 12 個字符。"),
+        ]
+        for args, message in cases:
+            with self.subTest(message), CaptureQueriesContext(connection) as queries:
+                with self.assertRaises(ValidationError) as raised:
+                    register_user(*args)
+            self.assertEqual(raised.exception.messages, [message])
+            self.assertEqual(queries.captured_queries, [])
+        self.assertEqual(User.objects.count(), 1)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportUsersCommandTest(TestCase):
+    def setUp(self):
+        User.objects.create_user(
+            username='existing', email='existing@example.com', password='Aa1234567890')
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'users.csv')
+
+    def write_csv(self, rows):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('username,email,phone_number,password\n')
+            for row in rows:
+                f.write(','.join(row) + '\n')
+
+    def run_import(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_users', self.path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_validates_and_skips_duplicates(self):
+        """
+        測試匯入時套用註冊的驗證規則，並略過與資料庫或檔案內重複的資料列。
+        """
+        self.write_csv([
+            ('alice', 'alice@example.com', '0912345678', 'Aa1234567890'),
+            ('bob', 'bob@example.com', '12345', 'Aa1234567890'),
+            ('carol', 'carol@example.com', '0912345678', 'weak'),
+            ('dave', 'EXISTING@example.com', '0912345678', 'Aa1234567890'),
+            ('erin', 'alice@example.com', '0912345678', 'Aa1234567890'),
+            ('frank', 'frank@example.com', '0912345678', 'Aa1234567890'),
+        ])
+        stdout, stderr = self.run_import('--workers', '0', '--batch-size', '4')
+
+        self.assertEqual(
+            set(User.objects.values_list('username', flat=True)), {'existing', 'alice', 'frank'})
+        self.assertTrue(User.objects.get(username='alice').check_password('Aa1234567890'))
+        self.assertIn('第 3 列：手機號碼格式錯誤', stderr)
+        self.assertIn('第 4 列：密碼長度至少為 12 個字符。', stderr)
+        self.assertIn('第 5 列：該電子郵件已被註冊。', stderr)
+        self.assertIn('第 6 列：該電子郵件已被註冊。', stderr)
+        self.assertIn('新增 2 位用戶，略過 4 列', stdout)
+
+    def test_import_dedupes_on_normalized_username(self):
+        """
+        測試以正規化後的使用者名稱比對重複，全形字元與既有帳號相同時略過而不中斷整批。
+        """
+        self.write_csv([
+            ('ｅｘｉｓｔｉｎｇ', 'other@example.com', '0912345678', 'Aa1234567890'),
+            ('grace', 'grace@example.com', '0912345678', 'Aa1234567890'),
+        ])
+        stdout, stderr = self.run_import('--workers', '0')
+
+        self.assertEqual(set(User.objects.values_list('username', flat=True)), {'existing', 'grace'})
+        self.assertIn('第 2 列：該使用者名稱已被使用。', stderr)
+
+    def test_import_skips_rows_taken_concurrently(self):
+        """
+        測試檢查之後才被其他請求建立的帳號只略過衝突的列，同批的其他列仍會匯入。
+        """
+        self.write_csv([
+            ('heidi', 'heidi@example.com', '0912345678', 'Aa1234567890'),
+            ('ivan', 'EXISTING@example.com', '0912345678', 'Aa1234567890'),
+            ('judy', 'judy@example.com', '0912345678', 'Aa1234567890'),
+        ])
+        # 模擬檢查時帳號尚未存在
+        with patch('users.importer._existing', return_value=(set(), set())):
+            stdout, stderr = self.run_import('--workers', '0')
+
+        self.assertEqual(
+            set(User.objects.values_list('username', flat=True)), {'existing', 'heidi', 'judy'})
+        self.assertIn('第 3 列：該電子郵件已被註冊。', stderr)
+        self.assertIn('新增 2 位用戶，略過 1 列', stdout)
+
+    def test_import_resumes_from_checkpoint(self):
+        """
+        測試 --resume 會略過進度檔記錄的資料列。
+        """
+        self.write_csv([
+            (f'user{i}', f'user{i}@example.com', '0912345678', 'Aa1234567890') for i in range(5)
+        ])
+        with open(self.path + '.progress', 'w', encoding='utf-8') as f:
+            f.write('3')
+        self.run_import('--workers', '0', '--resume')
+
+        self.assertEqual(
+            set(User.objects.values_list('username', flat=True)), {'existing', 'user3', 'user4'})
+        with open(self.path + '.progress', encoding='utf-8') as f:
+            self.assertEqual(f.read(), '5')
+
+    def test_import_hashes_in_process_pool(self):
+        """
+        測試以子行程計算密碼雜湊。
+        """
+        self.write_csv([
+            (f'user{i}', f'user{i}@example.com', '0912345678', 'Aa1234567890') for i in range(4)
+        ])
+        self.run_import('--workers', '2')
+
+        self.assertEqual(User.objects.count(), 5)
+        self.assertTrue(User.objects.get(username='user3').check_password('Aa1234567890'))
+
+
 class LoginTest(TestCase):
     def setUp(self):
         """
         初始化測試數據。
         """
+        cache.clear()  # 清除登入節流的計數
         session = self.client.session
         session["security_verified"] = True
         session.save()
@@ -241,3 +418,211 @@ class LoginTest(TestCase):
 
         # 驗證 session 中用戶 ID 被清除
         self.assertNotIn('_auth_user_id', self.client.session)
+
+
+class AsyncLoginTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="TestPassword123!",
+        )
+        self.factory = RequestFactory()
+
+    def build_request(self, email, password):
+        request = self.factory.post(reverse('users:login'), {'email': email, 'password': password})
+        SessionMiddleware(lambda r: None).process_request(request)
+        request._messages = default_storage(request)
+        return request
+
+    async def test_async_login_successful(self):
+        """
+        測試非同步登入成功後寫入 session 並跳轉到儀表板。
+        """
+        request = self.build_request('TestUser@example.com', 'TestPassword123!')
+        response = await views.login(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('users:dashboard'))
+        self.assertEqual(await request.session.aget('_auth_user_id'), str(self.user.pk))
+
+    async def test_async_login_invalid_password(self):
+        """
+        測試非同步登入密碼錯誤時停留在登入頁。
+        """
+        request = self.build_request(self.user.email, 'WrongPassword123!')
+        response = await views.login(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("信箱或密碼不正確", response.content.decode('utf-8'))
+
+    async def test_async_login_hashes_in_pool(self):
+        """
+        測試登入時的密碼驗證在 users.hashing 的執行緒池中執行，而不是 Django 共用的同步執行緒。
+        """
+        threads = []
+
+        def recording_verify_password(password, encoded):
+            threads.append(threading.current_thread().name)
+            return verify_password(password, encoded)
+
+        request = self.build_request(self.user.email, 'TestPassword123!')
+        with patch('users.hashing.verify_password', recording_verify_password):
+            response = await views.login(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('password-hasher'))
+        self.assertEqual(await request.session.aget('_auth_user_backend'), 'users.backends.EmailBackend')
+
+    @override_settings(LOGIN_HASH_MAX_WORKERS=2)
+    async def test_hashing_concurrency_capped(self):
+        """
+        測試同時計算的密碼雜湊數不超過 LOGIN_HASH_MAX_WORKERS，且不會阻塞事件迴圈。
+        """
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def slow_make_password(password):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.05)
+            with lock:
+                active -= 1
+            return password
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        tick_task = asyncio.create_task(ticker())
+        with patch('users.hashing.make_password', slow_make_password):
+            results = await asyncio.gather(*(hashing.amake_password(f'p{i}') for i in range(6)))
+        tick_task.cancel()
+
+        self.assertEqual(results, [f'p{i}' for i in range(6)])
+        self.assertEqual(peak, 2)
+        self.assertGreater(ticks, 10)
+
+
+@override_settings(LOGIN_THROTTLE_ACCOUNT_LIMIT=3, LOGIN_THROTTLE_IP_LIMIT=5)
+class LoginThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        session = self.client.session
+        session["security_verified"] = True
+        session.save()
+
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="testuser@example.com",
+            password="TestPassword123!",
+        )
+
+    def post_login(self, email, password, ip="10.0.0.1"):
+        return self.client.post(reverse('users:login'), {
+            'email': email,
+            'password': password,
+        }, REMOTE_ADDR=ip)
+
+    def test_login_is_case_insensitive(self):
+        """
+        測試信箱大小寫不同仍可登入。
+        """
+        self.post_login('TestUser@Example.COM', 'TestPassword123!')
+        self.assertIn('_auth_user_id', self.client.session)
+
+    def test_account_throttled_before_password_check(self):
+        """
+        測試帳號失敗次數達上限後，即使密碼正確也會被拒絕，且不再執行密碼驗證。
+        """
+        for i in range(3):
+            self.post_login(self.user.email, 'WrongPassword123!', ip=f"10.0.0.{i}")
+
+        with patch('users.hashing.verify_password') as verify:
+            response = self.post_login(self.user.email, 'TestPassword123!', ip="10.0.1.1")
+        verify.assert_not_called()
+        self.assertIn("嘗試次數過多，請稍後再試", response.content.decode('utf-8'))
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_throttle_checked_once_per_login(self):
+        """
+        測試每次登入只檢查一次節流狀態。
+        """
+        with patch('users.throttle.is_throttled', wraps=throttle.is_throttled) as is_throttled:
+            self.post_login(self.user.email, 'TestPassword123!')
+        self.assertEqual(is_throttled.call_count, 1)
+        self.assertIn('_auth_user_id', self.client.session)
+
+    def test_ip_throttled_across_accounts(self):
+        """
+        測試同一 IP 對不同帳號的失敗次數達上限後被拒絕，其他 IP 不受影響。
+        """
+        for i in range(5):
+            self.post_login(f'user{i}@example.com', 'WrongPassword123!')
+
+        response = self.post_login(self.user.email, 'TestPassword123!')
+        self.assertIn("嘗試次數過多，請稍後再試", response.content.decode('utf-8'))
+
+        self.post_login(self.user.email, 'TestPassword123!', ip="10.0.0.2")
+        self.assertIn('_auth_user_id', self.client.session)
+
+    def test_success_resets_account_failures(self):
+        """
+        測試登入成功後清除帳號的失敗紀錄。
+        """
+        for _ in range(2):
+            self.post_login(self.user.email, 'WrongPassword123!', ip="10.0.0.3")
+        self.post_login(self.user.email, 'TestPassword123!', ip="10.0.0.3")
+
+        for _ in range(2):
+            self.post_login(self.user.email, 'WrongPassword123!', ip="10.0.0.4")
+        response = self.post_login(self.user.email, 'WrongPassword123!', ip="10.0.0.4")
+        self.assertIn("信箱或密碼不正確", response.content.decode('utf-8'))
+
+    def test_email_unique_case_insensitive(self):
+        """
+        測試資料庫層級的信箱唯一限制不分大小寫。
+        """
+        with self.assertRaises(IntegrityError):
+            User.objects.create_user(
+                username="other", email="TESTUSER@example.com", password="TestPassword123!")
+
+
+@requires_plan_support
+class UserQueryPlanTest(QueryPlanMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """
+        建立多位用戶，以及信箱為空白的管理員帳號。
+        """
+        User.objects.bulk_create([
+            User(username=f"user{i}", email=f"User{i}@example.com", password="!")
+            for i in range(200)
+        ])
+        User.objects.bulk_create([User(username=f"admin{i}", email="", password="!") for i in range(3)])
+
+    def test_login_lookup_by_email(self):
+        self.assertUsesIndex(users_with_email("USER42@example.com"), 'user_email_ci_unique')
+
+
+class QueryBudgetTest(QueryBudgetMixin, TestCase):
+    post_urls = ("login",)
+    post_data = {"login": {"email": "testuser@example.com", "password": "TestPassword123!"}}
+
+    def setUp(self):
+        cache.clear()  # 清除登入節流的計數
+        self.budget_user = User.objects.create_user(
+            username="testuser", email="testuser@example.com", password="TestPassword123!")
+
+    def test_every_view_within_budget(self):
+        """
+        測試 users 的每個路由都宣告了查詢上限且未超過，登入以正確的帳密完成驗證。
+        """
+        responses = self.assertWithinQueryBudgets(urls.urlpatterns, "users")
+        self.assertRedirects(responses["login"], reverse("users:dashboard"), fetch_redirect_response=False)
@@ -0,0 +1,96 @@
+"""
+登入節流：以快取實作的滑動視窗計數器，分別以 IP 與帳號（信箱）計算登入失敗次數。
+
+每個視窗只保存目前與前一個時間桶的計數，估計值為
+目前計數 + 前一桶計數 × 前一桶仍落在視窗內的比例，
+避免固定視窗在邊界處允許兩倍的嘗試次數。
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from booking_system.utils import get_client_ip
+
+KEY_PREFIX = "login_throttle"
+
+
+def _window():
+    return getattr(settings, "LOGIN_THROTTLE_WINDOW", 300)
+
+
+def _limits():
+    return {
+        "ip": getattr(settings, "LOGIN_THROTTLE_IP_LIMIT", 20),
+        "account": getattr(settings, "LOGIN_THROTTLE_ACCOUNT_LIMIT", 5),
+    }
+
+
+def _identifier(value):
+    # 信箱可能含有快取鍵不允許的字元，一律取雜湊
+    return hashlib.sha256(value.encode()).hexdigest()
+
+
+def _scopes(request, email):
+    """回傳 [(範圍, 識別碼)]，沒有請求（例如管理指令）時只計算帳號。"""
+    scopes = []
+    if request is not None:
+        scopes.append(("ip", _identifier(get_client_ip(request))))
+    if email:
+        scopes.append(("account", _identifier(email.strip().lower())))
+    return scopes
+
+
+def _bucket_key(scope, identifier, bucket):
+    return f"{KEY_PREFIX}:{scope}:{identifier}:{bucket}"
+
+
+def attempt_count(scope, identifier, now=None):
+    """滑動視窗內的失敗次數估計值。"""
+    window = _window()
+    now = time.time() if now is None else now
+    bucket = int(now // window)
+    counts = cache.get_many([
+        _bucket_key(scope, identifier, bucket),
+        _bucket_key(scope, identifier, bucket - 1),
+    ])
+    current = counts.get(_bucket_key(scope, identifier, bucket), 0)
+    previous = counts.get(_bucket_key(scope, identifier, bucket - 1), 0)
+    elapsed = (now % window) / window
+    return current + previous * (1 - elapsed)
+
+
+def is_throttled(request, email):
+    """IP 或帳號任一超過上限即拒絕，需在驗證密碼之前呼叫。"""
+    limits = _limits()
+    return any(
+        attempt_count(scope, identifier) >= limits[scope]
+        for scope, identifier in _scopes(request, email)
+    )
+
+
+def record_failure(request, email):
+    """記錄一次登入失敗。"""
+    window = _window()
+    bucket = int(time.time() // window)
+    for scope, identifier in _scopes(request, email):
+        key = _bucket_key(scope, identifier, bucket)
+        # 時間桶需保留到下一個視窗結束，才能作為「前一桶」計算
+        cache.add(key, 0, timeout=window * 2)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # 在 add 與 incr 之間被淘汰
+            cache.set(key, 1, timeout=window * 2)
+
+
+def reset_account(email):
+    """登入成功後清除帳號的失敗紀錄，IP 的紀錄保留。"""
+    window = _window()
+    bucket = int(time.time() // window)
+    identifier = _identifier(email.strip().lower())
+    cache.delete_many([
+        _bucket_key("account", identifier, bucket),
+        _bucket_key("account", identifier, bucket - 1),
+    ])
@@ -1,9 +1,11 @@
 from django.urls import path
 from . import views
 from django.http import HttpResponse
+from booking_system.query_budget import query_budget
 
 
 # 暫時的顧客儀表板視圖
+@query_budget(1)
 def customer_dashboard(request):
     return HttpResponse("顧客儀表板")
 
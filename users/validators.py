@@ -0,0 +1,24 @@
+import re
+
+from django.core.exceptions import ValidationError
+
+
+def validate_mobile_number(phone_number):
+    """
+    驗證手機號碼格式：台灣手機號碼需符合 09xxxxxxxx 格式
+    """
+    return re.match(r'^09\d{8}$', phone_number)
+
+
+def validate_password_strength(password):
+    """
+    驗證密碼的強度：長度、大小寫字母和數字要求
+    """
+    if len(password) < 12:
+        raise ValidationError("密碼長度至少為 12 個字符。")
+    if not any(char.isupper() for char in password):
+        raise ValidationError("密碼需包含至少一個大寫字母。")
+    if not any(char.islower() for char in password):
+        raise ValidationError("密碼需包含至少一個小寫字母。")
+    if not any(char.isdigit() for char in password):
+        raise ValidationError("密碼需包含至少一個數字。")
@@ -1,14 +1,17 @@
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.core.exceptions import ValidationError
-from django.contrib.auth import authenticate, login as auth_login, get_user_model, logout as auth_logout
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.contrib.auth import get_user_model
+from django.contrib.auth import alogin, alogout
 from django.db import transaction
 import logging
-from booking_system.utils import get_client_ip
+from booking_system.utils import arender, get_client_ip
+from booking_system.query_budget import query_budget
+from booking_system.db_router import read_from_replica
 from django.utils.html import escape
-import re
-from django.db.utils import IntegrityError
 from django.contrib.auth.decorators import login_required
+from .backends import EmailBackend
+from .services import register_user
 
 logger = logging.getLogger(__name__)
 
@@ -19,37 +22,7 @@ User = get_user_model()
 logger = logging.getLogger(__name__)
 
 
-def validate_mobile_number(phone_number):
-    """
-    驗證手機號碼格式：台灣手機號碼需符合 09xxxxxxxx 格式
-    """
-    return re.match(r'^09\d{8}$', phone_number)
-
-
-def is_unique_username(username):
-    """檢查使用者名稱是否唯一"""
-    return not User.objects.filter(username=username).exists()
-
-
-def is_unique_email(email):
-    """檢查電子郵件是否唯一"""
-    return not User.objects.filter(email=email).exists()
-
-
-def validate_password_strength(password):
-    """
-    驗證密碼的強度：長度、大小寫字母和數字要求
-    """
-    if len(password) < 12:
-        raise ValidationError("密碼長度至少為 12 個字符。")
-    if not any(char.isupper() for char in password):
-        raise ValidationError("密碼需包含至少一個大寫字母。")
-    if not any(char.islower() for char in password):
-        raise ValidationError("密碼需包含至少一個小寫字母。")
-    if not any(char.isdigit() for char in password):
-        raise ValidationError("密碼需包含至少一個數字。")
-
-
+@query_budget(5)
 def register(request):
     """通用註冊邏輯"""
     if request.method == "POST":
@@ -63,137 +36,125 @@ def register(request):
         logger.info(
             f"收到註冊請求: username={username}, email={email}, ip={ip_address}")
 
-        # 驗證手機號碼
-        if not validate_mobile_number(mobile_number):
-            messages.error(request, "請輸入有效的手機號碼（格式：09xxxxxxxx）。")
-            return render(request, 'users/register.html', {
-                'username': username, 'email': email, 'phone_number': mobile_number
-            })
-
-        # 密碼一致性檢查
-        if password != confirm_password:
-            messages.error(request, "密碼與確認密碼不一致。")
-            return render(request, 'users/register.html', {
-                'username': username, 'email': email, 'phone_number': mobile_number
-            })
-
-        # 密碼強度檢查
+        # 檢查輸入並創建用戶，唯一性由資料庫限制判斷
         try:
-            validate_password_strength(password)
+            user, error_message = register_user(
+                username=username,
+                email=email,
+                password=password,
+                phone_number=mobile_number,
+                confirm_password=confirm_password,
+            )
         except ValidationError as e:
             for error in e.messages:
                 messages.error(request, error)
             return render(request, 'users/register.html', {
                 'username': username, 'email': email, 'phone_number': mobile_number
             })
-
-        # 唯一性檢查
-        if not is_unique_username(username):
-            messages.error(request, "該使用者名稱已被使用。")
+        except Exception as e:
+            messages.error(request, f"註冊失敗，請稍後再試。錯誤訊息：{str(e)}")
+            logger.exception(f"用戶註冊失敗（未知錯誤）錯誤訊息：{str(e)}")
             return render(request, 'users/register.html', {
                 'username': username, 'email': email, 'phone_number': mobile_number
             })
-        if not is_unique_email(email):
-            messages.error(request, "該電子郵件已被註冊。")
+
+        if user is None:
+            messages.error(request, error_message)
+            logger.error(
+                f"用戶註冊失敗: username={username}, email={email}, ip={ip_address}, error={error_message}")
             return render(request, 'users/register.html', {
                 'username': username, 'email': email, 'phone_number': mobile_number
             })
 
-        # 創建用戶
-        try:
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password=password,
-                phone_number=mobile_number,
-            )
-            messages.success(request, "註冊成功，請登入！")
-            logger.info(
-                f"用戶註冊成功: username={username}, email={email}, ip={ip_address}")
-            return redirect('users:login')
-        except IntegrityError:
-            messages.error(request, "註冊失敗，請稍後再試。")
-            logger.error(
-                f"用戶註冊失敗（數據庫錯誤）: username={username}, email={email}, ip={ip_address}")
-        except Exception as e:
-            messages.error(request, f"註冊失敗，請稍後再試。錯誤訊息：{str(e)}")
-            logger.exception(f"用戶註冊失敗（未知錯誤）錯誤訊息：{str(e)}")
+        messages.success(request, "註冊成功，請登入！")
+        logger.info(
+            f"用戶註冊成功: username={username}, email={email}, ip={ip_address}")
+        return redirect('users:login')
 
     return render(request, 'users/register.html')
 
 
-def login(request):
+@query_budget(12)
+async def login(request):
     """
     使用 Email 和密碼進行驗證並登入。
+    密碼雜湊在有上限的執行緒池中計算，登入尖峰不會佔住事件迴圈。
     """
     if request.method == "POST":
         email = request.POST.get("email", "").strip()
         password = request.POST.get("password", "")
 
-        # 檢查是否有空欄
         if not email or not password:
             messages.error(request, "請輸入信箱和密碼")
-            return render(request, "users/login.html", {"email": email})
+            return await arender(request, "users/login.html", {"email": email})
 
-        # 驗證用戶
-        user, error_message = _authenticate_user(email, password)  # 獲取用戶和錯誤訊息
+        user, error_message = await _aauthenticate_user(request, email, password)
         if user:
-            auth_login(request, user)  # 登入用戶
+            await alogin(request, user)
             return redirect("users:dashboard")
-        else:
-            if error_message:
-                messages.error(request, error_message)  # 添加錯誤訊息
-            return render(request, "users/login.html", {"email": email})
+        if error_message:
+            messages.error(request, error_message)
+        return await arender(request, "users/login.html", {"email": email})
 
-    # GET 請求，渲染空白表單
-    return render(request, "users/login.html", {"email": ""})
+    return await arender(request, "users/login.html", {"email": ""})
 
 
-def _authenticate_user(email, password):
+async def _aauthenticate_user(request, email, password):
     """
     驗證用戶的 Email 和密碼，返回用戶或 None，並附帶錯誤訊息。
+    失敗次數過多時直接拒絕，不執行密碼驗證。
     """
+    # django.contrib.auth.aauthenticate 只是把同步的 authenticate 丟到執行緒中，
+    # 直接呼叫後端的 aauthenticate，密碼雜湊才會交給 users.hashing 的執行緒池
     try:
-        user = User.objects.get(email=email)
-        if user.check_password(password):
-            return user, None  # 驗證成功
-        else:
-            return None, "信箱或密碼不正確"
-    except User.DoesNotExist:
+        user = await EmailBackend().aauthenticate(request, email=email, password=password)
+    except PermissionDenied:
+        # 節流由後端在密碼雜湊前檢查，超過上限時拋出 PermissionDenied
+        logger.warning(f"登入嘗試次數過多: email={email}, ip={get_client_ip(request)}")
+        return None, "嘗試次數過多，請稍後再試"
+    if user is None:
         return None, "信箱或密碼不正確"
+    # alogin 依 user.backend 記錄驗證時使用的後端
+    user.backend = f"{EmailBackend.__module__}.{EmailBackend.__qualname__}"
+    return user, None
 
 
-def logout(request):
+@query_budget(8)
+async def logout(request):
     """
     處理登出的請求。
     """
-    security_verified = request.session.get(
-        "security_verified", False)  # 保存驗證狀態
-    auth_logout(request)
+    security_verified = await request.session.aget("security_verified", False)  # 保存驗證狀態
+    await alogout(request)
     if security_verified:  # 如果之前驗證過，重新設置
-        request.session["security_verified"] = True
+        await request.session.aset("security_verified", True)
     messages.success(request, "您已成功登出！")
     return redirect("users:login")
 
 
+@query_budget(3)
 @login_required
-def dashboard(request):
-    return render(request, 'users/dashboard.html')
+@read_from_replica
+async def dashboard(request):
+    return await arender(request, 'users/dashboard.html')
 
 
 # 帳號管理中心
+@query_budget(3)
 @login_required
-def account_center(request):
-    return render(request, 'users/account_center.html')
+async def account_center(request):
+    return await arender(request, 'users/account_center.html')
 
 
 # 隱私設定
+@query_budget(3)
 @login_required
-def privacy_settings(request):
-    return render(request, 'users/privacy_settings.html')
+async def privacy_settings(request):
+    return await arender(request, 'users/privacy_settings.html')
 
 
 # 協助與支援
+@query_budget(3)
 @login_required
-def support_help(request):
-    return render(request, 'users/support_help.html')
+async def support_help(request):
+    return await arender(request, 'users/support_help.html')